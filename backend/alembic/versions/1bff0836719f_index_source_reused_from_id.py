@@ -0,0 +1,25 @@
+"""index source reused_from_id
+
+Revision ID: 1bff0836719f
+Revises: 517626735b03
+Create Date: 2026-10-19 18:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1bff0836719f'
+down_revision: Union[str, None] = '517626735b03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_source_reused_from_id'), 'source', ['reused_from_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_source_reused_from_id'), table_name='source')
@@ -0,0 +1,33 @@
+"""add source language and translation_of_id
+
+Revision ID: 400fc55d5062
+Revises: 4ce4a27d6eb7
+Create Date: 2026-10-19 17:24:41.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '400fc55d5062'
+down_revision: Union[str, None] = '4ce4a27d6eb7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('source', sa.Column('language', sa.String(length=8), nullable=True))
+    op.add_column('source', sa.Column('translation_of_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        op.f('fk_source_translation_of_id_source'), 'source', 'source',
+        ['translation_of_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(op.f('fk_source_translation_of_id_source'), 'source', type_='foreignkey')
+    op.drop_column('source', 'translation_of_id')
+    op.drop_column('source', 'language')
@@ -0,0 +1,26 @@
+"""add task_progress llm_usage
+
+Revision ID: 4a316d5253e6
+Revises: 111421f69b12
+Create Date: 2026-10-19 17:20:56.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a316d5253e6'
+down_revision: Union[str, None] = '111421f69b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('task_progress', sa.Column('llm_usage', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('task_progress', 'llm_usage')
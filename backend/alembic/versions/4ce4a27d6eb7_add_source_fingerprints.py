@@ -0,0 +1,39 @@
+"""add source fingerprints
+
+Revision ID: 4ce4a27d6eb7
+Revises: 4a316d5253e6
+Create Date: 2026-10-19 17:22:36.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4ce4a27d6eb7'
+down_revision: Union[str, None] = '4a316d5253e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('source', sa.Column('content_hash', sa.String(length=40), nullable=True))
+    op.add_column('source', sa.Column('simhash', sa.BigInteger(), nullable=True))
+    op.add_column('source', sa.Column('reused_from_id', sa.Integer(), nullable=True))
+    op.add_column('source', sa.Column('match_score', sa.Float(), nullable=True))
+    op.create_index(op.f('ix_source_content_hash'), 'source', ['content_hash'], unique=False)
+    op.create_foreign_key(
+        op.f('fk_source_reused_from_id_source'), 'source', 'source',
+        ['reused_from_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(op.f('fk_source_reused_from_id_source'), 'source', type_='foreignkey')
+    op.drop_index(op.f('ix_source_content_hash'), table_name='source')
+    op.drop_column('source', 'match_score')
+    op.drop_column('source', 'reused_from_id')
+    op.drop_column('source', 'simhash')
+    op.drop_column('source', 'content_hash')
@@ -0,0 +1,26 @@
+"""add company_dashboard timings
+
+Revision ID: 4cf04ec406f0
+Revises: b33c9c6c7ba4
+Create Date: 2026-10-19 17:46:16.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4cf04ec406f0'
+down_revision: Union[str, None] = 'b33c9c6c7ba4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('company_dashboard', sa.Column('timings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('company_dashboard', 'timings')
@@ -0,0 +1,26 @@
+"""add company_dashboard data_version
+
+Revision ID: 517626735b03
+Revises: 4cf04ec406f0
+Create Date: 2026-10-19 18:25:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '517626735b03'
+down_revision: Union[str, None] = '4cf04ec406f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('company_dashboard', sa.Column('data_version', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('company_dashboard', 'data_version')
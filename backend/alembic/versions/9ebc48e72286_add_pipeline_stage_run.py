@@ -0,0 +1,56 @@
+"""add pipeline_stage_run
+
+Revision ID: 9ebc48e72286
+Revises: 400fc55d5062
+Create Date: 2026-10-19 17:31:24.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9ebc48e72286'
+down_revision: Union[str, None] = '400fc55d5062'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+stage_status_enum = sa.Enum(
+    'running', 'done', 'waiting', 'failed', 'cancelled', name='stage_status_enum'
+)
+
+
+def upgrade() -> None:
+    op.create_table('pipeline_stage_run',
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('stage', sa.String(length=32), nullable=False),
+    sa.Column('input_hash', sa.String(length=40), nullable=False),
+    sa.Column('status', stage_status_enum, nullable=False),
+    sa.Column('output', sa.JSON(), nullable=True),
+    sa.Column('output_hash', sa.String(length=40), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('llm_usage', sa.JSON(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(
+        ['report_id'], ['company_report.id'],
+        name=op.f('fk_pipeline_stage_run_report_id_company_report'), ondelete='CASCADE'
+    ),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_pipeline_stage_run'))
+    )
+    op.create_index(op.f('ix_pipeline_stage_run_id'), 'pipeline_stage_run', ['id'], unique=False)
+    op.create_index(op.f('ix_pipeline_stage_run_input_hash'), 'pipeline_stage_run', ['input_hash'], unique=False)
+    op.create_index(op.f('ix_pipeline_stage_run_report_id'), 'pipeline_stage_run', ['report_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_pipeline_stage_run_report_id'), table_name='pipeline_stage_run')
+    op.drop_index(op.f('ix_pipeline_stage_run_input_hash'), table_name='pipeline_stage_run')
+    op.drop_index(op.f('ix_pipeline_stage_run_id'), table_name='pipeline_stage_run')
+    op.drop_table('pipeline_stage_run')
+    stage_status_enum.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""add company_dashboard section_hashes
+
+Revision ID: b33c9c6c7ba4
+Revises: 9ebc48e72286
+Create Date: 2026-10-19 17:45:15.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b33c9c6c7ba4'
+down_revision: Union[str, None] = '9ebc48e72286'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('company_dashboard', sa.Column('section_hashes', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('company_dashboard', 'section_hashes')
@@ -0,0 +1,25 @@
+"""index source translation_of_id
+
+Revision ID: da80456ee74e
+Revises: 1bff0836719f
+Create Date: 2026-10-19 18:55:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'da80456ee74e'
+down_revision: Union[str, None] = '1bff0836719f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_source_translation_of_id'), 'source', ['translation_of_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_source_translation_of_id'), table_name='source')
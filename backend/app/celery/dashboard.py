@@ -0,0 +1,52 @@
+from app.core.celery import celery_app, get_time_limits
+from app.core.config import settings
+from app.core.database import get_db_session
+from app.core.logging import logger
+from app.core.redis import get_sync_redis
+from app.services.ai_prompt import Priority
+from app.services.circuit_breaker import LLMUnavailable
+from app.services.dashboard_cache import rebuild_dashboard, DASHBOARD_SCHEDULED_KEY
+
+assert celery_app is not None
+
+def _flag_ttl(countdown: float) -> int:
+    # outlives the wait and the run, a dead worker can't leave a company flagged forever
+    return int(countdown) + get_time_limits(settings.CELERY_LLM_QUEUE)["time_limit"]
+
+def schedule_dashboard(
+    company_id: int, countdown: float | None = None, priority: Priority = Priority.batch
+) -> bool:
+    """
+    Queue a materialization of the company dashboard. Calls while one is
+    already waiting are merged into it, returns False for those.
+    """
+    countdown = settings.DASHBOARD_DEBOUNCE_SECONDS if countdown is None else countdown
+    redis = get_sync_redis()
+    if redis is not None and not redis.set(
+        f"{DASHBOARD_SCHEDULED_KEY}{company_id}", 1, nx=True, ex=_flag_ttl(countdown)
+    ):
+        return False
+    materialize_dashboard.apply_async((company_id, priority.value), countdown=countdown) # type: ignore celery
+    return True
+
+@celery_app.task(bind=True, name="dashboard.materialize")
+def materialize_dashboard(self, company_id: int, priority: str = Priority.batch.value):
+    redis = get_sync_redis()
+    if redis is not None:
+        # data landing from here on schedules another run, this one may read before it
+        redis.delete(f"{DASHBOARD_SCHEDULED_KEY}{company_id}")
+    retry_after = None
+    try:
+        with get_db_session() as db:
+            if rebuild_dashboard(company_id, db, Priority(priority)) is None:
+                # another rebuild is running and may have read older data, go again after it
+                retry_after = settings.DASHBOARD_DEBOUNCE_SECONDS
+                logger.info(f'dashboard {company_id} is being rebuilt, retrying in {retry_after}s')
+    except LLMUnavailable as e:
+        retry_after = e.retry_after
+        logger.warning(f'dashboard {company_id}: {e}, retrying in {retry_after:.0f}s')
+    if retry_after is not None:
+        if redis is not None:
+            redis.set(f"{DASHBOARD_SCHEDULED_KEY}{company_id}", 1, ex=_flag_ttl(retry_after))
+        raise self.retry(countdown=retry_after, max_retries=settings.CELERY_TASK_RETRY_MAX)
+    return company_id
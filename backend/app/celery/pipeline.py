@@ -0,0 +1,36 @@
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.core.database import get_db_session
+from app.core.logging import logger
+from app.services.circuit_breaker import LLMUnavailable
+from app.services.pipeline import run_pipeline, PipelineCancelled, StageWaiting
+
+assert celery_app is not None
+
+def _run_stages(task, report_id: int, force: list[str] | None, queue: str):
+    with get_db_session() as db:
+        try:
+            handoff = run_pipeline(db, report_id, force or (), queue)
+        except PipelineCancelled as e:
+            logger.info(f'pipeline {report_id} cancelled: {e}')
+            return None
+        except (LLMUnavailable, StageWaiting) as e:
+            if e.retry_after is None:
+                raise
+            # the stage runs keep the resume state, finished stages are skipped on retry
+            logger.warning(f'pipeline {report_id}: {e}, retrying in {e.retry_after:.0f}s')
+            raise task.retry(
+                exc=e, countdown=e.retry_after, max_retries=settings.CELERY_TASK_RETRY_MAX
+            )
+    if handoff:
+        next_task = run_ocr_stages if handoff.queue == settings.CELERY_OCR_QUEUE else run_report_pipeline
+        next_task.apply_async((report_id, handoff.force)) # type: ignore celery
+    return report_id
+
+@celery_app.task(bind=True, name="pipeline.ocr")
+def run_ocr_stages(self, report_id: int, force: list[str] | None = None):
+    return _run_stages(self, report_id, force, settings.CELERY_OCR_QUEUE)
+
+@celery_app.task(bind=True, name="pipeline.run_report")
+def run_report_pipeline(self, report_id: int, force: list[str] | None = None):
+    return _run_stages(self, report_id, force, settings.CELERY_LLM_QUEUE)
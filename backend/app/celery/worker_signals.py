@@ -0,0 +1,38 @@
+import time
+from celery.signals import worker_init, worker_process_shutdown, task_prerun, task_postrun
+from app.core.metrics import (
+    start_metrics_server, mark_process_dead, db_hold_scope,
+    DB_TASK_CONNECTION_HOLD, DB_TASK_HOLD_RATIO,
+)
+
+# task id -> (open scope, start time), prerun and postrun run in the task's thread
+_running: dict[str, tuple] = {}
+
+def serve_worker_metrics(port: int):
+    """Serve /metrics on port once the worker starts and clean up after dead children."""
+    @worker_init.connect(weak=False)
+    def start_metrics(**kwargs):
+        if port:
+            start_metrics_server(port)
+
+    @worker_process_shutdown.connect(weak=False)
+    def cleanup_metrics(pid=None, **kwargs):
+        if pid:
+            mark_process_dead(pid)
+
+@task_prerun.connect
+def start_db_hold_scope(task_id=None, task=None, **kwargs):
+    scope = db_hold_scope(task.name if task else "unknown")
+    _running[task_id] = (scope, scope.__enter__(), time.perf_counter()) # type: ignore
+
+@task_postrun.connect
+def finish_db_hold_scope(task_id=None, **kwargs):
+    running = _running.pop(task_id, None) # type: ignore
+    if running is None:
+        return
+    scope, hold, start = running
+    scope.__exit__(None, None, None)
+    elapsed = time.perf_counter() - start
+    DB_TASK_CONNECTION_HOLD.labels(hold.task).observe(hold.seconds)
+    if elapsed > 0:
+        DB_TASK_HOLD_RATIO.labels(hold.task).observe(min(hold.seconds / elapsed, 1.0))
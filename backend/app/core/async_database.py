@@ -0,0 +1,37 @@
+"""Database connection and session management (async version, used by the api)."""
+
+from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.core.config import get_settings
+from app.core.database import DATABASE_URL, track_connection_hold
+
+settings = get_settings()
+
+# same database as the sync engine the celery workers use, through asyncpg
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+)
+track_connection_hold(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# FastAPI dependency
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for getting an async session. Nothing may lazy load through
+    it, relationships a handler reads have to be eagerly loaded.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def close_async_engine() -> None:
+    await async_engine.dispose()
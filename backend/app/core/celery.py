@@ -8,6 +8,19 @@ from app.core.logging import logger
 # Global Celery app instance
 celery_app: Optional[Celery] = None
 
+# task name -> queue, everything not listed goes to the llm queue
+TASK_QUEUES = {
+    "ocr.process_pdf": settings.CELERY_OCR_QUEUE,
+    "pipeline.ocr": settings.CELERY_OCR_QUEUE,
+    "pipeline.run_report": settings.CELERY_LLM_QUEUE,
+    "dashboard.materialize": settings.CELERY_LLM_QUEUE,
+}
+
+def get_time_limits(queue: str) -> Dict[str, int]:
+    hard = settings.CELERY_OCR_TIME_LIMIT if queue == settings.CELERY_OCR_QUEUE else settings.CELERY_LLM_TIME_LIMIT
+    # soft limit first so the task can save its progress before it is killed
+    return {"time_limit": hard, "soft_time_limit": max(hard - 60, hard * 9 // 10)}
+
 def get_celery_config() -> Dict[str, Any]:
     """
     Get Celery configuration options based on application settings.
@@ -44,7 +57,10 @@ def get_celery_config() -> Dict[str, Any]:
         "task_track_started": True,
         "task_time_limit": 30 * 60,  # 30 minutes
         "worker_max_tasks_per_child": 1000,
-        "task_default_queue": "celery",
+        "task_default_queue": settings.CELERY_LLM_QUEUE,
+        "task_routes": {name: {"queue": queue} for name, queue in TASK_QUEUES.items()},
+        "task_annotations": {name: get_time_limits(queue) for name, queue in TASK_QUEUES.items()},
+        # prefetch, pool and concurrency are set per worker profile, see app/worker.py and app/worker_llm.py
         "worker_prefetch_multiplier": 2, # lower it so dont load too much memory in advance
     }
     
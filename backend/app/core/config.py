@@ -18,6 +18,9 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 40  # Increased from 20
     DB_POOL_RECYCLE: int = 3600  # Add connection recycling (1 hour)
     DB_POOL_PRE_PING: bool = True  # Verify connections before use
+    # the api's async engine has its own pool on top of the sync one, keep both under max_connections
+    ASYNC_DB_POOL_SIZE: int = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
+    ASYNC_DB_MAX_OVERFLOW: int = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
 
     # JWT
     SECRET_KEY: str 
@@ -39,9 +42,65 @@ class Settings(BaseSettings):
     CELERY_CONCURRENCY: int = int(os.getenv("CELERY_CONCURRENCY", "2"))
     CELERY_TASK_RETRY_MAX: int = int(os.getenv("CELERY_TASK_RETRY_MAX", "3"))
     CELERY_TASK_RETRY_DELAY: int = int(os.getenv("CELERY_TASK_RETRY_DELAY", "5"))
+    # ocr runs on prefork workers holding a paddle engine of OCR_CPU_THREADS threads each, llm work on a thread pool
+    OCR_CPU_THREADS: int = int(os.getenv("OCR_CPU_THREADS", "4"))
+    CELERY_OCR_QUEUE: str = os.getenv("CELERY_OCR_QUEUE", "ocr")
+    CELERY_LLM_QUEUE: str = os.getenv("CELERY_LLM_QUEUE", "llm")
+    CELERY_OCR_CONCURRENCY: int = int(os.getenv("CELERY_OCR_CONCURRENCY", str(max(1, (os.cpu_count() or 1) // OCR_CPU_THREADS))))
+    CELERY_LLM_CONCURRENCY: int = int(os.getenv("CELERY_LLM_CONCURRENCY", "32"))
+    CELERY_OCR_PREFETCH: int = int(os.getenv("CELERY_OCR_PREFETCH", "1"))
+    CELERY_LLM_PREFETCH: int = int(os.getenv("CELERY_LLM_PREFETCH", "4"))
+    CELERY_OCR_TIME_LIMIT: int = int(os.getenv("CELERY_OCR_TIME_LIMIT", str(30 * 60)))
+    # llm tasks mostly wait on quota, unavailable upstreams requeue instead of holding the slot
+    CELERY_LLM_TIME_LIMIT: int = int(os.getenv("CELERY_LLM_TIME_LIMIT", str(45 * 60)))
+
+    # LLM settings
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    # max estimated tokens per signal analysis prompt before it is split up
+    LLM_CHUNK_TOKEN_BUDGET: int = int(os.getenv("LLM_CHUNK_TOKEN_BUDGET", "32000"))
+    # identical in-flight prompts share one upstream call, across processes via redis
+    LLM_COALESCE_LOCK_TTL: int = int(os.getenv("LLM_COALESCE_LOCK_TTL", "300"))
+    # share of rpm/tpm that batch (ingestion) calls may never use
+    LLM_INTERACTIVE_RESERVED_SHARE: float = float(os.getenv("LLM_INTERACTIVE_RESERVED_SHARE", "0.25"))
+    # provider side caching of the static system prompts, gemini refuses prompts under ~1k tokens
+    LLM_CONTEXT_CACHE_ENABLED: bool = os.getenv("LLM_CONTEXT_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    LLM_CONTEXT_CACHE_TTL: int = int(os.getenv("LLM_CONTEXT_CACHE_TTL", "3600"))
+    LLM_CONTEXT_CACHE_MIN_TOKENS: int = int(os.getenv("LLM_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+    # fail fast instead of sleeping inside a worker when gemini is down
+    LLM_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+    LLM_BREAKER_RESET_TIMEOUT: int = int(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "60"))
+    LLM_MAX_INLINE_RETRY_WAIT: float = float(os.getenv("LLM_MAX_INLINE_RETRY_WAIT", "30"))
+    # try cheaper models first for the prompt types in ai_prompt.TIER_POLICIES
+    LLM_TIERING_ENABLED: bool = os.getenv("LLM_TIERING_ENABLED", "True").lower() in ("true", "1", "t")
+    # answer metric questions from a query plan and computed figures instead of the whole dashboard
+    QUERY_PLANNER_ENABLED: bool = os.getenv("QUERY_PLANNER_ENABLED", "True").lower() in ("true", "1", "t")
+
+    # reuse the classification of near identical sections from a company's earlier reports
+    SECTION_MEMO_ENABLED: bool = os.getenv("SECTION_MEMO_ENABLED", "True").lower() in ("true", "1", "t")
+    SECTION_MEMO_MIN_SIMILARITY: float = float(os.getenv("SECTION_MEMO_MIN_SIMILARITY", "0.92"))
+    SECTION_MEMO_MIN_WORDS: int = int(os.getenv("SECTION_MEMO_MIN_WORDS", "40"))
+    # english/malay parallel sections, the malay copy is tagged and skipped by the llm stages
+    TRANSLATION_DEDUP_ENABLED: bool = os.getenv("TRANSLATION_DEDUP_ENABLED", "True").lower() in ("true", "1", "t")
+    TRANSLATION_MAX_PAGE_GAP: int = int(os.getenv("TRANSLATION_MAX_PAGE_GAP", "4"))
+    TRANSLATION_MIN_SCORE: float = float(os.getenv("TRANSLATION_MIN_SCORE", "0.6"))
+    # ocr sections are written with multi-row inserts of this many rows
+    SOURCE_INSERT_BATCH_SIZE: int = int(os.getenv("SOURCE_INSERT_BATCH_SIZE", "1000"))
+    # statement tables parsed locally at or above this confidence skip the llm
+    STATEMENT_PARSER_ENABLED: bool = os.getenv("STATEMENT_PARSER_ENABLED", "True").lower() in ("true", "1", "t")
+    STATEMENT_PARSER_MIN_CONFIDENCE: float = float(os.getenv("STATEMENT_PARSER_MIN_CONFIDENCE", "0.8"))
+    # reports finishing for a company inside this window share one dashboard rebuild
+    DASHBOARD_DEBOUNCE_SECONDS: int = int(os.getenv("DASHBOARD_DEBOUNCE_SECONDS", "60"))
+
+    # the api serves prometheus metrics on this side port, never on the public app, 0 disables it
+    METRICS_API_PORT: int = int(os.getenv("METRICS_API_PORT", "9102"))
+    # celery workers serve prometheus metrics on this port, 0 disables it
+    METRICS_WORKER_PORT: int = int(os.getenv("METRICS_WORKER_PORT", "9100"))
+    METRICS_LLM_WORKER_PORT: int = int(os.getenv("METRICS_LLM_WORKER_PORT", "9101"))
 
     LOG_LEVEL: str = "INFO"
     GEMINI_API_KEY: str
+    # point at app.devtools.fake_gemini for load tests, None uses google's endpoint
+    GEMINI_BASE_URL: Optional[str] = os.getenv("GEMINI_BASE_URL")
 
     class Config:
         env_file = ".env"
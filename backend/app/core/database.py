@@ -1,12 +1,14 @@
 """Database connection and session management (sync version)."""
 
+import time
 from contextlib import contextmanager
 from urllib.parse import quote_plus
-from sqlalchemy import create_engine, Enum as SAEnum
+from sqlalchemy import create_engine, event, Engine, Enum as SAEnum
 from sqlalchemy.orm import sessionmaker, Session, class_mapper
 from collections.abc import Mapping
 from typing import Generator
 from app.core.config import get_settings
+from app.core.metrics import observe_connection_hold
 
 settings = get_settings()
 
@@ -30,6 +32,21 @@ engine = create_engine(
     # echo=settings.ENVIRONMENT == "development",
 )
 
+def _connection_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+def _connection_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        observe_connection_hold(time.perf_counter() - checked_out_at)
+
+def track_connection_hold(engine: Engine):
+    """Export how long each pooled connection is checked out."""
+    event.listen(engine, "checkout", _connection_checkout)
+    event.listen(engine, "checkin", _connection_checkin)
+
+track_connection_hold(engine)
+
 # Create a session factory
 SessionLocal = sessionmaker(
     bind=engine,
@@ -54,6 +71,19 @@ def get_db_session_instance() -> Session:
     """Get a new session for manual connection management."""
     return SessionLocal()
 
+def release_connection(db: Session) -> bool:
+    """
+    End the session's read transaction so its connection goes back to the
+    pool before slow ocr/llm work, loaded objects stay usable
+    (expire_on_commit=False) and the next query checks out a new one.
+    Unsaved changes belong to the caller's transaction, then nothing happens.
+    """
+    if db.new or db.dirty or db.deleted:
+        return False
+    if db.in_transaction():
+        db.commit()
+    return True
+
 # Recommended to use context as much as possible
 @contextmanager
 def get_db_session():
@@ -70,64 +100,67 @@ def get_db_session():
 from collections.abc import Mapping
 from sqlalchemy.orm import class_mapper
 from sqlalchemy import Enum as SAEnum
+from typing import Any, Callable
+
+Converter = Callable[[Mapping], Any]
+_converters: dict[type, Converter] = {}
+
+def _enum_coercer(enum_class) -> Callable[[Any], Any]:
+    def coerce(value):
+        if value is not None and not isinstance(value, enum_class):
+            try:
+                return enum_class(value)
+            except ValueError:
+                raise ValueError(
+                    f"Invalid value '{value}' for enum {enum_class}"
+                )
+        return value
+    return coerce
+
+def _compile_converter(model_class) -> Converter:
+    """Resolve the columns, enum coercers and relationships of a model once."""
+    columns = [
+        (column.name, _enum_coercer(column.type.enum_class) if isinstance(column.type, SAEnum) else None)
+        for column in model_class.__table__.columns
+    ]
+    relationships = [
+        (rel.key, rel.mapper.class_, rel.uselist)
+        for rel in class_mapper(model_class).relationships
+    ]
+
+    def convert(data: Mapping):
+        obj = model_class()
+        for name, coerce in columns:
+            if name in data:
+                value = data[name]
+                setattr(obj, name, coerce(value) if coerce else value)
+        for key, target, uselist in relationships:
+            if key not in data:
+                continue
+            value = data[key]
+            # children go through the registry, models may reference each other
+            if uselist:
+                if isinstance(value, list):
+                    child = get_converter(target)
+                    setattr(obj, key, [child(item) for item in value if isinstance(item, Mapping)])
+            elif isinstance(value, Mapping):
+                setattr(obj, key, get_converter(target)(value))
+        return obj
+    return convert
+
+def get_converter(model_class) -> Converter:
+    converter = _converters.get(model_class)
+    if converter is None:
+        converter = _converters[model_class] = _compile_converter(model_class)
+    return converter
 
 def from_dict(model_class, data: dict):
     """
     Create a SQLAlchemy model instance from a dict.
-    Uses __table__ and class_mapper instead of sqlalchemy.inspect.
     Supports nested relationships.
     Automatically converts Enum columns from string values to Enum members.
+    The per-model converter is compiled on first use, see get_converter.
     """
     if data is None:
         return None
-
-    obj = model_class()
-
-    # ---- Columns ----
-    column_names = {c.name for c in model_class.__table__.columns}
-
-    for name in column_names:
-        if name in data:
-            value = data[name]
-            column = model_class.__table__.columns[name]
-
-            # If column is an Enum, convert string to Enum member
-            if isinstance(column.type, SAEnum):
-                enum_class = column.type.enum_class
-                if value is not None and not isinstance(value, enum_class):
-                    try:
-                        value = enum_class(value)
-                    except ValueError:
-                        raise ValueError(
-                            f"Invalid value '{value}' for enum {enum_class}"
-                        )
-
-            setattr(obj, name, value)
-
-    # ---- Relationships ----
-    mapper = class_mapper(model_class)
-
-    for rel in mapper.relationships:
-        key = rel.key
-        if key not in data:
-            continue
-
-        value = data[key]
-        target = rel.mapper.class_
-
-        # one-to-many / many-to-many
-        if rel.uselist:
-            if isinstance(value, list):
-                children = [
-                    from_dict(target, item)  # type: ignore
-                    for item in value
-                    if isinstance(item, Mapping)
-                ]
-                setattr(obj, key, children)
-
-        # many-to-one / one-to-one
-        else:
-            if isinstance(value, Mapping):
-                setattr(obj, key, from_dict(target, value))  # type: ignore
-
-    return obj
+    return get_converter(model_class)(data)
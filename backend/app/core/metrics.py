@@ -0,0 +1,172 @@
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Iterator
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, multiprocess, start_http_server,
+)
+
+# report/company ids are unbounded, they go to the per report breakdown and
+# the logs, never to prometheus labels
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+LLM_CALLS = Counter(
+    "llm_calls_total", "LLM calls by outcome",
+    ["call_site", "model", "schema", "outcome"],
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds", "Time spent waiting for rpm/tpm quota",
+    ["call_site", "priority"], buckets=LATENCY_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "llm_upstream_latency_seconds", "Latency of a single upstream request",
+    ["call_site", "model", "outcome"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens billed by gemini",
+    ["call_site", "model", "kind"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total", "Upstream requests retried",
+    ["call_site", "model", "reason"],
+)
+LLM_CACHE = Counter(
+    "llm_cache_total", "Calls served by a context cache or a coalesced in-flight call",
+    ["call_site", "kind"],
+)
+LLM_COST = Counter(
+    "llm_cost_usd_total", "Estimated spend from the price table",
+    ["call_site", "model"],
+)
+
+SECTION_MEMO = Counter(
+    "section_memo_total", "Sections classified from an earlier report instead of the llm",
+    ["outcome"],
+)
+SECTION_MEMO_SCORE = Histogram(
+    "section_memo_match_score", "Similarity of reused near duplicate sections",
+    buckets=(0.9, 0.92, 0.94, 0.96, 0.98, 1.0),
+)
+
+STATEMENT_PARSER = Counter(
+    "statement_parser_total", "Statement tables parsed locally or sent to the llm",
+    ["statement", "outcome"],
+)
+
+DB_CONNECTION_HOLD = Histogram(
+    "db_connection_hold_seconds", "Time a pooled connection stayed checked out",
+    ["task"], buckets=LATENCY_BUCKETS,
+)
+DB_TASK_CONNECTION_HOLD = Histogram(
+    "db_task_connection_hold_seconds", "Total connection hold time of one celery task run",
+    ["task"], buckets=LATENCY_BUCKETS + (256, 512, 1024),
+)
+DB_TASK_HOLD_RATIO = Histogram(
+    "db_task_connection_hold_ratio", "Share of a celery task run spent holding a connection",
+    ["task"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0),
+)
+
+def call_site(prompt_type: str | None) -> str:
+    return (prompt_type or "text").split(".")[0]
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Registry to expose. With PROMETHEUS_MULTIPROC_DIR set (gunicorn/prefork
+    celery children) the values live in files shared by all processes.
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def start_metrics_server(port: int):
+    """Serve /metrics on a side port, celery workers have no http app and the api's is public."""
+    start_http_server(port, registry=metrics_registry())
+
+def mark_process_dead(pid: int):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+@dataclass
+class CallSiteUsage:
+    calls: int = 0
+    seconds: float = 0.0
+    queue_wait: float = 0.0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    cache_hits: int = 0
+    cost: float = 0.0
+
+class LLMUsage:
+    """Per report breakdown of llm time and spend, keyed by call site."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sites: dict[str, CallSiteUsage] = {}
+
+    def add(self, site: str, **values):
+        with self._lock:
+            usage = self.sites.setdefault(site, CallSiteUsage())
+            for key, value in values.items():
+                setattr(usage, key, getattr(usage, key) + value)
+
+    def to_dict(self, previous: dict | None = None) -> dict:
+        """Serialize, adding on top of a previous breakdown (e.g. before a rerun)."""
+        res = {site: dict(usage) for site, usage in (previous or {}).items()}
+        with self._lock:
+            for site, usage in self.sites.items():
+                merged = res.setdefault(site, {})
+                for key, value in asdict(usage).items():
+                    merged[key] = merged.get(key, 0) + value
+        return res
+
+@dataclass
+class LLMScope:
+    report_id: int | None = None
+    company_id: int | None = None
+    usage: LLMUsage | None = None
+
+_llm_scope: ContextVar[LLMScope | None] = ContextVar("llm_scope", default=None)
+
+def current_llm_scope() -> LLMScope | None:
+    return _llm_scope.get()
+
+@contextmanager
+def llm_scope(report_id: int | None = None, company_id: int | None = None) -> Iterator[LLMUsage]:
+    """
+    Attribute every llm call made inside the block (and in threads started
+    with a copied context) to this report/company.
+    """
+    scope = LLMScope(report_id, company_id, LLMUsage())
+    token = _llm_scope.set(scope)
+    try:
+        yield scope.usage # type: ignore
+    finally:
+        _llm_scope.reset(token)
+
+@dataclass
+class DBHoldScope:
+    task: str
+    seconds: float = 0.0
+
+_db_hold_scope: ContextVar[DBHoldScope | None] = ContextVar("db_hold_scope", default=None)
+
+def observe_connection_hold(seconds: float):
+    """Called on pool checkin, attributes the hold time to the running task."""
+    scope = _db_hold_scope.get()
+    DB_CONNECTION_HOLD.labels(scope.task if scope else "api").observe(seconds)
+    if scope:
+        scope.seconds += seconds
+
+@contextmanager
+def db_hold_scope(task: str) -> Iterator[DBHoldScope]:
+    scope = DBHoldScope(task)
+    token = _db_hold_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _db_hold_scope.reset(token)
@@ -1,6 +1,7 @@
 import traceback
 from typing import Optional
 import redis.asyncio as redis
+from redis import Redis as SyncRedis, ConnectionPool as SyncConnectionPool
 from redis.asyncio import Redis, ConnectionPool
 
 from app.core.config import settings
@@ -8,6 +9,8 @@ from app.core.logging import logger
 
 # Global Redis connection pool
 redis_pool: Optional[ConnectionPool] = None
+# Blocking pool for code running outside the event loop (celery tasks, llm client)
+sync_redis_pool: Optional[SyncConnectionPool] = None
 
 
 async def get_redis_pool() -> Optional[ConnectionPool]:
@@ -64,6 +67,40 @@ async def get_redis() -> Optional[Redis]:
         return None
 
 
+def get_sync_redis() -> Optional[SyncRedis]:
+    """
+    Get a blocking Redis client for sync code paths (celery workers, llm client).
+    Returns None if Redis is disabled or the pool cannot be created.
+    """
+    global sync_redis_pool
+
+    if not settings.REDIS_ENABLED:
+        return None
+
+    if sync_redis_pool is None:
+        try:
+            redis_kwargs = {
+                "decode_responses": True,
+                "encoding": "utf-8",
+                "max_connections": settings.REDIS_POOL_SIZE,
+                "socket_timeout": settings.REDIS_TIMEOUT,
+                "socket_connect_timeout": settings.REDIS_TIMEOUT,
+            }
+
+            if settings.REDIS_PASSWORD:
+                redis_kwargs["password"] = settings.REDIS_PASSWORD
+
+            sync_redis_pool = SyncConnectionPool.from_url(
+                settings.REDIS_URL,
+                **redis_kwargs
+            )
+        except Exception as e:
+            logger.error(f"Failed to create sync Redis connection pool: {str(e)}")
+            return None
+
+    return SyncRedis(connection_pool=sync_redis_pool)
+
+
 async def close_redis_pool() -> None:
     """Close the Redis connection pool if it exists."""
     global redis_pool
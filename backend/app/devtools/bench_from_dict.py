@@ -0,0 +1,90 @@
+"""
+Compare the compiled from_dict converters against the reflective version
+they replaced, on the payloads save_ai_response_schema converts.
+
+    python -m app.devtools.bench_from_dict --iterations 20000
+
+No database is needed, the objects are transient.
+"""
+import argparse
+import time
+from collections.abc import Mapping
+
+from sqlalchemy import Enum as SAEnum
+from sqlalchemy.orm import class_mapper
+
+from app.core.database import from_dict
+from app.models.report import ReportingPeriod, CompanyReport
+from app.models.source import Source
+
+def reflective_from_dict(model_class, data: dict):
+    """The previous from_dict, kept here as the baseline."""
+    if data is None:
+        return None
+    obj = model_class()
+    column_names = {c.name for c in model_class.__table__.columns}
+    for name in column_names:
+        if name in data:
+            value = data[name]
+            column = model_class.__table__.columns[name]
+            if isinstance(column.type, SAEnum):
+                enum_class = column.type.enum_class
+                if value is not None and not isinstance(value, enum_class):
+                    try:
+                        value = enum_class(value)
+                    except ValueError:
+                        raise ValueError(f"Invalid value '{value}' for enum {enum_class}")
+            setattr(obj, name, value)
+    mapper = class_mapper(model_class)
+    for rel in mapper.relationships:
+        key = rel.key
+        if key not in data:
+            continue
+        value = data[key]
+        target = rel.mapper.class_
+        if rel.uselist:
+            if isinstance(value, list):
+                setattr(obj, key, [
+                    reflective_from_dict(target, item) for item in value if isinstance(item, Mapping)
+                ])
+        elif isinstance(value, Mapping):
+            setattr(obj, key, reflective_from_dict(target, value))
+    return obj
+
+PAYLOADS = [
+    (ReportingPeriod, {"fiscal_year": 2024, "year": 2024, "confidence": 0.9, "remarks": None}),
+    (Source, {
+        "title": "Chairman statement", "body": "Revenue grew by 12% to RM1.2 billion.",
+        "tables": "", "page_number": 4, "statement_type": "income_statement",
+    }),
+    (CompanyReport, {
+        "file_key": "bench/report.pdf", "report_year": 2024, "total_pages": 180,
+        "report_sources": [{"title": f"Section {i}", "body": "text", "page_number": i} for i in range(5)],
+    }),
+]
+
+def timed(label: str, convert, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for model, payload in PAYLOADS:
+            convert(model, payload)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / (iterations * len(PAYLOADS)) * 1e6
+    print(f"{label:<12}{elapsed:>10.3f}{per_call:>12.2f}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    # warm up the mappers and the converter registry before timing either side
+    for model, payload in PAYLOADS:
+        from_dict(model, payload)
+        reflective_from_dict(model, payload)
+    print(f"{'version':<12}{'sec':>10}{'us/call':>12}")
+    before = timed("reflective", reflective_from_dict, args.iterations)
+    after = timed("compiled", from_dict, args.iterations)
+    print(f"speed-up {before / after:.2f}x")
+
+if __name__ == "__main__":
+    main()
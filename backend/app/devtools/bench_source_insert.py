@@ -0,0 +1,77 @@
+"""
+Time the source write of a large ocr result through save_text_sections,
+one row per INSERT (what the per-row ORM flush used to cost) against the
+multi-row batches.
+
+    python -m app.devtools.bench_source_insert --sections 5000 --batch-sizes 1,250,1000,5000
+
+Runs against the configured postgres inside a transaction that is rolled
+back. Every batch size writes to its own report created for the run, so
+only the insert is timed and not the delete of the previous run's rows.
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from app.core.database import SessionLocal
+from app.models.report import CompanyReport
+from app.schemas.classify import TextSection, SectionTypes
+from app.services.organize_section import save_text_sections
+
+WORDS = (
+    "group revenue increased driven by higher demand in the plantation segment while "
+    "operating costs rose due to labour shortages the board remains cautious on the "
+    "outlook given currency volatility and expects the new refinery to lift margins"
+).split()
+
+def make_pages(sections: int, per_page: int = 8) -> list[list[TextSection]]:
+    pages = []
+    for start in range(0, sections, per_page):
+        page = []
+        for i in range(start, min(start + per_page, sections)):
+            page.append(TextSection(type=SectionTypes.paragraph_title, content=f"Section {i + 1}"))
+            page.append(TextSection(
+                type=SectionTypes.text, content=" ".join(random.choices(WORDS, k=random.randint(40, 250)))
+            ))
+            if random.random() < 0.1:
+                page.append(TextSection(
+                    type=SectionTypes.table,
+                    content="<table><tr><td>Revenue</td><td>1,024</td></tr></table>"
+                ))
+        pages.append(page)
+    return pages
+
+def new_report(db, label: str) -> CompanyReport:
+    report = CompanyReport(file_key=f"bench/source_insert_{label}.pdf", uploaded_at=datetime.now())
+    db.add(report)
+    db.flush()
+    return report
+
+def timed(label: str, op) -> None:
+    start = time.perf_counter()
+    rows = op()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20}{rows:>8}{elapsed:>10.2f}{rows / elapsed if elapsed else 0:>12.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=5000)
+    parser.add_argument("--batch-sizes", default="1,250,1000,5000")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    pages = make_pages(args.sections)
+
+    db = SessionLocal()
+    try:
+        print(f"{'path':<20}{'rows':>8}{'sec':>10}{'rows/s':>12}")
+        for size in args.batch_sizes.split(","):
+            report = new_report(db, size)
+            timed(f"batch={size}", lambda: len(save_text_sections(db, report, pages, int(size))))
+    finally:
+        db.rollback()
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Local stand-in for the subset of the Gemini REST API the backend uses:
+generateContent and cachedContents. Answers are random JSON that validates
+against the request's responseSchema, so the pipeline runs end to end
+without calling Google.
+
+    FAKE_GEMINI_LATENCY_MEDIAN=1.5 FAKE_GEMINI_429_RATE=0.05 \\
+        uvicorn app.devtools.fake_gemini:app --port 8090
+
+then point the backend at it with GEMINI_BASE_URL=http://localhost:8090
+"""
+import os
+import json
+import math
+import random
+import asyncio
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# latency is log-normal around the median, sigma sets how fat the tail is
+LATENCY_MEDIAN = float(os.getenv("FAKE_GEMINI_LATENCY_MEDIAN", "1.0"))
+LATENCY_SIGMA = float(os.getenv("FAKE_GEMINI_LATENCY_SIGMA", "0.5"))
+ERROR_RATE = float(os.getenv("FAKE_GEMINI_ERROR_RATE", "0.0"))
+RATE_LIMIT_RATE = float(os.getenv("FAKE_GEMINI_429_RATE", "0.0"))
+RETRY_DELAY = float(os.getenv("FAKE_GEMINI_RETRY_DELAY", "2"))
+# output tokens are not known from the schema, pretend every field costs this many
+TOKENS_PER_FIELD = int(os.getenv("FAKE_GEMINI_TOKENS_PER_FIELD", "12"))
+
+app = FastAPI(title="fake gemini")
+cached_contents: dict[str, dict] = {}
+counters = {"requests": 0, "errors": 0, "rate_limited": 0, "cache_hits": 0}
+
+WORDS = (
+    "revenue growth margin expansion regional market digital strategy risk "
+    "exposure liquidity segment demand outlook capital efficiency supply"
+).split()
+
+def _error(code: int, status: str, message: str, details: list | None = None):
+    error = {"code": code, "message": message, "status": status}
+    if details:
+        error["details"] = details
+    return JSONResponse(status_code=code, content={"error": error})
+
+def _count_tokens(payload) -> int:
+    return max(1, len(json.dumps(payload)) // 4)
+
+def fake_value(schema: dict, name: str = ""):
+    """Random value for a gemini (OpenAPI subset) or JSON schema node."""
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if str(s.get("type", "")).lower() != "null"]
+        return fake_value(random.choice(options) if options else {}, name)
+    if schema.get("enum"):
+        return random.choice(schema["enum"])
+    type_ = str(schema.get("type", "string")).lower()
+    if type_ == "object":
+        props = schema.get("properties", {})
+        required = set(schema.get("required", props))
+        return {
+            key: fake_value(sub, key) for key, sub in props.items()
+            if key in required or random.random() < 0.7
+        }
+    if type_ == "array":
+        return [fake_value(schema.get("items", {}), name) for _ in range(random.randint(1, 3))]
+    if type_ == "boolean":
+        return random.random() < 0.5
+    if type_ == "integer":
+        if "year" in name.lower():
+            return random.randint(2019, 2024)
+        if "id" in name.lower():
+            return random.randint(1, 500)
+        return random.randint(int(schema.get("minimum", 0)), int(schema.get("maximum", 1000)))
+    if type_ == "number":
+        if "confidence" in name.lower() or "score" in name.lower():
+            return round(random.uniform(0.55, 1.0), 2)
+        low, high = schema.get("minimum", 0), schema.get("maximum", 1_000_000)
+        return round(random.uniform(low, high), 2)
+    return " ".join(random.choices(WORDS, k=random.randint(3, 12)))
+
+async def _simulate_upstream():
+    counters["requests"] += 1
+    await asyncio.sleep(random.lognormvariate(math.log(LATENCY_MEDIAN), LATENCY_SIGMA))
+    roll = random.random()
+    if roll < RATE_LIMIT_RATE:
+        counters["rate_limited"] += 1
+        return _error(429, "RESOURCE_EXHAUSTED", "fake quota exceeded", [{
+            "@type": "type.googleapis.com/google.rpc.RetryInfo",
+            "retryDelay": f"{RETRY_DELAY:.0f}s",
+        }])
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        counters["errors"] += 1
+        return _error(random.choice((500, 503)), "INTERNAL", "fake upstream failure")
+    return None
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    body = await request.json()
+    error = await _simulate_upstream()
+    if error:
+        return error
+
+    prompt_tokens = _count_tokens(body.get("contents")) + _count_tokens(body.get("systemInstruction"))
+    cached_tokens = 0
+    if body.get("cachedContent"):
+        cached = cached_contents.get(body["cachedContent"])
+        if not cached:
+            return _error(404, "NOT_FOUND", f"cache {body['cachedContent']} not found")
+        counters["cache_hits"] += 1
+        cached_tokens = cached["usageMetadata"]["totalTokenCount"]
+        prompt_tokens += cached_tokens
+
+    config = body.get("generationConfig", {})
+    schema = config.get("responseSchema") or config.get("responseJsonSchema")
+    if schema:
+        answer = fake_value(schema)
+        text = json.dumps(answer)
+        output_tokens = TOKENS_PER_FIELD * max(1, len(json.dumps(answer)) // 40)
+    else:
+        text = " ".join(random.choices(WORDS, k=60))
+        output_tokens = len(text) // 4
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "cachedContentTokenCount": cached_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+        "modelVersion": model,
+    }
+
+def _expire_time(ttl: str | None) -> str:
+    seconds = float((ttl or "3600s").rstrip("s"))
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+@app.post("/v1beta/cachedContents")
+async def create_cached_content(request: Request):
+    body = await request.json()
+    name = f"cachedContents/{uuid4().hex[:12]}"
+    cached_contents[name] = {
+        "name": name,
+        "model": body.get("model"),
+        "displayName": body.get("displayName"),
+        "expireTime": _expire_time(body.get("ttl")),
+        "usageMetadata": {
+            "totalTokenCount": _count_tokens(body.get("systemInstruction"))
+            + _count_tokens(body.get("contents")),
+        },
+    }
+    return cached_contents[name]
+
+@app.get("/v1beta/cachedContents/{cache_id}")
+async def get_cached_content(cache_id: str):
+    cached = cached_contents.get(f"cachedContents/{cache_id}")
+    if not cached:
+        return _error(404, "NOT_FOUND", f"cache {cache_id} not found")
+    return cached
+
+@app.patch("/v1beta/cachedContents/{cache_id}")
+async def update_cached_content(cache_id: str, request: Request):
+    cached = cached_contents.get(f"cachedContents/{cache_id}")
+    if not cached:
+        return _error(404, "NOT_FOUND", f"cache {cache_id} not found")
+    body = await request.json()
+    cached["expireTime"] = _expire_time(body.get("ttl"))
+    return cached
+
+@app.delete("/v1beta/cachedContents/{cache_id}")
+async def delete_cached_content(cache_id: str):
+    cached_contents.pop(f"cachedContents/{cache_id}", None)
+    return {}
+
+@app.get("/stats")
+async def stats():
+    return {**counters, "cached_contents": len(cached_contents)}
@@ -0,0 +1,79 @@
+"""
+Fire concurrent requests at the read endpoints of a running api and report
+throughput and tail latency per path.
+
+    uvicorn app.main:app --workers 1 &
+    python -m app.devtools.loadtest_api --base-url http://localhost:8000 \\
+        --paths /dashboard/company,/dashboard/company/1,/data/incomplete_task \\
+        --requests 500 --concurrency 50
+
+Run it once against a build on the sync session and once on the async one,
+with a single uvicorn worker, to compare how many requests the event loop
+serves while queries are in flight.
+"""
+import asyncio
+import argparse
+import statistics
+import time
+
+import httpx
+
+from app.core.config import settings
+
+async def run_path(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    res = {
+        "path": path, "ok": len(latencies), "errors": errors, "seconds": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        res.update(p50=round(cuts[49], 3), p95=round(cuts[94], 3), p99=round(cuts[98], 3))
+    return res
+
+async def run(args) -> list[dict]:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    base_url = args.base_url.rstrip("/") + settings.API_PREFIX
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        return [
+            await run_path(client, path.strip(), args.requests, args.concurrency)
+            for path in args.paths.split(",")
+        ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--paths", default="/dashboard/company,/data/incomplete_task")
+    parser.add_argument("--requests", type=int, default=500, help="requests per path")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'path':<32}{'ok':>6}{'err':>5}{'sec':>8}{'req/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for res in results:
+        print(
+            f"{res['path']:<32}{res['ok']:>6}{res['errors']:>5}{res['seconds']:>8}{res['rps']:>9}"
+            f"{res.get('p50', '-'):>8}{res.get('p95', '-'):>8}{res.get('p99', '-'):>8}"
+        )
+
+if __name__ == "__main__":
+    main()
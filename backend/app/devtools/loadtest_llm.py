@@ -0,0 +1,172 @@
+"""
+Drive the LLM paths of the pipeline against app.devtools.fake_gemini and
+report throughput and tail latency per scenario.
+
+    GEMINI_BASE_URL=http://localhost:8090 python -m app.devtools.loadtest_llm \\
+        --scenarios classify,extract_text,dashboard,ask --iterations 20 --concurrency 4
+
+Everything runs on transient ORM objects, nothing is written to the database.
+The dashboard scenario calls the update_dashboard helpers on the reporting
+periods built by extract_text, since update_dashboard itself loads from the db.
+The ask scenario goes through the query planner, which reads the stored
+companies and statements, so it needs the configured database to be reachable.
+"""
+import json
+import asyncio
+import random
+import argparse
+import statistics
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.async_database import AsyncSessionLocal
+from app.models.report import Company, CompanyReport
+from app.models.source import Source, PossibleSignal
+from app.schemas.ask_bot import UserQuestion
+from app.services.ai_prompt import get_gemini_client
+from app.services.classify import classify_text_sections
+from app.services.text_analysis import extract_text_from_sources
+from app.services.dashboard import adjust_business_sum, adjust_risk_assess, overall_assess
+from app.services.chatbot import make_conversation
+
+WORDS = (
+    "group revenue increased driven by higher demand in the plantation segment while "
+    "operating costs rose due to labour shortages the board remains cautious on the "
+    "outlook given currency volatility and expects the new refinery to lift margins"
+).split()
+
+def _text(words: int) -> str:
+    return " ".join(random.choices(WORDS, k=words))
+
+def make_sources(count: int, offset: int = 0) -> list[Source]:
+    sources = []
+    for i in range(count):
+        source = Source(
+            id=offset + i + 1, page_number=i // 3 + 1,
+            title=f"Section {i + 1}", body=_text(random.randint(80, 400)),
+            tables=None, signals=random.sample(list(PossibleSignal), k=random.randint(1, 2)),
+        )
+        if random.random() < 0.1:
+            source.tables = "<table><tr><td>Revenue</td><td>1,024</td></tr></table>"
+        sources.append(source)
+    return sources
+
+def make_report(sections: int, offset: int = 0) -> CompanyReport:
+    report = CompanyReport(
+        file_key=f"loadtest/{offset}.pdf", uploaded_at=datetime.now(), report_year=2024
+    )
+    report.report_sources = make_sources(sections, offset)
+    report.company = Company(company_name=f"Loadtest {offset} Bhd")
+    return report
+
+def start_event_loop() -> asyncio.AbstractEventLoop:
+    """One loop for every async call, like the api process, pooled connections are bound to it."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="loadtest-loop", daemon=True).start()
+    return loop
+
+async def ask(i: int):
+    async with AsyncSessionLocal() as db:
+        return await make_conversation(
+            UserQuestion(message=_text(20), conversationHistory=[_text(15) for _ in range(i % 4)]),
+            db,
+        )
+
+def run_scenario(name: str, op: Callable[[int], object], iterations: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+
+    def timed(i: int):
+        start = time.perf_counter()
+        op(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=name) as pool:
+        for future in [pool.submit(timed, i) for i in range(iterations)]:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors += 1
+                logger.warning(f"{name} iteration failed: {e}")
+    elapsed = time.perf_counter() - start
+
+    res = {
+        "scenario": name, "ops": len(latencies), "errors": errors,
+        "seconds": round(elapsed, 2),
+        "throughput": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        res.update(p50=round(cuts[49], 3), p95=round(cuts[94], 3), p99=round(cuts[98], 3))
+    elif latencies:
+        res.update(p50=latencies[0], p95=latencies[0], p99=latencies[0])
+    return res
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="classify,extract_text,dashboard,ask")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sections", type=int, default=30, help="sources per synthetic report")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--rpm", type=int, default=None,
+        help="override the client rpm limit, leave unset to test the real limiter"
+    )
+    parser.add_argument("--tpm", type=int, default=None, help="override the client tpm limit")
+    parser.add_argument(
+        "--allow-real-api", action="store_true",
+        help="run even though GEMINI_BASE_URL is not set (bills the real api)"
+    )
+    args = parser.parse_args()
+    if not settings.GEMINI_BASE_URL and not args.allow_real_api:
+        parser.error("GEMINI_BASE_URL is not set, start app.devtools.fake_gemini and point at it")
+    random.seed(args.seed)
+    client = get_gemini_client()
+    if args.rpm:
+        client.rpm_limit = args.rpm
+    if args.tpm:
+        client.tpm_limit = args.tpm
+
+    loop = start_event_loop()
+    reports = [make_report(args.sections, i * args.sections) for i in range(args.iterations)]
+    scenarios: dict[str, Callable[[int], object]] = {
+        "classify": lambda i: classify_text_sections(reports[i].report_sources),
+        "extract_text": lambda i: extract_text_from_sources(
+            reports[i], reports[i].company, expected_year=reports[i].report_year
+        ),
+        "dashboard": lambda i: overall_assess({
+            "businessStrategy": adjust_business_sum(reports[i].company.reporting_period, get_gemini_client()),
+            "riskAssessment": adjust_risk_assess(reports[i].company.reporting_period, get_gemini_client()),
+        }, get_gemini_client()),
+        "ask": lambda i: asyncio.run_coroutine_threadsafe(ask(i), loop).result(),
+    }
+
+    results = []
+    for name in args.scenarios.split(","):
+        name = name.strip()
+        if name not in scenarios:
+            parser.error(f"unknown scenario {name}, pick from {', '.join(scenarios)}")
+        logger.info(f"running {name}: {args.iterations} iterations x {args.concurrency} concurrent")
+        results.append(run_scenario(name, scenarios[name], args.iterations, args.concurrency))
+
+    print(f"{'scenario':<14}{'ops':>6}{'err':>5}{'sec':>9}{'ops/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for res in results:
+        print(
+            f"{res['scenario']:<14}{res['ops']:>6}{res['errors']:>5}{res['seconds']:>9}"
+            f"{res['throughput']:>9}{res.get('p50', '-'):>8}{res.get('p95', '-'):>8}{res.get('p99', '-'):>8}"
+        )
+    print(json.dumps({
+        "tokens": client.token_usage_stats(),
+        "queue_wait": client.queue_wait_usage_stats(),
+        "tiering": client.tier_usage_stats(),
+    }, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
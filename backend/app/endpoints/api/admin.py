@@ -3,6 +3,11 @@ from sqlalchemy import MetaData
 from sqlalchemy.orm import Session
 from app.models.base import Base
 from app.core.database import engine, get_db
+from app.core.redis import get_redis
+from app.services.ai_prompt import (
+    get_gemini_client, PromptTokenStats, TierStats, tier_policy,
+    TOKEN_STATS_KEY, QUEUE_WAIT_KEY, TIER_STATS_KEY
+)
 
 def init_db():
     # This creates all tables defined in models that inherit from Base
@@ -61,4 +66,58 @@ async def admin_get_sht(db: Session = Depends(get_db)):
         print('growth')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return "Init all db model orm successful"
\ No newline at end of file
+    return "Init all db model orm successful"
+
+@router.get('/llm/token_stats')
+async def admin_llm_token_stats():
+    """Token usage per prompt type, summed over every process that reported to redis."""
+    redis_client = await get_redis()
+    if redis_client is None:
+        return {"source": "process", "stats": get_gemini_client().token_usage_stats()}
+    stats = {}
+    async for key in redis_client.scan_iter(match=f"{TOKEN_STATS_KEY}*"):
+        raw = await redis_client.hgetall(key)
+        buffer = PromptTokenStats(**{
+            k: int(v) for k, v in raw.items() if k in PromptTokenStats.__dataclass_fields__
+        })
+        stats[key.removeprefix(TOKEN_STATS_KEY)] = buffer.to_dict()
+    return {"source": "redis", "stats": stats}
+
+@router.get('/llm/queue_wait')
+async def admin_llm_queue_wait():
+    """Time spent waiting for rpm/tpm quota per priority class."""
+    local = get_gemini_client().queue_wait_usage_stats()
+    redis_client = await get_redis()
+    if redis_client is None:
+        return {"process": local}
+    throttled = {}
+    async for key in redis_client.scan_iter(match=f"{QUEUE_WAIT_KEY}*"):
+        raw = await redis_client.hgetall(key)
+        throttled[key.removeprefix(QUEUE_WAIT_KEY)] = {
+            "throttled": int(raw.get("throttled", 0)),
+            "total_wait": float(raw.get("total_wait", 0)),
+        }
+    return {"process": local, "throttled": throttled}
+
+@router.get('/llm/tiering')
+async def admin_llm_tiering():
+    """Escalations, latency and cost saved by trying cheaper models first, per prompt type."""
+    redis_client = await get_redis()
+    if redis_client is None:
+        return {"source": "process", "stats": get_gemini_client().tier_usage_stats()}
+    stats = {}
+    async for key in redis_client.scan_iter(match=f"{TIER_STATS_KEY}*"):
+        raw = await redis_client.hgetall(key)
+        buffer = TierStats()
+        for field, value in raw.items():
+            name, _, model = field.partition(":")
+            if model:
+                getattr(buffer, name)[model] = float(value) if name == "latency" else int(value)
+            elif name in ("calls", "escalations"):
+                setattr(buffer, name, int(value))
+            else:
+                setattr(buffer, name, float(value))
+        prompt_type = key.removeprefix(TIER_STATS_KEY)
+        policy = tier_policy(prompt_type)
+        stats[prompt_type] = buffer.to_dict(policy.models[-1] if policy else None)
+    return {"source": "redis", "stats": stats}
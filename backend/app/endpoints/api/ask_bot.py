@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy import Select
 from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import from_dict, get_db
+from app.core.async_database import get_async_db
 from app.schemas.ask_bot import UserQuestion, ChatResponse
 from app.models.report import Company
 from app.services.classify import extract_company_name_user_prompt
@@ -13,9 +15,9 @@ router = APIRouter()
 
 
 @router.post("/ask", response_model=ChatResponse)
-async def ask_bot(question: UserQuestion, db: Session = Depends(get_db)) -> ChatResponse:
+async def ask_bot(question: UserQuestion, db: AsyncSession = Depends(get_async_db)) -> ChatResponse:
     try:
-        response_text = make_conversation(question, db)
+        response_text = await make_conversation(question, db)
 
         return ChatResponse(success=True, message=response_text)
 
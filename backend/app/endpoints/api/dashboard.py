@@ -1,14 +1,25 @@
+import asyncio
 from typing import Any
-from fastapi import APIRouter, Depends, UploadFile, HTTPException, File
+from fastapi import APIRouter, Depends, UploadFile, HTTPException, File, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy import select, func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.file import file_manager
-from app.services.dashboard import update_dashboard, shape_dashboard_info
+from app.celery.dashboard import schedule_dashboard
+from app.services.ai_prompt import Priority
+from app.services.dashboard import shape_dashboard_info
+from app.services.ratios import company_ratios_json
+from app.services.dashboard_cache import (
+    rebuild_dashboard, read_dashboard_cache, fill_dashboard_cache, dashboard_refreshing, dashboard_envelope
+)
+from app.services.circuit_breaker import LLMUnavailable
 from app.schemas.dashboard import CompanyListing, CompanyAnalysis, CompanyInfo, CompanyAnalysisResult
+from app.schemas.ratios import CompanyRatios
 from app.models.report import CompanyReport, Company
 from app.models.dashboard import CompanyDashboard
 from app.models.task import TaskProgress
-from app.core.database import get_db
+from app.core.database import get_db_session
+from app.core.async_database import get_async_db
 from app.core.logging import logger
 
 router = APIRouter()
@@ -16,7 +27,7 @@ router = APIRouter()
 @router.get('/company', response_model=CompanyListing)
 async def get_company(
     name: str | None = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> CompanyListing:
 
     stmt = select(Company)
@@ -30,7 +41,7 @@ async def get_company(
             )
         )
 
-    companies = db.execute(stmt).scalars().all()
+    companies = (await db.execute(stmt)).scalars().all()
 
     res = CompanyListing()
     res.data = [
@@ -46,35 +57,71 @@ async def get_company(
 
 @router.get('/company/{company_id}', response_model=CompanyAnalysisResult)
 async def get_company_detail(
-    company_id: int, db: Session = Depends(get_db)
-) -> CompanyAnalysisResult:
-    company = db.execute(
+    company_id: int, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Serve the cached dashboard as is, stale ones too while a rebuild runs.
+    On a cache miss the last materialized one is loaded, a missing one is queued and answered with 202.
+    """
+    cached = await read_dashboard_cache(company_id)
+    if cached:
+        body, fresh = cached
+        refreshing = await dashboard_refreshing(company_id)
+        if not fresh and not refreshing:
+            await asyncio.to_thread(schedule_dashboard, company_id, 0, Priority.interactive)
+        return Response(content=dashboard_envelope(body, refreshing or not fresh), media_type="application/json")
+
+    company = (await db.execute(
         select(Company).where(Company.id == company_id)
-    ).scalar_one_or_none()
+    )).scalar_one_or_none()
     if not company:
         raise HTTPException(status_code=404, detail=f"Company {company_id} not found")
-    company_dashboard = db.execute(
+    company_dashboard = (await db.execute(
         select(CompanyDashboard).where(CompanyDashboard.company_id == company_id)
-    ).scalar_one_or_none()
-    try:
-        if not company_dashboard:
-            buffer = await update_company_dashboard(company_id, db)
-        elif company_dashboard.overall:
-            buffer = company_dashboard.overall
-        elif not company_dashboard.summary or not company_dashboard.details:
-            buffer = await update_company_dashboard(company_id, db)
-        else:
-            buffer = shape_dashboard_info(company, company_dashboard)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f'updating dashboard failed: {e}')
-    return CompanyAnalysisResult(
-        success=True,
-        data=CompanyAnalysis.model_validate(buffer)
-    )
+    )).scalar_one_or_none()
+    buffer = None
+    if company_dashboard and company_dashboard.overall:
+        buffer = company_dashboard.overall
+    elif company_dashboard and company_dashboard.summary and company_dashboard.details:
+        buffer = shape_dashboard_info(company, company_dashboard)
+    refreshing = await dashboard_refreshing(company_id)
+    if buffer is None:
+        if not refreshing:
+            await asyncio.to_thread(schedule_dashboard, company_id, 0, Priority.interactive)
+        return JSONResponse(
+            status_code=202,
+            content=CompanyAnalysisResult(success=True, data=None, refreshing=True).model_dump(mode='json')
+        )
+    body = CompanyAnalysis.model_validate(buffer).model_dump_json(by_alias=True)
+    fresh = await fill_dashboard_cache(company_id, body, company_dashboard.data_version) # type: ignore
+    if not fresh and not refreshing:
+        await asyncio.to_thread(schedule_dashboard, company_id, 0, Priority.interactive)
+    return Response(content=dashboard_envelope(body, refreshing or not fresh), media_type="application/json")
+
+@router.get('/company/{company_id}/ratios', response_model=CompanyRatios)
+async def get_company_ratios(company_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Financial ratios per fiscal year computed from the stored statements, served as cached json."""
+    company = (await db.execute(
+        select(Company.id).where(Company.id == company_id)
+    )).scalar_one_or_none()
+    if company is None:
+        raise HTTPException(status_code=404, detail=f"Company {company_id} not found")
+    return Response(content=await company_ratios_json(db, company_id), media_type="application/json")
+
+def _rebuild_dashboard(company_id: int, force: bool) -> dict | None:
+    with get_db_session() as db:
+        return rebuild_dashboard(company_id, db, Priority.interactive, force)
 
 @router.get('/company/{company_id}/update_dashboard', response_model=CompanyAnalysis)
-async def update_company_dashboard(
-    company_id: int, db: Session = Depends(get_db)
-):
-   buffer = update_dashboard(company_id, db)
-   return CompanyAnalysis.model_validate(buffer)
+async def update_company_dashboard(company_id: int, force: bool = False):
+    # update_dashboard is sync and prompts gemini, it runs on a worker thread
+    try:
+        buffer = await asyncio.to_thread(_rebuild_dashboard, company_id, force)
+    except LLMUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail=str(e),
+            headers={'Retry-After': str(int(e.retry_after) + 1)}
+        )
+    if buffer is None:
+        raise HTTPException(status_code=409, detail=f"Dashboard of company {company_id} is already being rebuilt")
+    return CompanyAnalysis.model_validate(buffer)
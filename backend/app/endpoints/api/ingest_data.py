@@ -1,15 +1,17 @@
 import json
 from typing import Any
 from fastapi import APIRouter, Depends, UploadFile, HTTPException, File
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from celery import chain
-from app.celery.ocr import process_pdf, analysis_ocr_result, rerun_analysis_ocr_result
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.celery.pipeline import run_ocr_stages, run_report_pipeline
 from app.services.file import file_manager
-from app.schemas.data_response import ReportProcessingStatus, IncompleteTasks
+from app.services.pipeline import STAGES, clear_cancel, request_cancel, latest_stage_runs
+from app.schemas.data_response import ReportProcessingStatus, IncompleteTasks, PipelineStageStatus
 from app.models.report import CompanyReport
-from app.models.task import TaskProgress
+from app.models.pipeline import PipelineStageRun, StageStatus
 from app.core.database import get_db
+from app.core.async_database import get_async_db
 from app.core.logging import logger
 
 router = APIRouter()
@@ -40,8 +42,7 @@ async def ingest_annual_report(
         # report.total_pages = 0
         db.add(report)
         db.commit()
-        # logger.info(f'debugging {type(process_pdf)}, {type(analysis_ocr_result)}')
-        workflow = chain(process_pdf.s(report.id), analysis_ocr_result.s()).apply_async() # type: ignore
+        workflow = run_ocr_stages.apply_async((report.id,)) # type: ignore celery
         # save celery task id into company report
         report.celery_task_id = workflow.id # type: ignore
         db.commit()
@@ -57,53 +58,93 @@ async def ingest_annual_report(
         )
 
 @router.get('/incomplete_task', response_model=list[IncompleteTasks])
-def get_all_incomplete_task_id(db: Session = Depends(get_db)):
-    data = db.execute(
-        select(TaskProgress).where(TaskProgress.complete == False)
-    ).scalars().all()
-    report_id = set()
-    for task in data:
-        report_id.add(task.report_id)
-    report_info = db.execute(
-        select(CompanyReport.id, CompanyReport.file_key)
-        .where(CompanyReport.id.in_(report_id))
-    ).fetchall()
-    res = []
-    for task in data:
-        print(type(report_info), type(report_info[0]))
-        result = next((file for id_, file in report_info if id_ == task.report_id), '')
-        res.append(
-            IncompleteTasks(
-                task_id=task.id, celery_task_id=task.celery_task_id,
-                report_id=task.report_id, file_key=result
-            )
+async def get_all_incomplete_task_id(db: AsyncSession = Depends(get_async_db)):
+    """The latest run of every report stage that is not done (running, waiting, failed or cancelled)."""
+    latest = (
+        select(func.max(PipelineStageRun.id).label('id'))
+        .group_by(PipelineStageRun.report_id, PipelineStageRun.stage)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(PipelineStageRun, CompanyReport.celery_task_id, CompanyReport.file_key)
+        .join(latest, PipelineStageRun.id == latest.c.id)
+        .join(CompanyReport, CompanyReport.id == PipelineStageRun.report_id)
+        .where(PipelineStageRun.status != StageStatus.done)
+        .order_by(PipelineStageRun.id)
+    )).all()
+    return [
+        IncompleteTasks(
+            task_id=run.id, celery_task_id=celery_task_id, report_id=run.report_id,
+            file_key=file_key, stage=run.stage, status=run.status.value,
         )
-    return res
+        for run, celery_task_id, file_key in rows
+    ]
+
+def _schedule_pipeline(report_id: int, force: list[str]):
+    clear_cancel(report_id)
+    return run_report_pipeline.apply_async(args=[report_id, force]) # type: ignore celery
 
 @router.get('/rerun_task/{task_id}', response_model=ReportProcessingStatus)
 def rerun_task(task_id: int, db: Session = Depends(get_db)):
-    task_info = db.execute(
-        select(TaskProgress).where(TaskProgress.id == task_id)
-    ).scalar_one_or_none()
-    if not task_info:
+    """Resume the report of an incomplete stage run, finished stages are skipped."""
+    run = db.get(PipelineStageRun, task_id)
+    if not run:
         raise HTTPException(
             status_code=404,
             detail=f"Cannot find task {task_id}"
         )
-    task = rerun_analysis_ocr_result.apply_async(args=[task_id]) # type: ignore celery
+    task = _schedule_pipeline(run.report_id, [])
     return ReportProcessingStatus(
-        status=f"rerun processing task {task_id} with celery task {task.id}"
-    )    
+        status=f"rerun pipeline of report {run.report_id} from {run.stage} with celery task {task.id}"
+    )
 
 @router.get('/rerun_report_analysis/{report_id}', response_model=ReportProcessingStatus)
 def rerun_analysis(report_id: int, db: Session = Depends(get_db)):
+    """Redo the statement and signal extraction of a report, and the dashboard if they change."""
     report_info = db.execute(
         select(CompanyReport)
         .where(CompanyReport.id == report_id)
     ).scalar_one_or_none()
     if not report_info:
         raise HTTPException(status_code=404, detail=f"Company report: {report_id} not found")
-    task = analysis_ocr_result.apply_async(args=[report_id, True]) # type: ignore celery
+    task = _schedule_pipeline(report_id, ['statements', 'signals'])
     return ReportProcessingStatus(
         status=f"rerun processing report {report_id} with celery task {task.id}"
-    )    
+    )
+
+@router.get('/pipeline/{report_id}', response_model=list[PipelineStageStatus])
+def get_pipeline_status(report_id: int, db: Session = Depends(get_db)):
+    return [
+        PipelineStageStatus(
+            stage=run.stage, status=run.status.value, input_hash=run.input_hash,
+            started_at=run.started_at, finished_at=run.finished_at,
+            error=run.error, llm_usage=run.llm_usage
+        )
+        for run in latest_stage_runs(db, report_id)
+    ]
+
+@router.get('/rerun_pipeline/{report_id}', response_model=ReportProcessingStatus)
+def rerun_pipeline(report_id: int, force: str | None = None, db: Session = Depends(get_db)):
+    """force: comma separated stages to redo even if their inputs did not change"""
+    report_info = db.execute(
+        select(CompanyReport)
+        .where(CompanyReport.id == report_id)
+    ).scalar_one_or_none()
+    if not report_info:
+        raise HTTPException(status_code=404, detail=f"Company report: {report_id} not found")
+    stages = [s.strip() for s in force.split(',') if s.strip()] if force else []
+    unknown = set(stages) - {stage.name for stage in STAGES}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown stages: {', '.join(sorted(unknown))}")
+    task = _schedule_pipeline(report_id, stages)
+    return ReportProcessingStatus(
+        status=f"rerun pipeline of report {report_id} with celery task {task.id}"
+    )
+
+@router.post('/cancel_report/{report_id}', response_model=ReportProcessingStatus)
+def cancel_report(report_id: int, db: Session = Depends(get_db)):
+    if not request_cancel(report_id):
+        raise HTTPException(status_code=503, detail="Redis is required to cancel a report")
+    return ReportProcessingStatus(
+        status=f"report {report_id} cancelled, running stages stop at their next step"
+    )
@@ -6,7 +6,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.redis import get_redis_pool, check_redis_connection, close_redis_pool
 from app.core.celery import create_celery_app
+from app.core.async_database import close_async_engine
 from app.core.logging import setup_logging, logger
+from app.core.metrics import start_metrics_server
 from app.endpoints.router import api_router
 
 
@@ -18,6 +20,14 @@ async def lifespan(app: FastAPI):
     """
     # Startup operations
     logger.info(f"Starting up {settings.APP_NAME}")
+
+    # Prometheus scrape endpoint, on a side port so it is not reachable through the api
+    if settings.METRICS_API_PORT:
+        try:
+            start_metrics_server(settings.METRICS_API_PORT)
+        except OSError as e:
+            # another worker of this server already serves the shared registry
+            logger.info(f"Metrics port {settings.METRICS_API_PORT} not bound: {e}")
     
     # Initialize Redis if enabled
     redis_ok = False
@@ -62,6 +72,7 @@ async def lifespan(app: FastAPI):
     
     if settings.REDIS_ENABLED:
         await close_redis_pool()
+    await close_async_engine()
         
     logger.info(f"Shutting down {settings.APP_NAME}")
 
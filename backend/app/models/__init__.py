@@ -6,3 +6,4 @@ from .source import *
 from .statements import *
 from .task import *
 from .dashboard import *
+from .pipeline import *
@@ -1,4 +1,4 @@
-from sqlalchemy import String, JSON, ForeignKey
+from sqlalchemy import String, JSON, ForeignKey, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Any
 from app.models.base import TableBase
@@ -9,6 +9,12 @@ class CompanyDashboard(TableBase): # act as a caching for company dashboard
     summary: Mapped[Any] = mapped_column(JSON, nullable=True)
     details: Mapped[Any] = mapped_column(JSON, nullable=True)
     overall: Mapped[Any] = mapped_column(JSON, nullable=True)
+    # section -> hash of the rows it was built from, unchanged sections are not prompted again
+    section_hashes: Mapped[Any] = mapped_column(JSON, nullable=True)
+    # seconds per dashboard step of the last rebuild, plus the total
+    timings: Mapped[Any] = mapped_column(JSON, nullable=True)
+    # dashboard:version of the company's periods the row was built from, None when unknown
+    data_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
     company_id: Mapped[int] = mapped_column(ForeignKey('company.id'))
     company: Mapped["Company"] = relationship(
         "Company",
@@ -0,0 +1,39 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any
+from sqlalchemy import String, DateTime, ForeignKey, JSON, Enum as ENUM
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import TableBase
+
+class StageStatus(Enum):
+    running = "running"
+    done = "done"
+    # stopped part way, output holds the resume state for the next run with the same input
+    waiting = "waiting"
+    failed = "failed"
+    cancelled = "cancelled"
+
+class PipelineStageRun(TableBase):
+    """One execution of a pipeline stage for a report, keyed by the hash of its inputs."""
+    __tablename__ = "pipeline_stage_run"
+
+    report_id: Mapped[int] = mapped_column(
+        ForeignKey("company_report.id", ondelete="CASCADE"), index=True
+    )
+    stage: Mapped[str] = mapped_column(String(32))
+    input_hash: Mapped[str] = mapped_column(String(40), index=True)
+    status: Mapped[StageStatus] = mapped_column(
+        ENUM(
+            StageStatus,
+            name="stage_status_enum",
+            native_enum=True,
+            create_constraint=True,
+        ),
+        default=StageStatus.running
+    )
+    output: Mapped[Any | None] = mapped_column(JSON, nullable=True)
+    output_hash: Mapped[str | None] = mapped_column(String(40), nullable=True)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    llm_usage: Mapped[Any | None] = mapped_column(JSON, nullable=True)
@@ -3,7 +3,7 @@ from decimal import Decimal
 from datetime import datetime
 from enum import Enum as ENUM
 from sqlalchemy import (
-    Integer, String, Float, Boolean, Numeric, 
+    Integer, String, Float, Boolean, Numeric, BigInteger,
     Enum, ForeignKey,  ARRAY,inspect
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship, foreign 
@@ -61,6 +61,24 @@ class Source(TableBase):
     )
     is_from_lastest_report: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    # fingerprints of the normalized text, used to reuse classification across reports
+    content_hash: Mapped[str | None] = mapped_column(String(40), nullable=True, index=True)
+    simhash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # indexed, deleting a report's sources has to find the rows pointing at them
+    reused_from_id: Mapped[int | None] = mapped_column(
+        ForeignKey("source.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    match_score: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    # detected language and, for the malay copy of a bilingual section, the english original
+    language: Mapped[str | None] = mapped_column(String(8), nullable=True)
+    translation_of_id: Mapped[int | None] = mapped_column(
+        ForeignKey("source.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    translation_of: Mapped["Source | None"] = relationship(
+        remote_side="Source.id", foreign_keys=[translation_of_id],
+    )
+
 class SourceLink(TableBase):
     __tablename__ = "source_link"
 
@@ -27,3 +27,5 @@ class TaskProgress(TableBase):
     )
     index: Mapped[int | None] = mapped_column(Integer, nullable=True)
     immediatory_state: Mapped[Any | None] = mapped_column(JSON, nullable=True)
+    # llm calls, seconds, tokens and cost per call site, summed over reruns
+    llm_usage: Mapped[Any | None] = mapped_column(JSON, nullable=True)
@@ -145,7 +145,8 @@ class CompanyAnalysis(BaseModel):
 
 class CompanyAnalysisResult(BaseModel):
     success: bool = Field(default=True)
-    data: CompanyAnalysis = Field(...)
+    data: CompanyAnalysis | None = Field(default=None, description="Last materialized dashboard, None until the first one")
+    refreshing: bool = Field(default=False, description="A newer dashboard is being materialized")
     error: str | None = Field(default=None)
 
 class CompanyListing(BaseModel):
@@ -1,10 +1,22 @@
+from datetime import datetime
 from pydantic import BaseModel
 
 class ReportProcessingStatus(BaseModel):
     status: str
 
 class IncompleteTasks(BaseModel):
+    # id of the pipeline stage run that did not finish
     task_id: int
-    celery_task_id: str
+    celery_task_id: str | None
     report_id: int
-    file_key: str
\ No newline at end of file
+    file_key: str
+    stage: str
+    status: str
+class PipelineStageStatus(BaseModel):
+    stage: str
+    status: str
+    input_hash: str
+    started_at: datetime
+    finished_at: datetime | None = None
+    error: str | None = None
+    llm_usage: dict | None = None
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+
+class PeriodRatios(BaseModel):
+    fiscal_year: int
+    values: dict[str, float | None] = Field(default_factory=dict, description="Metric -> value, None when an input is missing")
+    yoy: dict[str, float | None] = Field(
+        default_factory=dict,
+        description="Change against the previous fiscal year, relative for amounts and absolute for ratios"
+    )
+
+class CompanyRatios(BaseModel):
+    success: bool = Field(default=True)
+    company_id: int
+    version: int = Field(default=0, description="Data version the ratios were computed from")
+    periods: list[PeriodRatios] = Field(default_factory=list)
+    notes: dict[str, str] = Field(
+        default_factory=dict, description="Metric -> how it differs from the usual definition"
+    )
+    error: str | None = Field(default=None)
@@ -2,7 +2,7 @@ import json
 from string import Template
 from typing import Any
 from decimal import Decimal
-from app.services.ai_prompt import get_gemini_client
+from app.services.ai_prompt import get_gemini_client, Priority
 
 system_prompt = """
 You are Financial Analyst Assistant and company info is a json from a database
@@ -44,5 +44,6 @@ def ask_ai_about_company(user_prompt: str, company_info: dict[str, Any]):
     return get_gemini_client().single_prompt_answer(
         system_prompt, user_prompt_template.substitute(
             company_info=json.dumps(info), user_prompt=user_prompt
-        )
+        ),
+        prompt_type='chat.company', priority=Priority.interactive
     )
\ No newline at end of file
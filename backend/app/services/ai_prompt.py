@@ -1,24 +1,160 @@
 import json
 import time
+import hashlib
 import random
+import threading
+import httpx
 from enum import Enum
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass, asdict, field
 from datetime import datetime, timezone
-from typing import Type
+from typing import Any, Callable, Sequence, Type, TypeVar
 from functools import lru_cache
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.core.redis import get_sync_redis
+from app.core.metrics import (
+    LLM_CALLS, LLM_QUEUE_WAIT, LLM_LATENCY, LLM_TOKENS, LLM_RETRIES, LLM_CACHE, LLM_COST,
+    call_site, current_llm_scope,
+)
+from app.services.single_flight import SingleFlight
+from app.services.context_cache import ContextCacheManager
+from app.services.circuit_breaker import CircuitBreaker, LLMUnavailable
 
 from pydantic import BaseModel
 from google import genai
-from google.genai import types
-
-from pydantic import BaseModel
+from google.genai import types, errors
 
 client = None
 
+TOKEN_STATS_KEY = "llm:token_stats:"
+QUEUE_WAIT_KEY = "llm:queue_wait:"
+TIER_STATS_KEY = "llm:tier_stats:"
+WINDOW_SECONDS = 60
+
+# USD per 1M tokens (input, output), only used to report what tiering saves
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+@dataclass(frozen=True)
+class TierPolicy:
+    models: tuple[str, ...]         # cheapest first, the last answer is final
+    min_confidence: float = 0.0     # escalate when the answer is less confident
+
+# keyed by prompt_type, or by its prefix before the first dot
+TIER_POLICIES: dict[str, TierPolicy] = {
+    "classify": TierPolicy(("gemini-2.5-flash-lite", "gemini-2.5-flash"), min_confidence=0.8),
+    "company_id": TierPolicy(("gemini-2.5-flash-lite", "gemini-2.5-flash")),
+}
+
+class Priority(Enum):
+    interactive = "interactive"   # user is waiting on it: chat, dashboard reads
+    batch = "batch"               # ingestion pipeline, fills what is left
+
+class _WindowEntry:
+    """One admitted request inside the sliding minute window."""
+    __slots__ = ("ts", "tokens", "expired", "waited")
+
+    def __init__(self, ts: float, tokens: int, waited: float = 0.0):
+        self.ts = ts
+        self.tokens = tokens
+        self.expired = False
+        self.waited = waited
+
+@dataclass
+class PromptTokenStats:
+    calls: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    estimated_tokens: int = 0
+    max_prompt_tokens: int = 0
+    max_output_tokens: int = 0
+
+    def to_dict(self) -> dict:
+        res = asdict(self)
+        calls = max(self.calls, 1)
+        res["avg_prompt_tokens"] = self.prompt_tokens / calls
+        res["avg_output_tokens"] = self.output_tokens / calls
+        # >1 means the pre-call estimate undershoots what gemini bills
+        res["estimate_ratio"] = (
+            (self.prompt_tokens + self.output_tokens) / self.estimated_tokens
+            if self.estimated_tokens else None
+        )
+        return res
+
+@dataclass
+class QueueWaitStats:
+    calls: int = 0
+    throttled: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def to_dict(self) -> dict:
+        res = asdict(self)
+        res["avg_wait"] = self.total_wait / self.calls if self.calls else 0.0
+        return res
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    escalations: int = 0
+    total_latency: float = 0.0
+    cost: float = 0.0
+    # what the same calls would have cost on the final model of the policy
+    baseline_cost: float = 0.0
+    served: dict[str, int] = field(default_factory=dict)
+    attempts: dict[str, int] = field(default_factory=dict)
+    latency: dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self, final_model: str | None = None) -> dict:
+        res = asdict(self)
+        res["cost_saved"] = self.baseline_cost - self.cost
+        # latency saved is only known once the final model has been observed
+        res["latency_saved"] = None
+        if final_model and self.attempts.get(final_model):
+            avg_final = self.latency[final_model] / self.attempts[final_model]
+            res["latency_saved"] = avg_final * self.calls - self.total_latency
+        return res
+
+def tier_policy(prompt_type: str | None) -> TierPolicy | None:
+    if not prompt_type:
+        return None
+    return TIER_POLICIES.get(prompt_type) or TIER_POLICIES.get(prompt_type.split(".")[0])
+
+def _usage_tokens(usage) -> tuple[int, int, int]:
+    """(prompt, output incl. thinking, cached) tokens from the usage metadata."""
+    if usage is None:
+        return 0, 0, 0
+    return (
+        usage.prompt_token_count or 0,
+        (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0),
+        usage.cached_content_token_count or 0,
+    )
+
+def _usage_cost(model: str, usage) -> float:
+    if usage is None or model not in MODEL_PRICES:
+        return 0.0
+    price_in, price_out = MODEL_PRICES[model]
+    prompt_tokens, output_tokens, _ = _usage_tokens(usage)
+    return (prompt_tokens * price_in + output_tokens * price_out) / 1_000_000
+
 class GeminiRateLimitedClient:
+    """
+    Gemini client with a sliding minute window over RPM/TPM.
+
+    Callers pick a Priority. Batch calls may only use (1 - reserved share) of
+    the limits and are held back while interactive calls are queued, so
+    interactive calls always find headroom. Ingestion runs in celery and the
+    API in its own process, so capping batch per process also keeps that
+    headroom free in the shared upstream quota.
+    """
     def __init__(
         self,
         model: str = "gemini-2.5-flash",
@@ -28,25 +164,59 @@ class GeminiRateLimitedClient:
         max_retries: int = 5,
         base_backoff: float = 1.0,
         max_backoff: float = 30.0,
+        interactive_reserved_share: float = settings.LLM_INTERACTIVE_RESERVED_SHARE,
     ):
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY) 
+        self.client = genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+            http_options=(
+                types.HttpOptions(base_url=settings.GEMINI_BASE_URL)
+                if settings.GEMINI_BASE_URL else None
+            ),
+        )
         self.model = model
 
         # ---- quotas ----
         self.rpm_limit = rpm_limit
         self.tpm_limit = tpm_limit
         self.rpd_limit = rpd_limit
+        self.limit_share = {
+            Priority.interactive: 1.0,
+            Priority.batch: 1.0 - interactive_reserved_share,
+        }
 
         # ---- retry policy ----
         self.max_retries = max_retries
         self.base_backoff = base_backoff
         self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(
+            "gemini",
+            failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_BREAKER_RESET_TIMEOUT,
+        )
 
         # ---- state ----
-        self.request_times = deque()
-        self.token_times = deque()   # (timestamp, tokens)
+        # every admitted request holds its token reservation in the window,
+        # reconciled to the billed count once the response comes back
+        self._cond = threading.Condition()
+        self.window: deque[_WindowEntry] = deque()
+        self.tokens_in_window = 0
         self.daily_count = 0
         self.daily_reset = datetime.now(timezone.utc).date()
+        self.waiting = {priority: 0 for priority in Priority}
+        self.queue_wait_stats = {priority: QueueWaitStats() for priority in Priority}
+
+        # ---- token accounting ----
+        self.token_stats: dict[str, PromptTokenStats] = {}
+        # learned chars per token for each prompt type, seeded with the usual 4
+        self.chars_per_token: dict[str, float] = {}
+        self.default_output_tokens = 1024
+        self.tier_stats: dict[str, TierStats] = {}
+
+        # ---- request coalescing ----
+        self.single_flight = SingleFlight(lock_ttl=settings.LLM_COALESCE_LOCK_TTL)
+
+        # ---- provider side caching of static system prompts, one per model ----
+        self.context_caches: dict[str, ContextCacheManager] = {}
 
     # -------------------------
     # Internal helpers
@@ -59,43 +229,170 @@ class GeminiRateLimitedClient:
             logger.info("Daily quota reset")
 
     def _prune_old_entries(self, now: float):
-        while self.request_times and now - self.request_times[0] > 60:
-            self.request_times.popleft()
-
-        while self.token_times and now - self.token_times[0][0] > 60:
-            self.token_times.popleft()
-
-    def _estimate_tokens(self, text: str) -> int:
-        # rough but good enough for throttling
-        return max(1, len(text) // 4)
-
-    def _wait_for_quota(self, estimated_tokens: int):
-        while True:
-            now = time.time()
-            self._prune_old_entries(now)
-
-            rpm_used = len(self.request_times)
-            tpm_used = sum(t for _, t in self.token_times)
-
-            if rpm_used < self.rpm_limit and tpm_used + estimated_tokens < self.tpm_limit:
+        while self.window and now - self.window[0].ts > WINDOW_SECONDS:
+            entry = self.window.popleft()
+            entry.expired = True
+            self.tokens_in_window -= entry.tokens
+
+    def _estimate_tokens(self, prompt_chars: int, prompt_type: str) -> int:
+        # calibrated from the usage metadata of previous calls of the same type
+        ratio = self.chars_per_token.get(prompt_type, 4.0)
+        stats = self.token_stats.get(prompt_type)
+        output = (
+            stats.output_tokens // stats.calls
+            if stats and stats.calls else self.default_output_tokens
+        )
+        return max(1, int(prompt_chars / ratio)) + output
+
+    def _limits(self, priority: Priority) -> tuple[int, int]:
+        share = self.limit_share[priority]
+        return max(1, int(self.rpm_limit * share)), max(1, int(self.tpm_limit * share))
+
+    def _seconds_until_capacity(self, now: float, tokens: int, priority: Priority) -> float:
+        rpm_limit, tpm_limit = self._limits(priority)
+        wait = 0.0
+        overflow = len(self.window) - rpm_limit + 1
+        if overflow > 0:
+            wait = self.window[overflow - 1].ts + WINDOW_SECONDS - now
+        excess = self.tokens_in_window + tokens - tpm_limit
+        if excess > 0:
+            freed = 0
+            for entry in self.window:
+                freed += entry.tokens
+                if freed >= excess:
+                    wait = max(wait, entry.ts + WINDOW_SECONDS - now)
+                    break
+            else:
+                if self.window:
+                    # bigger than the budget left even once the window drains, it goes out alone
+                    wait = max(wait, self.window[-1].ts + WINDOW_SECONDS - now)
+        return max(wait, 0.0)
+
+    def _has_capacity(self, tokens: int, priority: Priority) -> bool:
+        if priority == Priority.batch and self.waiting[Priority.interactive]:
+            return False
+        rpm_limit, tpm_limit = self._limits(priority)
+        if len(self.window) >= rpm_limit:
+            return False
+        if not self.window:
+            # a single prompt bigger than the whole tpm budget still has to go out
+            return True
+        return self.tokens_in_window + tokens < tpm_limit
+
+    def _wait_for_quota(
+        self, estimated_tokens: int, priority: Priority, site: str = "text"
+    ) -> _WindowEntry:
+        start = time.time()
+        with self._cond:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    now = time.time()
+                    self._prune_old_entries(now)
+
+                    if self._has_capacity(estimated_tokens, priority):
+                        entry = _WindowEntry(now, estimated_tokens, now - start)
+                        self.window.append(entry)
+                        self.tokens_in_window += estimated_tokens
+                        self.daily_count += 1
+                        self._record_queue_wait(priority, now - start, site)
+                        return entry
+
+                    sleep_for = self._seconds_until_capacity(now, estimated_tokens, priority)
+                    logger.debug(
+                        f"Throttling {priority.value} Gemini calls "
+                        f"(RPM={len(self.window)}/{self.rpm_limit}, "
+                        f"TPM={self.tokens_in_window}/{self.tpm_limit}), "
+                        f"sleeping {sleep_for:.2f}s"
+                    )
+                    # woken early when a reservation is reconciled downwards
+                    # or the interactive queue drains
+                    self._cond.wait(timeout=sleep_for + 0.01)
+            finally:
+                self.waiting[priority] -= 1
+                if priority == Priority.interactive and not self.waiting[priority]:
+                    self._cond.notify_all()
+
+    def _record_queue_wait(self, priority: Priority, waited: float, site: str):
+        # called with self._cond held
+        LLM_QUEUE_WAIT.labels(site, priority.value).observe(waited)
+        stats = self.queue_wait_stats[priority]
+        stats.calls += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        if waited < 0.01:
+            return
+        stats.throttled += 1
+        try:
+            r = get_sync_redis()
+            if r is None:
                 return
+            key = QUEUE_WAIT_KEY + priority.value
+            pipe = r.pipeline(transaction=False)
+            pipe.hincrby(key, "throttled", 1)
+            pipe.hincrbyfloat(key, "total_wait", waited)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to publish queue wait for {priority.value}: {e}")
+
+    def _record_usage(
+        self, entry: _WindowEntry, prompt_type: str, prompt_chars: int,
+        usage: types.GenerateContentResponseUsageMetadata | None
+    ):
+        prompt_tokens, output_tokens, cached_tokens = _usage_tokens(usage)
+        estimated = entry.tokens
+        actual = prompt_tokens + output_tokens if prompt_tokens else estimated
+
+        with self._cond:
+            if not entry.expired:
+                self.tokens_in_window += actual - entry.tokens
+            entry.tokens = actual
+            if actual < estimated:
+                self._cond.notify_all()
+
+            stats = self.token_stats.setdefault(prompt_type, PromptTokenStats())
+            stats.calls += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.output_tokens += output_tokens
+            stats.cached_tokens += cached_tokens
+            stats.estimated_tokens += estimated
+            stats.max_prompt_tokens = max(stats.max_prompt_tokens, prompt_tokens)
+            stats.max_output_tokens = max(stats.max_output_tokens, output_tokens)
+            if prompt_tokens:
+                ratio = prompt_chars / prompt_tokens
+                prev = self.chars_per_token.get(prompt_type)
+                self.chars_per_token[prompt_type] = (
+                    ratio if prev is None else prev * 0.8 + ratio * 0.2
+                )
 
-            sleep_for = random.uniform(0.5, 1.5)
-            logger.debug(
-                f"Throttling Gemini calls "
-                f"(RPM={rpm_used}/{self.rpm_limit}, "
-                f"TPM={tpm_used}/{self.tpm_limit}), "
-                f"sleeping {sleep_for:.2f}s"
-            )
-            time.sleep(sleep_for)
+        self._publish_usage(prompt_type, prompt_tokens, output_tokens, cached_tokens, estimated)
 
-    def _record_usage(self, tokens: int):
-        now = time.time()
-        self.request_times.append(now)
-        self.token_times.append((now, tokens))
-        self.daily_count += 1
+    def _publish_usage(
+        self, prompt_type: str, prompt_tokens: int, output_tokens: int,
+        cached_tokens: int, estimated: int
+    ):
+        # aggregate across api and celery processes, read back by /admin/llm/token_stats
+        try:
+            r = get_sync_redis()
+            if r is None:
+                return
+            key = TOKEN_STATS_KEY + prompt_type
+            pipe = r.pipeline(transaction=False)
+            pipe.hincrby(key, "calls", 1)
+            pipe.hincrby(key, "prompt_tokens", prompt_tokens)
+            pipe.hincrby(key, "output_tokens", output_tokens)
+            pipe.hincrby(key, "cached_tokens", cached_tokens)
+            pipe.hincrby(key, "estimated_tokens", estimated)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to publish token stats for {prompt_type}: {e}")
 
     def _is_retryable_error(self, exc: Exception) -> bool:
+        if isinstance(exc, errors.APIError):
+            return exc.code in (408, 429, 500, 502, 503, 504)
+        if isinstance(exc, httpx.TransportError):
+            return True
+        # transport errors (timeouts, dropped connections) never reach an APIError
         msg = str(exc).lower()
         return any(
             key in msg
@@ -109,63 +406,387 @@ class GeminiRateLimitedClient:
             )
         )
 
+    def _is_rate_limited(self, exc: Exception) -> bool:
+        if isinstance(exc, errors.APIError):
+            return exc.code == 429
+        msg = str(exc).lower()
+        return "429" in msg or "resource_exhausted" in msg
+
+    def _record_call(
+        self, site: str, model: str, schema_name: str, outcome: str, seconds: float,
+        queue_wait: float, retries: int, usage
+    ):
+        prompt_tokens, output_tokens, cached_tokens = _usage_tokens(usage)
+        cost = _usage_cost(model, usage)
+        LLM_CALLS.labels(site, model, schema_name, outcome).inc()
+        if usage is not None:
+            LLM_TOKENS.labels(site, model, "prompt").inc(prompt_tokens)
+            LLM_TOKENS.labels(site, model, "output").inc(output_tokens)
+            LLM_TOKENS.labels(site, model, "cached").inc(cached_tokens)
+            LLM_COST.labels(site, model).inc(cost)
+        if cached_tokens:
+            LLM_CACHE.labels(site, "context").inc()
+        scope = current_llm_scope()
+        if scope and scope.usage:
+            scope.usage.add(
+                site, calls=1, seconds=seconds, queue_wait=queue_wait,
+                prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                cached_tokens=cached_tokens, retries=retries,
+                cache_hits=1 if cached_tokens else 0, cost=cost,
+            )
+        logger.debug(
+            f"llm call site={site} model={model} schema={schema_name} outcome={outcome} "
+            f"report={scope.report_id if scope else None} company={scope.company_id if scope else None} "
+            f"seconds={seconds:.2f} queue_wait={queue_wait:.2f} retries={retries} "
+            f"tokens={prompt_tokens}/{output_tokens} cached={cached_tokens}"
+        )
+
+    def _context_cache(self, model: str) -> ContextCacheManager | None:
+        if not settings.LLM_CONTEXT_CACHE_ENABLED:
+            return None
+        with self._cond:
+            if model not in self.context_caches:
+                self.context_caches[model] = ContextCacheManager(
+                    self.client.caches, model,
+                    ttl=settings.LLM_CONTEXT_CACHE_TTL,
+                    min_tokens=settings.LLM_CONTEXT_CACHE_MIN_TOKENS,
+                )
+            return self.context_caches[model]
+
+    def _record_tier(
+        self, prompt_type: str, policy: TierPolicy, model: str,
+        attempts: list[tuple[str, float, Any]]
+    ):
+        final = policy.models[-1]
+        latency = sum(took for _, took, _ in attempts)
+        cost = sum(_usage_cost(m, usage) for m, _, usage in attempts)
+        baseline = _usage_cost(final, attempts[0][2])
+        with self._cond:
+            stats = self.tier_stats.setdefault(prompt_type, TierStats())
+            stats.calls += 1
+            stats.escalations += len(attempts) - 1
+            stats.total_latency += latency
+            stats.cost += cost
+            stats.baseline_cost += baseline
+            stats.served[model] = stats.served.get(model, 0) + 1
+            for m, took, _ in attempts:
+                stats.attempts[m] = stats.attempts.get(m, 0) + 1
+                stats.latency[m] = stats.latency.get(m, 0.0) + took
+        try:
+            r = get_sync_redis()
+            if r is None:
+                return
+            key = TIER_STATS_KEY + prompt_type
+            pipe = r.pipeline(transaction=False)
+            pipe.hincrby(key, "calls", 1)
+            pipe.hincrby(key, "escalations", len(attempts) - 1)
+            pipe.hincrbyfloat(key, "total_latency", latency)
+            pipe.hincrbyfloat(key, "cost", cost)
+            pipe.hincrbyfloat(key, "baseline_cost", baseline)
+            pipe.hincrby(key, f"served:{model}", 1)
+            for m, took, _ in attempts:
+                pipe.hincrby(key, f"attempts:{m}", 1)
+                pipe.hincrbyfloat(key, f"latency:{m}", took)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to publish tier stats for {prompt_type}: {e}")
+
+    def _retry_after_hint(self, exc: Exception) -> float | None:
+        """Server side hint from a Retry-After header or a google.rpc.RetryInfo detail."""
+        if not isinstance(exc, errors.APIError):
+            return None
+        headers = getattr(exc.response, "headers", None)
+        if headers and headers.get("retry-after"):
+            try:
+                return float(headers["retry-after"])
+            except ValueError:
+                pass
+        error = exc.details.get("error", exc.details) if isinstance(exc.details, dict) else {}
+        for detail in error.get("details") or []:
+            if isinstance(detail, dict) and detail.get("@type", "").endswith("RetryInfo"):
+                try:
+                    return float(str(detail.get("retryDelay", "")).rstrip("s"))
+                except ValueError:
+                    return None
+        return None
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> float:
+        backoff = min(
+            self.base_backoff * (2 ** (attempt - 1)),
+            self.max_backoff,
+        ) + random.uniform(0, 0.5)
+        hint = self._retry_after_hint(exc)
+        return max(hint, backoff) if hint else backoff
+
+    def _is_cache_error(self, exc: Exception) -> bool:
+        # cached content expired or deleted upstream before our ttl said so
+        return (
+            isinstance(exc, errors.APIError)
+            and exc.code in (400, 403, 404)
+            and "cache" in str(exc).lower()
+        )
+
     # -------------------------
     # Public API
     # -------------------------
+    def token_usage_stats(self) -> dict[str, dict]:
+        with self._cond:
+            return {k: v.to_dict() for k, v in self.token_stats.items()}
+
+    def queue_wait_usage_stats(self) -> dict[str, dict]:
+        with self._cond:
+            return {k.value: v.to_dict() for k, v in self.queue_wait_stats.items()}
+
+    def tier_usage_stats(self) -> dict[str, dict]:
+        with self._cond:
+            return {
+                k: v.to_dict(policy.models[-1] if (policy := tier_policy(k)) else None)
+                for k, v in self.tier_stats.items()
+            }
+
+    def _cache_key(
+        self, sys_prompt: str, usr_prompt: str, response_schema: Type[BaseModel] | None,
+        prompt_type: str | None = None,
+    ) -> str:
+        # key on the models that can answer, a tiered prompt is not answered by self.model
+        policy = tier_policy(prompt_type) if settings.LLM_TIERING_ENABLED else None
+        route = (
+            f"{','.join(policy.models)}@{policy.min_confidence}" if policy else self.model
+        )
+        digest = hashlib.sha256()
+        for part in (
+            route, response_schema.__name__ if response_schema else '',
+            sys_prompt, usr_prompt
+        ):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
     def single_prompt_answer(
         self,
         sys_prompt: str,
         usr_prompt: str,
         response_schema: Type[BaseModel] | None = None,
+        prompt_type: str | None = None,
+        coalesce: bool = True,
+        priority: Priority = Priority.batch,
+        cacheable: bool = False,
+    ):
+        """
+        Identical concurrent prompts (same model or tier ladder, schema and
+        text) are sent upstream once and every caller gets the same parsed result.
+        Set `cacheable` for large system prompts reused across many calls,
+        they are then served from a provider side context cache.
+        """
+        def compute():
+            return self._tiered_generate(
+                sys_prompt, types.Part.from_text(text=usr_prompt),
+                len(sys_prompt) + len(usr_prompt),
+                response_schema, prompt_type, priority, cacheable=cacheable
+            )
+        if not coalesce:
+            return compute()
+        result, shared = self.single_flight.do(
+            self._cache_key(sys_prompt, usr_prompt, response_schema, prompt_type),
+            compute,
+            dumps=lambda res: res.model_dump_json() if response_schema else res,
+            loads=lambda raw: (
+                response_schema.model_validate_json(raw) if response_schema else raw
+            ),
+        )
+        if shared:
+            logger.debug(f"Gemini call {prompt_type or ''} served by an in-flight request")
+            LLM_CACHE.labels(call_site(prompt_type), "coalesced").inc()
+            scope = current_llm_scope()
+            if scope and scope.usage:
+                scope.usage.add(call_site(prompt_type), calls=1, cache_hits=1)
+        return result
+
+    def chat_answer(
+        self,
+        sys_prompt: str,
+        history: list[str],
+        message: str,
+        prompt_type: str = "chat",
+        priority: Priority = Priority.interactive,
+        temperature: float = 0.2,
+    ) -> str | None:
+        contents = [
+            types.Content(role="user", parts=[types.Part.from_text(text=m)])
+            for m in [*history, message]
+        ]
+        prompt_chars = len(sys_prompt) + sum(len(m) for m in history) + len(message)
+        res, _ = self._generate(
+            sys_prompt, contents, prompt_chars, None, prompt_type, priority,
+            temperature=temperature
+        )
+        return res
+
+    def _tiered_generate(
+        self,
+        sys_prompt: str,
+        contents: Any,
+        prompt_chars: int,
+        response_schema: Type[BaseModel] | None = None,
+        prompt_type: str | None = None,
+        priority: Priority = Priority.batch,
+        cacheable: bool = False,
     ):
+        """
+        Walk the tier policy of the prompt type from the cheapest model up,
+        escalating when the answer fails validation or its confidence is
+        under the policy threshold. Prompt types without a policy go to the
+        default model directly.
+        """
+        policy = tier_policy(prompt_type) if settings.LLM_TIERING_ENABLED else None
+        if policy is None:
+            res, _ = self._generate(
+                sys_prompt, contents, prompt_chars, response_schema, prompt_type,
+                priority, cacheable=cacheable
+            )
+            return res
+
+        attempts: list[tuple[str, float, Any]] = []
+        res = None
+        for model in policy.models:
+            start = time.monotonic()
+            res, usage = self._generate(
+                sys_prompt, contents, prompt_chars, response_schema, prompt_type,
+                priority, cacheable=cacheable, model=model
+            )
+            attempts.append((model, time.monotonic() - start, usage))
+            confidence = getattr(res, "confidence", None)
+            if res is not None and (confidence is None or confidence >= policy.min_confidence):
+                break
+            if model != policy.models[-1]:
+                logger.debug(
+                    f"Escalating {prompt_type} from {model} "
+                    f"({'invalid answer' if res is None else f'confidence {confidence}'})"
+                )
+        self._record_tier(prompt_type, policy, model, attempts) # type: ignore
+        return res
+
+    def _generate(
+        self,
+        sys_prompt: str,
+        contents: Any,
+        prompt_chars: int,
+        response_schema: Type[BaseModel] | None = None,
+        prompt_type: str | None = None,
+        priority: Priority = Priority.batch,
+        temperature: float = 0,
+        cacheable: bool = False,
+        model: str | None = None,
+    ) -> tuple[Any, types.GenerateContentResponseUsageMetadata | None]:
+        """Returns (answer, usage metadata), answer is None on permanent failure."""
         self._reset_daily_if_needed()
+        model = model or self.model
 
         if self.daily_count >= self.rpd_limit:
             logger.error("Gemini daily request quota exceeded (RPD)")
-            return None
+            return None, None
 
-        estimated_tokens = self._estimate_tokens(sys_prompt + usr_prompt)
-        self._wait_for_quota(estimated_tokens)
+        if not prompt_type:
+            prompt_type = response_schema.__name__ if response_schema else "text"
+        estimated_tokens = self._estimate_tokens(prompt_chars, prompt_type)
 
         response_mime_type = (
             "application/json" if response_schema else None
         )
+        cache_name = None
+        context_cache = self._context_cache(model) if cacheable else None
+        if context_cache:
+            cache_name = context_cache.get(
+                sys_prompt, int(len(sys_prompt) / self.chars_per_token.get(prompt_type, 4.0))
+            )
 
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=types.Part.from_text(text=usr_prompt),
-                    config=types.GenerateContentConfig(
-                        system_instruction=sys_prompt,
-                        response_schema=response_schema,
-                        response_mime_type=response_mime_type,
-                        temperature=0,
-                        top_p=0.95,
-                        top_k=20,
-                    ),
-                )
-
-                self._record_usage(estimated_tokens)
-
-                return response.parsed if response_schema else response.text
-
-            except Exception as e:
-                if not self._is_retryable_error(e) or attempt == self.max_retries:
-                    logger.exception("Gemini request failed permanently")
-                    return None
-
-                backoff = min(
-                    self.base_backoff * (2 ** (attempt - 1)),
-                    self.max_backoff,
-                ) + random.uniform(0, 0.5)
-
-                logger.warning(
-                    f"Gemini request failed "
-                    f"(attempt {attempt}/{self.max_retries}), "
-                    f"retrying in {backoff:.2f}s: {e}"
-                )
-                time.sleep(backoff * 60 * 2)
+        site = call_site(prompt_type)
+        schema_name = response_schema.__name__ if response_schema else "text"
+        outcome, seconds, queue_wait, retries, usage = "failed", 0.0, 0.0, 0, None
+        probe = False
+        try:
+            for attempt in range(1, self.max_retries + 1):
+                # fails fast with LLMUnavailable while upstream is known to be down
+                probe = self.breaker.before_call()
+                entry = self._wait_for_quota(estimated_tokens, priority, site)
+                queue_wait += entry.waited
+                start = time.monotonic()
+                try:
+                    response = self.client.models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=types.GenerateContentConfig(
+                            system_instruction=None if cache_name else sys_prompt,
+                            cached_content=cache_name,
+                            response_schema=response_schema,
+                            response_mime_type=response_mime_type,
+                            temperature=temperature,
+                            top_p=0.95,
+                            top_k=20,
+                        ),
+                    )
+                except Exception as e:
+                    took = time.monotonic() - start
+                    seconds += took
+                    LLM_LATENCY.labels(site, model, "error").observe(took)
+                    if cache_name and self._is_cache_error(e):
+                        logger.warning(f"Gemini context cache {cache_name} rejected, sending prompt inline: {e}")
+                        context_cache.invalidate(sys_prompt) # type: ignore
+                        cache_name = None
+                        # upstream answered, only our cache handle was stale
+                        self.breaker.record_success()
+                        continue
+                    # a failed attempt keeps its estimated reservation in the window
+                    if not self._is_retryable_error(e):
+                        # upstream answered, the request itself is bad
+                        self.breaker.record_success()
+                        logger.exception("Gemini request failed permanently")
+                        return None, None
+
+                    if not self._is_rate_limited(e):
+                        self.breaker.record_failure()
+                    elif probe:
+                        # a 429 is not an outage, but it does show upstream answers
+                        self.breaker.record_success()
+                        probe = False
+                    delay = self._retry_delay(e, attempt)
+                    if attempt == self.max_retries or delay > settings.LLM_MAX_INLINE_RETRY_WAIT:
+                        # let the caller requeue instead of parking a worker slot
+                        raise LLMUnavailable(
+                            f"Gemini unavailable after {attempt} attempt(s): {e}",
+                            max(delay, self.breaker.retry_after())
+                        ) from e
+
+                    logger.warning(
+                        f"Gemini request failed "
+                        f"(attempt {attempt}/{self.max_retries}), "
+                        f"retrying in {delay:.2f}s: {e}"
+                    )
+                    retries += 1
+                    LLM_RETRIES.labels(
+                        site, model, str(getattr(e, "code", None) or type(e).__name__)
+                    ).inc()
+                    time.sleep(delay)
+                    continue
+
+                took = time.monotonic() - start
+                seconds += took
+                LLM_LATENCY.labels(site, model, "ok").observe(took)
+                self.breaker.record_success()
+                self._record_usage(entry, prompt_type, prompt_chars, response.usage_metadata)
+                outcome, usage = "ok", response.usage_metadata
+                return (
+                    response.parsed if response_schema else response.text
+                ), response.usage_metadata
+        except LLMUnavailable:
+            outcome = "unavailable"
+            raise
+        finally:
+            if probe:
+                # a probe that left without an outcome must not lock the others out
+                self.breaker.release_probe()
+            self._record_call(site, model, schema_name, outcome, seconds, queue_wait, retries, usage)
+        return None, None
 
 def get_gemini_client():
     global client
@@ -173,6 +794,43 @@ def get_gemini_client():
     client = GeminiRateLimitedClient()
     return client
 
+T = TypeVar("T")
+
+def run_concurrently(
+    calls: Sequence[Callable[[], T]], max_workers: int | None = None
+) -> list[T | LLMUnavailable]:
+    """
+    Run independent prompt calls on a thread pool and return their results
+    in the same order as `calls`. The shared client throttles them against
+    the quota, so this only bounds how many are in flight at once.
+    A call failing with LLMUnavailable yields the exception in its slot and
+    the calls not started yet are skipped with the same exception, callers
+    keep the results in front of it. Other exceptions propagate.
+    """
+    def guarded(call):
+        try:
+            return call()
+        except LLMUnavailable as e:
+            return e
+
+    if len(calls) <= 1:
+        return [guarded(call) for call in calls]
+    workers = min(max_workers or settings.LLM_MAX_CONCURRENCY, len(calls))
+    unavailable: list[LLMUnavailable] = []
+
+    def run(call):
+        if unavailable:
+            return unavailable[0]
+        res = guarded(call)
+        if isinstance(res, LLMUnavailable):
+            unavailable.append(res)
+        return res
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm") as pool:
+        # copy the context per call so the llm_scope of the caller follows each prompt
+        futures = [pool.submit(copy_context().run, run, call) for call in calls]
+        return [future.result() for future in futures]
+
 def enum_to_examples(
     enum: type[Enum],
     *,
@@ -200,4 +858,18 @@ def enum_to_examples(
     if quoted:
         values = [f'"{v}"' for v in values]
 
-    return separator.join(values)
\ No newline at end of file
+    return separator.join(values)
+
+
+@dataclass
+class PromptBatch:
+    """
+    Independent prompt calls plus the step that writes their answers. The
+    calls touch no db state, so batches of different stages can share one
+    run_concurrently and only their apply steps need to run one at a time.
+    """
+    calls: list[Callable[[], Any]]
+    apply: Callable[[list[Any]], dict]
+
+    def run(self) -> dict:
+        return self.apply(run_concurrently(self.calls) if self.calls else [])
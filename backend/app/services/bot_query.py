@@ -1,3 +1,16 @@
+import re
+import json
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.logging import logger
+from app.models.report import Company, ReportingPeriod
+from app.schemas.ask_bot import UserQuestion
+from app.schemas.bot_query import QueryPlan, TimeScope, TimeMode, ComparisonTarget
+from app.services.ai_prompt import get_gemini_client, Priority
+from app.services.ratios import METRIC_NOTES, statement_query, statement_frame, compute_ratios
+from app.services.search_db import company_index
+
 sys_prompt = """
 You are a financial query planner for a backend financial analysis system.
 
@@ -18,7 +31,7 @@ You DO NOT calculate or estimate any financial values.
 2. Company handling:
    - Extract exactly how the user refers to the company.
    - DO NOT invent or guess tickers or company IDs.
-   - If the company is implied (e.g. "this company"), preserve it as-is.
+   - If the company is only implied (e.g. "this company", "they"), set raw_reference to null.
 
 3. Analysis intent:
    - Classify the user's request into a supported analysis type.
@@ -90,18 +103,178 @@ Return a single JSON object with the following fields:
   "roa"
 ]
 
+If the question is not about any of the ALLOWED_METRICS (strategy, risks,
+management, outlook), return an empty "metrics" list.
+
 If the user's question cannot be converted into a valid query plan,
 return a JSON object with an explanation in the "assumptions" field.
 """
 
-# def plan_query(user_prompt: str, session: dict):
-#     plan = llm_call(
-#         system_prompt=STAGE1_SYSTEM_PROMPT,
-#         user_input=user_prompt,
-#         context=session
-#     )
-#     try:
-#         plan = Stage1QueryPlan.model_validate(llm_output)
-#         return plan
-#     except Exception as e:
-#         raise HTTPException(status_code=400, detail="Sorry we cannot process your request currently")
\ No newline at end of file
+# how the planner passes on a company that is only implied
+IMPLIED_COMPANY = re.compile(
+    r"(?:(?:this|that|the|same|our|its|their)\s+)?(?:(?:company|firm|group|business)(?:'s)?|it|its|they|them|their)",
+    re.IGNORECASE
+)
+
+answer_prompt = """
+You are a company analysis assistant.
+Answer the user's question using ONLY the computed figures below, they come
+from the company's reported statements.
+Ratios are fractions (0.125 is 12.5%). In "yoy", amounts change relative to
+the previous year and ratios change in points.
+A null figure is not available, say so. Never compute or estimate new figures.
+Tell the user about everything listed in "notes", e.g. years that are not stored.
+"""
+
+def plan_query(question: UserQuestion) -> QueryPlan | None:
+    """The planner's QueryPlan, None when the answer does not validate (e.g. no metrics)."""
+    history = "\n".join(question.chat_history[-4:])
+    usr_prompt = f"Conversation so far:\n{history}\n\nQuestion: {question.message}" if history else question.message
+    plan = get_gemini_client().single_prompt_answer(
+        sys_prompt, usr_prompt, QueryPlan, prompt_type='chat.plan', priority=Priority.interactive
+    )
+    return plan if isinstance(plan, QueryPlan) else None
+
+def resolve_years(scope: TimeScope, available: list[int]) -> tuple[list[int], list[int]]:
+    """
+    Fiscal years of the plan among the available ones, symbolic years
+    resolved against them, and the explicit years that are not stored.
+    """
+    available = sorted(available)
+    years, explicit = set(), set()
+    for year in scope.years:
+        if isinstance(year, int) or str(year).isdigit():
+            explicit.add(int(year))
+        elif year == 'latest' and available:
+            years.add(available[-1])
+        elif year == 'previous' and len(available) >= 2:
+            years.add(available[-2])
+        elif match := re.fullmatch(r'last_(\d+)_years?', str(year)):
+            years.update(available[-int(match.group(1)):])
+    res = sorted((years | explicit) & set(available))
+    if not res and not explicit:
+        # only symbolic or no years asked for, default to the most recent ones
+        res = available[-5:] if scope.mode == TimeMode.trend else available[-1:]
+    return res, sorted(explicit - set(available))
+
+def named_company(plan: QueryPlan) -> str | None:
+    """How the question names the company, None when it is only implied."""
+    reference = (plan.company.raw_reference or '').strip()
+    if not reference or IMPLIED_COMPANY.fullmatch(reference):
+        return None
+    return reference
+
+async def resolve_plan_company(
+    db: AsyncSession, plan: QueryPlan, question: UserQuestion
+) -> Company | None:
+    """
+    The company the plan names, None when it is not stored. The selected
+    company only stands in when the reference is implied.
+    """
+    reference = named_company(plan)
+    if reference:
+        matches = await company_index.search(db, reference, max_results=1)
+        return await db.get(Company, matches[0]['id']) if matches else None
+    if question.context:
+        return await db.get(Company, question.context.company_id)
+    return None
+
+async def _ratios(db: AsyncSession, company_ids: list[int], years: set[int]):
+    rows = (await db.execute(
+        statement_query(company_ids).where(ReportingPeriod.fiscal_year.in_(years))
+    )).all()
+    return compute_ratios(statement_frame(rows))
+
+def _by_year(frame, metrics: list[str], years: list[int]) -> dict[str, dict[str, float | None]]:
+    res = {}
+    for metric in metrics:
+        column = frame[metric] if metric in frame else None
+        res[metric] = {
+            str(year): (
+                None if column is None or year not in column.index or column[year] != column[year]
+                else round(float(column[year]), 6)
+            )
+            for year in years
+        }
+    return res
+
+async def execute_plan(db: AsyncSession, plan: QueryPlan, company: Company) -> dict | None:
+    """
+    The figures the plan asks for, computed from the statements of just the
+    needed years. None when the company has none of them, requested years
+    that are not stored are reported in the notes instead.
+    """
+    available = sorted((await db.execute(
+        select(ReportingPeriod.fiscal_year).where(ReportingPeriod.company_id == company.id).distinct()
+    )).scalars().all())
+    years, missing = resolve_years(plan.time, available)
+    notes = list(plan.assumptions)
+    notes += [f"{metric.value}: {METRIC_NOTES[metric]}" for metric in plan.metrics if metric in METRIC_NOTES]
+    if missing:
+        notes.append(
+            f"no statements are stored for fiscal year {', '.join(map(str, missing))}, "
+            f"stored years: {', '.join(map(str, available)) or 'none'}"
+        )
+    res = {
+        "company": company.company_name,
+        "analysis": plan.analysis.type.value,
+        "years": years,
+        "figures": {},
+        "notes": notes,
+    }
+    if not years:
+        # only years that are not stored were asked for, the answer says so
+        return res if missing else None
+    # the year before each one is needed for yoy and the averaged balances
+    needed = set(years) | {year - 1 for year in years}
+    metrics = [metric.value for metric in plan.metrics]
+    values, yoy = await _ratios(db, [company.id], needed)
+    if values.empty:
+        return None
+    values, yoy = values.xs(company.id, level='company_id'), yoy.xs(company.id, level='company_id')
+    figures = _by_year(values, metrics, years)
+    if all(value is None for by_year in figures.values() for value in by_year.values()):
+        return None
+    res["figures"] = figures
+    target = plan.comparison.target if plan.comparison.enabled else None
+    if target == ComparisonTarget.prior_period or plan.time.mode in (TimeMode.trend, TimeMode.comparison):
+        res["yoy"] = _by_year(yoy, metrics, years)
+    if target == ComparisonTarget.industry:
+        peers = [] if not company.industry else (await db.execute(
+            select(Company.id).where((Company.industry == company.industry) & (Company.id != company.id))
+        )).scalars().all()
+        if peers:
+            # same years as the company, so the averaged balances use the same formula
+            peer_values, _ = await _ratios(db, list(peers), needed)
+            median = peer_values.groupby(level='fiscal_year').median()
+            res["industry_median"] = _by_year(median, metrics, years)
+            res["industry_companies"] = len(peers)
+        else:
+            res["notes"].append("no other company of the same industry is stored")
+    elif target == ComparisonTarget.peer:
+        res["notes"].append("peer comparison needs the peer to be named, it was not done")
+    return res
+
+async def answer_with_plan(question: UserQuestion, db: AsyncSession) -> str | None:
+    """
+    Plan the question, compute the figures locally and only have them
+    phrased. None when the question is not a metric question or there is
+    nothing to compute, the caller falls back to the dashboard chat.
+    """
+    plan = await asyncio.to_thread(plan_query, question)
+    if plan is None:
+        return None
+    company = await resolve_plan_company(db, plan, question)
+    if company is None:
+        reference = named_company(plan)
+        # never answer with the selected company's figures for another one
+        return f"{reference} is not among the stored companies" if reference else None
+    result = await execute_plan(db, plan, company)
+    if result is None:
+        logger.info(f'no figures for plan {plan.model_dump_json()}, falling back to the dashboard chat')
+        return None
+    return await asyncio.to_thread(
+        get_gemini_client().chat_answer,
+        f"{answer_prompt}\n{json.dumps(result)}", question.chat_history, question.message,
+        prompt_type='chat.answer', priority=Priority.interactive
+    )
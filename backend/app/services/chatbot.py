@@ -1,15 +1,17 @@
 import json
-from google import genai
-from google.genai import types
+import asyncio
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.logging import logger
+from app.services.ai_prompt import get_gemini_client, Priority
+from app.services.circuit_breaker import LLMUnavailable
+from app.services.bot_query import answer_with_plan
 from app.schemas.ask_bot import UserQuestion
 from app.models.report import Company
 from app.models.dashboard import CompanyDashboard
-from app.services.dashboard import update_dashboard, shape_dashboard_info
-
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+from app.services.dashboard import shape_dashboard_info
+from app.celery.dashboard import schedule_dashboard
 
 sys_prompt = """
 You are a company analysis assistant.
@@ -18,24 +20,35 @@ If information is missing, say "This information is not available".
 Never speculate.
 """
 
-def build_company_context(company_id: int, db: Session):
-    summary = db.execute(
+async def build_company_context(company_id: int, db: AsyncSession):
+    summary = (await db.execute(
         select(CompanyDashboard).where(CompanyDashboard.company_id == company_id)
-    ).scalar_one_or_none()
-    company = db.execute(
+    )).scalar_one_or_none()
+    company = (await db.execute(
         select(Company).where(Company.id == company_id)
-    ).scalar_one_or_none()
-    if not summary or not company: raise ValueError('')
-    if not summary.summary or not summary.details:
-        update_dashboard(company_id, db)
+    )).scalar_one_or_none()
+    if not company: raise ValueError('')
+    if not summary or not summary.summary or not summary.details:
+        # answer from what is there, the dashboard is materialized in the background
+        await asyncio.to_thread(schedule_dashboard, company_id, 0, Priority.interactive)
+        summary = summary or CompanyDashboard(company_id=company_id)
     buffer = shape_dashboard_info(company, summary)
     return json.dumps(buffer)
 
-def make_conversation(question: UserQuestion, db: Session):
+async def make_conversation(question: UserQuestion, db: AsyncSession):
+    if settings.QUERY_PLANNER_ENABLED:
+        try:
+            res = await answer_with_plan(question, db)
+            if res is not None:
+                return res
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            logger.warning(f'query plan answer failed, using the dashboard context: {e}')
     company_context = ""
     if question.context:
         try:
-            company_context = build_company_context(
+            company_context = await build_company_context(
                 question.context.company_id, db
             )
         except:
@@ -48,26 +61,13 @@ Use ONLY the following company information.
 {company_context}
 """
 
-    history = [
-        types.Content(
-            role="user",
-            parts=[types.Part.from_text(text=m)]
-        )
-        for m in question.chat_history
-    ]
-
-
-    chat = client.chats.create(
-        model="gemini-2.5-flash",
-        config=types.GenerateContentConfig(
-            system_instruction=sys_prompt,
-            temperature=0.2
-        ),
-        history=history # type: ignore
+    # goes through the shared rate limiter ahead of any ingestion traffic,
+    # the client blocks so it waits on a worker thread instead of the event loop
+    res = await asyncio.to_thread(
+        get_gemini_client().chat_answer,
+        sys_prompt, question.chat_history, question.message,
+        prompt_type='chat.conversation', priority=Priority.interactive
     )
-
-    return "".join(
-        chunk.text or ""
-        for chunk in chat.send_message_stream(question.message)
-    )
-
+    if res is None:
+        raise ValueError('AI chat answer failed')
+    return res
@@ -0,0 +1,145 @@
+import time
+import threading
+from enum import Enum
+from redis.exceptions import RedisError
+
+from app.core.logging import logger
+from app.core.redis import get_sync_redis
+
+BREAKER_KEY = "llm:breaker:"
+
+class LLMUnavailable(Exception):
+    """Upstream is down or asked us to back off for longer than is worth sleeping."""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f'{self.message} (retry after {self.retry_after:.0f}s)'
+
+class BreakerState(Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+class CircuitBreaker:
+    """
+    Trips after `failure_threshold` consecutive upstream failures and fails
+    fast for `reset_timeout` seconds, then lets a single probe through
+    (half open). The open state is mirrored to redis so every process stops
+    calling a dead upstream, not only the one that saw the failures. A closed
+    breaker looks at redis at most once per `remote_check_interval`.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 60,
+        remote_check_interval: float = 1.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.remote_check_interval = remote_check_interval
+        self._lock = threading.Lock()
+        self.state = BreakerState.closed
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.remote_checked_at = 0.0
+        self.remote_open_until = 0.0
+
+    def before_call(self) -> bool:
+        """
+        Raise LLMUnavailable instead of calling upstream while the breaker is
+        open. True when this call is the half open probe, see release_probe.
+        """
+        with self._lock:
+            now = time.time()
+            if self.state == BreakerState.closed:
+                if now < self.remote_open_until:
+                    raise LLMUnavailable(
+                        f'{self.name} circuit open in another process', self.remote_open_until - now
+                    )
+                if now - self.remote_checked_at < self.remote_check_interval:
+                    return False
+                # one caller refreshes the remote state, the rest use the last answer
+                self.remote_checked_at = now
+            else:
+                remaining = self.opened_at + self.reset_timeout - now
+                if self.state == BreakerState.open and remaining > 0:
+                    raise LLMUnavailable(f'{self.name} circuit open', remaining)
+                # reset timeout passed, only one caller probes upstream
+                if self.probing:
+                    raise LLMUnavailable(f'{self.name} circuit half open', 1.0)
+                self.state = BreakerState.half_open
+                self.probing = True
+                return True
+
+        # outside the lock, a slow redis must not serialize every call
+        remote = self._remote_retry_after()
+        if remote:
+            with self._lock:
+                self.remote_open_until = now + remote
+            raise LLMUnavailable(f'{self.name} circuit open in another process', remote)
+        return False
+
+    def release_probe(self):
+        """Let the next caller probe when a probe ended without recording an outcome."""
+        with self._lock:
+            self.probing = False
+
+    def retry_after(self) -> float:
+        """Seconds left until the breaker lets a probe through, 0 when closed."""
+        with self._lock:
+            if self.state != BreakerState.open:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.time())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != BreakerState.closed:
+                logger.info(f'{self.name} circuit closed')
+                self._clear_open()
+            self.state = BreakerState.closed
+            self.failures = 0
+            self.probing = False
+            self.remote_open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == BreakerState.half_open or self.failures >= self.failure_threshold:
+                if self.state != BreakerState.open:
+                    logger.warning(
+                        f'{self.name} circuit open after {self.failures} consecutive failures'
+                    )
+                self.state = BreakerState.open
+                self.opened_at = time.time()
+                self._publish_open()
+
+    def _publish_open(self):
+        try:
+            r = get_sync_redis()
+            if r is not None:
+                r.set(BREAKER_KEY + self.name, "open", ex=max(1, int(self.reset_timeout)))
+        except RedisError as e:
+            logger.debug(f'failed to publish {self.name} circuit state: {e}')
+
+    def _clear_open(self):
+        try:
+            r = get_sync_redis()
+            if r is not None:
+                r.delete(BREAKER_KEY + self.name)
+        except RedisError:
+            pass
+
+    def _remote_retry_after(self) -> float | None:
+        try:
+            r = get_sync_redis()
+            if r is None:
+                return None
+            ttl = r.ttl(BREAKER_KEY + self.name)
+        except RedisError:
+            return None
+        return float(ttl) if ttl and ttl > 0 else None
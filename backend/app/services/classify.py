@@ -1,8 +1,13 @@
 import json
 from string import Template
+from typing import Callable
 from venv import logger
-from app.services.ai_prompt import get_gemini_client 
+from app.services.ai_prompt import get_gemini_client, Priority
+from app.services.circuit_breaker import LLMUnavailable
 from app.models.source import Source 
+from app.core.metrics import SECTION_MEMO, SECTION_MEMO_SCORE
+from app.services.fingerprint import SectionMemo
+from app.services.language import is_translation
 from app.schemas.classify import SentimentSignal, Statement
 
 template_sys_signal = """
@@ -58,7 +63,9 @@ def classify_text_section(text_section: Source):
             usr_prompt=template_usr_data.substitute(
                 title=text_section.title, body=text_section.body
             ),
-            response_schema=Statement
+            response_schema=Statement,
+            prompt_type='classify.statement',
+            cacheable=True
         )
         if not ans:
             return False
@@ -73,7 +80,9 @@ def classify_text_section(text_section: Source):
             usr_prompt=template_usr_data.substitute(
                 title=text_section.title, body=text_section.body
             ),
-            response_schema=SentimentSignal
+            response_schema=SentimentSignal,
+            prompt_type='classify.signal',
+            cacheable=True
         )
         if ans is None:
             return False
@@ -95,11 +104,52 @@ def __flexible_iterator(data: list, start_index=0):
             continue
         yield i, value
 
-def classify_text_sections(text_sections: list[Source], start_index=0):
+def reuse_classification(section: Source, memo: SectionMemo) -> bool:
+    match = memo.lookup(section)
+    if match is None:
+        SECTION_MEMO.labels("miss").inc()
+        return False
+    prior = match.source
+    section.signals = list(prior.signals or [])
+    section.statement_type = prior.statement_type
+    section.confidence = prior.confidence
+    section.classification_remarks = prior.classification_remarks
+    section.reused_from_id = prior.id
+    section.match_score = match.score
+    SECTION_MEMO.labels("exact" if match.exact else "near").inc()
+    if not match.exact:
+        SECTION_MEMO_SCORE.observe(match.score)
+    return True
+
+def classify_text_sections(
+    text_sections: list[Source], start_index=0, memo: SectionMemo | None = None,
+    cancelled: Callable[[], bool] | None = None
+):
+    """
+    memo holds the company's already classified sections, a section matching
+    one of them takes over its classification without calling the llm.
+    cancelled is polled before every section, the result then carries the
+    index to resume from.
+    """
+    reused = 0
     for idx, section in __flexible_iterator(text_sections, start_index):
-        check = classify_text_section(section)
+        if cancelled and cancelled():
+            return {'status': False, 'data': None, 'index': idx, 'cancelled': True}
+        if is_translation(section):
+            # the english original is classified, this copy is only kept for citations
+            continue
+        if memo and reuse_classification(section, memo):
+            reused += 1
+            continue
+        try:
+            check = classify_text_section(section)
+        except LLMUnavailable as e:
+            return {'status': False, 'data': None, 'index': idx, 'retry_after': e.retry_after}
         if not check:
             return {'status': False, 'data': None, 'index': idx}
+    if memo:
+        total = max(len(text_sections) - start_index, 1)
+        logger.info(f'reused classification for {reused}/{total} sections ({reused / total:.0%})')
     return {'status': True, 'data': None, 'index': None}
 
 
@@ -112,4 +162,7 @@ Do NOT return explanations.
 """
 
 def extract_company_name_user_prompt(text) -> str:
-    return get_gemini_client().single_prompt_answer(name_sys, text) or '' # type: ignore , its a str
+    return get_gemini_client().single_prompt_answer(
+        name_sys, text, prompt_type='company_id.user_prompt',
+        priority=Priority.interactive
+    ) or '' # type: ignore , its a str
@@ -0,0 +1,152 @@
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any
+from redis.exceptions import RedisError
+from google.genai import types
+
+from app.core.logging import logger
+from app.core.redis import get_sync_redis
+
+HANDLE_KEY = "llm:ctx_cache:"
+
+@dataclass
+class _Handle:
+    name: str | None
+    expires_at: float
+
+class ContextCacheManager:
+    """
+    Provider-side cached contents for large static system prompts.
+
+    A handle is keyed by model + system prompt and created on first use. It is
+    refreshed before its ttl runs out and shared with other processes through
+    redis so every worker reuses the same cached content. The response schema
+    cannot be cached upstream and stays in the generation config.
+
+    `get` returns None whenever the caller should send the prompt inline: the
+    prompt is under the provider minimum, the cache could not be created, or
+    a previous attempt failed recently.
+    """
+
+    def __init__(
+        self, caches: Any, model: str, ttl: int = 3600, min_tokens: int = 1024,
+        refresh_margin: int = 300, failure_backoff: int = 300,
+    ):
+        self.caches = caches
+        self.model = model
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.refresh_margin = refresh_margin
+        self.failure_backoff = failure_backoff
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._handles: dict[str, _Handle] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, sys_prompt: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{sys_prompt}".encode()).hexdigest()
+
+    def get(self, sys_prompt: str, estimated_tokens: int) -> str | None:
+        if estimated_tokens < self.min_tokens:
+            return None
+        key = self._key(sys_prompt)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            now = time.time()
+            handle = self._handles.get(key)
+            if handle and handle.name is None and now < handle.expires_at:
+                # creation failed recently, don't hammer the api
+                return None
+            if handle and handle.name and now < handle.expires_at - self.refresh_margin:
+                self.hits += 1
+                return handle.name
+            if handle and handle.name and now < handle.expires_at:
+                handle = self._refresh(key, handle)
+            else:
+                handle = self._shared_handle(key) or self._create(key, sys_prompt)
+            self._handles[key] = handle
+            if handle.name:
+                self.misses += 1
+            return handle.name
+
+    def invalidate(self, sys_prompt: str):
+        """Drop the handle, e.g. when the provider says the cached content is gone."""
+        key = self._key(sys_prompt)
+        with self._lock:
+            self._handles.pop(key, None)
+        try:
+            r = get_sync_redis()
+            if r is not None:
+                r.delete(HANDLE_KEY + key)
+        except RedisError:
+            pass
+
+    def _shared_handle(self, key: str) -> _Handle | None:
+        try:
+            r = get_sync_redis()
+            if r is None:
+                return None
+            name = r.get(HANDLE_KEY + key)
+            ttl = r.ttl(HANDLE_KEY + key)
+        except RedisError as e:
+            logger.debug(f"context cache redis unavailable: {e}")
+            return None
+        if not name or ttl is None or ttl <= self.refresh_margin:
+            return None
+        return _Handle(name, time.time() + ttl)
+
+    def _publish(self, key: str, handle: _Handle):
+        try:
+            r = get_sync_redis()
+            if r is not None and handle.name:
+                r.set(HANDLE_KEY + key, handle.name, ex=max(1, int(handle.expires_at - time.time())))
+        except RedisError as e:
+            logger.debug(f"context cache failed to publish handle: {e}")
+
+    def _create(self, key: str, sys_prompt: str) -> _Handle:
+        try:
+            cached = self.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=sys_prompt,
+                    display_name=f"sys-{key[:16]}",
+                    ttl=f"{self.ttl}s",
+                ),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to create Gemini context cache, sending prompt inline: {e}")
+            return _Handle(None, time.time() + self.failure_backoff)
+        handle = _Handle(cached.name, self._expires_at(cached))
+        logger.info(f"Created Gemini context cache {handle.name}")
+        self._publish(key, handle)
+        return handle
+
+    def _refresh(self, key: str, handle: _Handle) -> _Handle:
+        try:
+            cached = self.caches.update(
+                name=handle.name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"),
+            )
+        except Exception as e:
+            # keep serving the current handle until it actually expires
+            logger.debug(f"Failed to refresh Gemini context cache {handle.name}: {e}")
+            return handle
+        handle = _Handle(handle.name, self._expires_at(cached))
+        self._publish(key, handle)
+        return handle
+
+    def _expires_at(self, cached) -> float:
+        expire_time = getattr(cached, "expire_time", None)
+        if expire_time is not None:
+            return expire_time.timestamp()
+        return time.time() + self.ttl
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = sum(1 for h in self._handles.values() if h.name)
+        return {"hits": self.hits, "misses": self.misses, "active": active}
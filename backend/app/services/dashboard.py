@@ -1,15 +1,19 @@
 import json
+import time
+import hashlib
 from enum import Enum
 from datetime import datetime
-from typing import Iterable
+from typing import Any, Callable, Iterable
 from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 from app.models.report import Company, ReportingPeriod
 from app.models.analysis import BusinessStrategy, RiskAnalysis, QualitativePerformance, GrowthPotential
 from app.models import CompanyDashboard
 from app.schemas.dashboard import BusinessStrategyTheme, RiskAssessmentBase, ExecutiveSummary, CompanyAnalysis
-from app.services.ai_prompt import get_gemini_client, GeminiRateLimitedClient
+from app.services.ai_prompt import get_gemini_client, run_concurrently, GeminiRateLimitedClient, Priority
+from app.services.circuit_breaker import LLMUnavailable
 from app.core.logging import logger
+from app.core.database import release_connection
 from pydantic import BaseModel, Field
 
 from datetime import datetime, date
@@ -65,7 +69,68 @@ def normalize_types(value):
     return value
 
 
-def update_dashboard(company_id: int, db: Session):
+def section_rows(report_info: Iterable[ReportingPeriod], field: str) -> list[dict]:
+    return [
+        normalize_types(getattr(report, field).to_dict())
+        for report in report_info if getattr(report, field)
+    ]
+
+def section_hash(data) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+# step -> the steps whose results it needs, steps whose needs are met run together
+DASHBOARD_STEPS: dict[str, tuple[str, ...]] = {
+    'business': (),
+    'risk': (),
+    'executive': ('business', 'risk'),
+    'shape': ('executive',),
+}
+
+def run_steps(
+    steps: dict[str, tuple[tuple[str, ...], Callable[[dict], Any]]]
+) -> tuple[dict[str, Any], dict[str, float]]:
+    """
+    Run steps in waves, every step whose dependencies are done goes into the
+    same run_concurrently. Each step gets the results so far, returns the
+    results and the seconds each step took.
+    """
+    results: dict[str, Any] = {}
+    timings: dict[str, float] = {}
+
+    def timed(name: str, run: Callable[[dict], Any]):
+        def call():
+            start = time.perf_counter()
+            try:
+                return run(results)
+            finally:
+                timings[name] = round(time.perf_counter() - start, 3)
+        return call
+
+    pending = dict(steps)
+    while pending:
+        ready = [name for name, (deps, _) in pending.items() if all(d in results for d in deps)]
+        if not ready:
+            raise ValueError(f'dashboard steps {list(pending)} depend on missing steps')
+        for name, res in zip(ready, run_concurrently([timed(name, pending[name][1]) for name in ready])):
+            if isinstance(res, LLMUnavailable):
+                raise res
+            results[name] = res
+        for name in ready:
+            del pending[name]
+    return results, timings
+
+def update_dashboard(
+    company_id: int, db: Session, priority: Priority = Priority.interactive, force: bool = False,
+    data_version: int | None = None
+):
+    """
+    Rebuild the company dashboard. Each section keeps the hash of its inputs,
+    a section whose inputs are unchanged is taken from the previous build
+    instead of prompted again, unless force is set. The prompts run as
+    DASHBOARD_STEPS, the seconds each took are kept on the row, and so is
+    the data_version the inputs were read at.
+    """
+    started = time.perf_counter()
     company_info = db.execute(
         select(Company).where(Company.id == company_id)
     ).scalar_one_or_none()
@@ -89,46 +154,87 @@ def update_dashboard(company_id: int, db: Session):
     company_dashboard = db.execute(
         select(CompanyDashboard).where(CompanyDashboard.company_id == company_id)
     ).scalar_one_or_none()
-    if not company_dashboard:
-        company_dashboard = CompanyDashboard(company_id=company_id)
-        db.add(company_dashboard)
+    # everything is loaded, don't hold a connection through the prompts below
+    release_connection(db)
+
+    previous_hashes = {} if force or not company_dashboard else (company_dashboard.section_hashes or {})
+    previous_details = (company_dashboard.details if company_dashboard else None) or {}
+    previous_summary = company_dashboard.summary if company_dashboard else None
+    previous_overall = company_dashboard.overall if company_dashboard else None
+    hashes = {}
+    reused = []
+
+    def unchanged(section: str, data, previous) -> bool:
+        hashes[section] = section_hash(data)
+        if previous is not None and previous_hashes.get(section) == hashes[section]:
+            reused.append(section)
+            return True
+        return False
 
-    # busniess strat sum
     client = get_gemini_client()
-    business_sum = adjust_business_sum(report_info, client)
+
+    # busniess strat sum
+    def business(results: dict):
+        if unchanged('business', section_rows(report_info, 'business_strategy'), previous_details.get('businessStrategy')):
+            return previous_details['businessStrategy']
+        return adjust_business_sum(report_info, client, priority)
+
     # risk assesment summary
-    risk_assess = adjust_risk_assess(report_info, client)
+    def risk(results: dict):
+        if unchanged('risk', section_rows(report_info, 'risk_analysis'), previous_details.get('riskAssessment')):
+            return previous_details['riskAssessment']
+        return adjust_risk_assess(report_info, client, priority)
 
     # overall summary
-    details = {
-        "methodology": {
-            "signalSelection": "",
-            "ordering": "",
-            "lookbackYears": 5
-        },
-        "businessStrategy": business_sum,
-        "growthPotential": [
-            normalize_types(report.growth_potential.to_dict())
-            for report in report_info if report.growth_potential
-        ],
-        "sentimentAnalysis": [
-            normalize_types(report.qualitative_performance.to_dict())
-            for report in report_info if report.qualitative_performance
-        ],
-        "riskAssessment": risk_assess
-    }
-    overall = overall_assess(details, client)
+    def executive(results: dict):
+        details = {
+            "methodology": {
+                "signalSelection": "",
+                "ordering": "",
+                "lookbackYears": 5
+            },
+            "businessStrategy": results['business'],
+            "growthPotential": section_rows(report_info, 'growth_potential'),
+            "sentimentAnalysis": section_rows(report_info, 'qualitative_performance'),
+            "riskAssessment": results['risk']
+        }
+        hashes['growth'] = section_hash(details['growthPotential'])
+        hashes['sentiment'] = section_hash(details['sentimentAnalysis'])
+        if unchanged('executive', details, previous_summary):
+            return details, previous_summary
+        return details, overall_assess(details, client, priority)
+
+    def shape(results: dict):
+        details, overall = results['executive']
+        data = dashboard_payload(company_info, overall, details)
+        # asOf is the build time, it says nothing about the content
+        if unchanged('shape', {**data, 'asOf': None}, previous_overall):
+            return previous_overall
+        return make_sht_up_dashboard(data, priority)
+
+    steps = {'business': business, 'risk': risk, 'executive': executive, 'shape': shape}
+    results, timings = run_steps({name: (deps, steps[name]) for name, deps in DASHBOARD_STEPS.items()})
+    details, overall = results['executive']
+    data = results['shape']
+
+    if not company_dashboard:
+        company_dashboard = CompanyDashboard(company_id=company_id)
+        db.add(company_dashboard)
     company_dashboard.details = details
     company_dashboard.summary = overall
-    data =  shape_dashboard_info(company_info, company_dashboard)
-    data = make_sht_up_dashboard(data)
     company_dashboard.overall = normalize_types(data)
+    company_dashboard.section_hashes = hashes
+    timings['total'] = round(time.perf_counter() - started, 3)
+    company_dashboard.timings = timings
+    company_dashboard.data_version = data_version
     db.commit()
+    logger.info(f'dashboard {company_id} rebuilt in {timings}, reused sections: {reused or "none"}')
     return data
 
 def shape_dashboard_info(company: Company, company_dashboard: CompanyDashboard) -> dict:
-    overall = company_dashboard.summary
-    details = company_dashboard.details
+    return dashboard_payload(company, company_dashboard.summary, company_dashboard.details)
+
+def dashboard_payload(company: Company, overall, details) -> dict:
     return {
         "company": {
             "id": company.id,
@@ -143,7 +249,7 @@ def shape_dashboard_info(company: Company, company_dashboard: CompanyDashboard)
         "citations": []
     }
 
-def make_sht_up_dashboard(data: dict) -> dict:
+def make_sht_up_dashboard(data: dict, priority: Priority = Priority.interactive) -> dict:
     client = get_gemini_client()
     sys_prompt = """
 You are a financial research assistant.
@@ -166,15 +272,18 @@ If information cannot be reliably found:
 
 Return the final output as structured JSON, preserving the original schema and adding only the missing fields that were identified.
 """
-    res = client.single_prompt_answer(sys_prompt, json.dumps(data), CompanyAnalysis)
+    res = client.single_prompt_answer(
+        sys_prompt, json.dumps(data), CompanyAnalysis, prompt_type='dashboard.shape',
+        priority=priority
+    )
     return res.model_dump() # type: ignore
 
-def adjust_business_sum(report_info: Iterable[ReportingPeriod], client: GeminiRateLimitedClient) -> list[dict]:
+def adjust_business_sum(
+    report_info: Iterable[ReportingPeriod], client: GeminiRateLimitedClient,
+    priority: Priority = Priority.interactive
+) -> list[dict]:
     logger.info('check func adjust busniess sum')
-    db_data = []
-    for report in report_info:
-        if report.business_strategy:
-            db_data.append(normalize_types(report.business_strategy.to_dict()))
+    db_data = section_rows(report_info, 'business_strategy')
     if not db_data:
         return [
             {
@@ -185,7 +294,10 @@ def adjust_business_sum(report_info: Iterable[ReportingPeriod], client: GeminiRa
             }
         ]
     logger.info('check before prompt')
-    business_sum = client.single_prompt_answer(sys_prompt, json.dumps(db_data), AIBusinessSummary)
+    business_sum = client.single_prompt_answer(
+        sys_prompt, json.dumps(db_data), AIBusinessSummary, prompt_type='dashboard.business',
+        priority=priority
+    )
     if business_sum is None:
         raise ValueError(f'AI summarizing busniess info failed')
     assert isinstance(business_sum, AIBusinessSummary)
@@ -202,11 +314,11 @@ def adjust_business_sum(report_info: Iterable[ReportingPeriod], client: GeminiRa
         buffer_business_sum.append(buffer_2)
     return buffer_business_sum
 
-def adjust_risk_assess(report_info: Iterable[ReportingPeriod], client: GeminiRateLimitedClient) -> dict:
-    db_data = []
-    for report in report_info:
-        if report.risk_analysis:
-            db_data.append(normalize_types(report.risk_analysis.to_dict()))
+def adjust_risk_assess(
+    report_info: Iterable[ReportingPeriod], client: GeminiRateLimitedClient,
+    priority: Priority = Priority.interactive
+) -> dict:
+    db_data = section_rows(report_info, 'risk_analysis')
     if not db_data:
         return {
             "overallScore": 0,
@@ -214,7 +326,10 @@ def adjust_risk_assess(report_info: Iterable[ReportingPeriod], client: GeminiRat
             "summary": "No info on company’s risk profile found",
             "factors": []
         }
-    risk_assess = client.single_prompt_answer(sys_prompt, json.dumps(db_data), RiskAssessmentBase)
+    risk_assess = client.single_prompt_answer(
+        sys_prompt, json.dumps(db_data), RiskAssessmentBase, prompt_type='dashboard.risk',
+        priority=priority
+    )
     if risk_assess is None:
         raise ValueError(f'AI summarizing risk assesment failed')
     assert isinstance(risk_assess, RiskAssessmentBase)
@@ -222,8 +337,14 @@ def adjust_risk_assess(report_info: Iterable[ReportingPeriod], client: GeminiRat
     res['factors'] = db_data
     return res
 
-def overall_assess(details: dict, client: GeminiRateLimitedClient) -> dict:
-    overall_assessment = client.single_prompt_answer(sys_prompt, json.dumps(details), ExecutiveSummary)
+def overall_assess(
+    details: dict, client: GeminiRateLimitedClient,
+    priority: Priority = Priority.interactive
+) -> dict:
+    overall_assessment = client.single_prompt_answer(
+        sys_prompt, json.dumps(details), ExecutiveSummary, prompt_type='dashboard.overall',
+        priority=priority
+    )
     if overall_assessment is None:
         raise ValueError(f'AI overall assessment failed')
     return overall_assessment.model_dump() # type: ignore
@@ -0,0 +1,126 @@
+from redis.exceptions import LockError
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.celery import get_time_limits
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logging import logger
+from app.core.redis import get_redis, get_sync_redis
+from app.models.report import ReportingPeriod
+from app.schemas.dashboard import CompanyAnalysis
+from app.services.ai_prompt import Priority
+from app.services.dashboard import update_dashboard, normalize_types
+
+# bumped on every commit that touches a company's reporting periods
+DASHBOARD_VERSION_KEY = "dashboard:version:"
+# "<version>\n<CompanyAnalysis json>", the version is the one the dashboard was built from
+DASHBOARD_CACHE_KEY = "dashboard:cache:"
+# set while a materialization is queued, the debounce window
+DASHBOARD_SCHEDULED_KEY = "dashboard:scheduled:"
+# held by the one rebuild running for a company
+DASHBOARD_LOCK_KEY = "dashboard:lock:"
+
+def _lock_timeout() -> int:
+    return get_time_limits(settings.CELERY_LLM_QUEUE)["time_limit"]
+
+def _collect_periods(session: Session, flush_context):
+    companies = session.info.setdefault("dashboard_companies", set())
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, ReportingPeriod) and obj.company_id:
+            companies.add(obj.company_id)
+
+def _bump_versions(session: Session):
+    companies = session.info.pop("dashboard_companies", None)
+    if not companies:
+        return
+    redis = get_sync_redis()
+    if redis is None:
+        return
+    pipe = redis.pipeline()
+    for company_id in companies:
+        pipe.incr(f"{DASHBOARD_VERSION_KEY}{company_id}")
+    pipe.execute()
+
+def _drop_versions(session: Session):
+    session.info.pop("dashboard_companies", None)
+
+def track_reporting_periods(factory: sessionmaker):
+    """Bump the dashboard version of every company whose periods a committed session changed."""
+    event.listen(factory, "after_flush", _collect_periods)
+    event.listen(factory, "after_commit", _bump_versions)
+    event.listen(factory, "after_rollback", _drop_versions)
+
+track_reporting_periods(SessionLocal)
+
+def serialize_dashboard(data: dict) -> str | None:
+    """Validate once when the dashboard is built, hits are served as this json."""
+    try:
+        return CompanyAnalysis.model_validate(normalize_types(data)).model_dump_json(by_alias=True)
+    except Exception as e:
+        logger.warning(f'dashboard not cached, it does not fit CompanyAnalysis: {e}')
+        return None
+
+def dashboard_envelope(body: str, refreshing: bool) -> str:
+    """CompanyAnalysisResult around an already serialized CompanyAnalysis."""
+    return f'{{"success":true,"data":{body},"refreshing":{"true" if refreshing else "false"},"error":null}}'
+
+def rebuild_dashboard(
+    company_id: int, db: Session, priority: Priority = Priority.batch, force: bool = False
+) -> dict | None:
+    """
+    update_dashboard under the company lock, the result is cached under the
+    data version read before the rebuild. None when another rebuild holds the lock.
+    """
+    redis = get_sync_redis()
+    if redis is None:
+        return update_dashboard(company_id, db, priority, force)
+    lock = redis.lock(f"{DASHBOARD_LOCK_KEY}{company_id}", timeout=_lock_timeout(), blocking=False)
+    if not lock.acquire():
+        return None
+    try:
+        version = int(redis.get(f"{DASHBOARD_VERSION_KEY}{company_id}") or 0)
+        data = update_dashboard(company_id, db, priority, force, version)
+        body = serialize_dashboard(data)
+        if body is not None:
+            redis.set(f"{DASHBOARD_CACHE_KEY}{company_id}", f"{version}\n{body}")
+        return data
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f'dashboard lock of company {company_id} expired before the rebuild finished')
+
+async def read_dashboard_cache(company_id: int) -> tuple[str, bool] | None:
+    """(json, fresh) of the cached dashboard, fresh when no period changed since it was built."""
+    redis = await get_redis()
+    if redis is None:
+        return None
+    version, cached = await redis.mget(
+        f"{DASHBOARD_VERSION_KEY}{company_id}", f"{DASHBOARD_CACHE_KEY}{company_id}"
+    )
+    if not cached:
+        return None
+    built_from, body = cached.split("\n", 1)
+    return body, int(built_from) >= int(version or 0)
+
+async def fill_dashboard_cache(company_id: int, body: str, built_from: int | None) -> bool:
+    """
+    Cache a dashboard loaded from the db under the version it was built from,
+    never over one a rebuild wrote meanwhile. An unknown version counts as
+    stale. True when the dashboard is fresh.
+    """
+    redis = await get_redis()
+    if redis is None:
+        return True
+    version = -1 if built_from is None else built_from
+    await redis.set(f"{DASHBOARD_CACHE_KEY}{company_id}", f"{version}\n{body}", nx=True)
+    return version >= int(await redis.get(f"{DASHBOARD_VERSION_KEY}{company_id}") or 0)
+
+async def dashboard_refreshing(company_id: int) -> bool:
+    redis = await get_redis()
+    if redis is None:
+        return False
+    return bool(await redis.exists(
+        f"{DASHBOARD_SCHEDULED_KEY}{company_id}", f"{DASHBOARD_LOCK_KEY}{company_id}"
+    ))
@@ -2,10 +2,15 @@ import json
 from datetime import datetime
 from copy import deepcopy
 from string import Template
-from functools import lru_cache
+from functools import lru_cache, partial
 from app.core.database import from_dict
+from app.core.config import settings
 from app.core.logging import logger
-from app.services.ai_prompt import get_gemini_client
+from app.core.metrics import STATEMENT_PARSER
+from app.services.ai_prompt import get_gemini_client, PromptBatch
+from app.services.circuit_breaker import LLMUnavailable
+from app.services.language import is_translation
+from app.services.statement_parser import parse_statement
 from app.services.organize_section import (
     flexible_iterator, adjust_json_enum_key_2_str, adjust_raw_json_with_enum,
     save_ai_response_schema
@@ -53,7 +58,7 @@ def prepare_statement_data(sources: list[Source]):
     mapping = __cache_mapping()
     data_group : dict[PossibleStatement, tuple[str, str, int]]= {}
     for data in sources:
-        if not data.tables or data.statement_type not in mapping:
+        if not data.tables or data.statement_type not in mapping or is_translation(data):
             # print(data.statement_type)
             # print('trigger skip')
             continue
@@ -65,11 +70,11 @@ def prepare_statement_data(sources: list[Source]):
         # assume only one source of statement is valid
     return data_group
 
-def extract_statement_from_sources(
+def plan_statement_extraction(
         report: CompanyReport, company: Company,
         data_group: dict[str, tuple[str, str, int]] | None = None,
-        resume_index: int = 0, expected_year: int | None = None 
-):
+        resume_index: int = 0, expected_year: int | None = None
+) -> PromptBatch:
     mapping = __cache_mapping()
     client = get_gemini_client()
     if not data_group:
@@ -79,6 +84,7 @@ def extract_statement_from_sources(
     if not expected_year:
         expected_year = int(datetime.now().year)
     logger.info(f'checking data fields {data.keys()}')
+    jobs = []
     for idx, type_, (sys_prompt, prompt_schema, db_model) in flexible_iterator(mapping, resume_index):
         try:
             logger.info(f'looping extract statement at {type_}')
@@ -86,15 +92,45 @@ def extract_statement_from_sources(
         except:
             logger.warning(f'{report.celery_task_id}, {report.file_key}: {type_} not found')
             continue
+        parsed = parse_statement(type_, title, table, expected_year) if settings.STATEMENT_PARSER_ENABLED else None
+        if parsed and parsed.confidence >= settings.STATEMENT_PARSER_MIN_CONFIDENCE:
+            logger.info(f'parsed {type_.value} locally, confidence {parsed.confidence:.2f}')
+            STATEMENT_PARSER.labels(type_.value, 'local').inc()
+            jobs.append((idx, type_, db_model, id_, parsed.data))
+            continue
+        if parsed:
+            logger.info(f'{type_.value} sent to the llm, local parse {parsed.confidence:.2f}: {"; ".join(parsed.issues)}')
+        STATEMENT_PARSER.labels(type_.value, 'llm').inc()
         usr_prompt = template_user.substitute(title=title, tables=table)
-        response = client.single_prompt_answer(
-            sys_prompt=sys_prompt, usr_prompt=usr_prompt, response_schema=prompt_schema
+        call = partial(
+            client.single_prompt_answer,
+            sys_prompt=sys_prompt, usr_prompt=usr_prompt, response_schema=prompt_schema,
+            prompt_type=f'statement.{type_.value}', cacheable=True
         )
-        if not response:
-            return {'status': False, 'data': adjust_json_enum_key_2_str(data), 'index': idx}
-        logger.info(f'{type(response)}')
-        save_ai_response_schema(
-            company, response, db_model, type_.value, # type: ignore
-            report.uploaded_at, expected_year, sources_id=(id_,),  # type: ignore
-        ) 
-    return {'status': True, 'data': None, 'index': None}
+        jobs.append((idx, type_, db_model, id_, call))
+    calls = [job for *_, job in jobs if callable(job)]
+
+    def apply(answers: list):
+        # local parses keep their slot, llm answers fill the others in order
+        answers_iter = iter(answers)
+        responses = [next(answers_iter) if callable(job) else job for *_, job in jobs]
+        for (idx, type_, db_model, id_, _), response in zip(jobs, responses):
+            if not response or isinstance(response, LLMUnavailable):
+                return {
+                    'status': False, 'data': adjust_json_enum_key_2_str(data), 'index': idx,
+                    'retry_after': response.retry_after if response else None
+                }
+            logger.info(f'{type(response)}')
+            save_ai_response_schema(
+                company, response, db_model, type_.value, # type: ignore
+                report.uploaded_at, expected_year, sources_id=(id_,),  # type: ignore
+            )
+        return {'status': True, 'data': None, 'index': None}
+    return PromptBatch(calls, apply)
+
+def extract_statement_from_sources(
+        report: CompanyReport, company: Company,
+        data_group: dict[str, tuple[str, str, int]] | None = None,
+        resume_index: int = 0, expected_year: int | None = None 
+):
+    return plan_statement_extraction(report, company, data_group, resume_index, expected_year).run()
@@ -0,0 +1,133 @@
+import re
+import hashlib
+import numpy as np
+from dataclasses import dataclass
+from typing import Iterable
+from sqlalchemy import select
+from sqlalchemy.orm import Session, load_only
+
+from app.core.config import settings
+from app.models.source import Source
+from app.models.report import CompanyReport
+
+SIMHASH_BITS = 64
+# 8 bands of 8 bits, two hashes within hamming distance 7 always share a band
+BANDS = 8
+BAND_BITS = SIMHASH_BITS // BANDS
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD = re.compile(r"[a-z0]+")
+
+def normalize_text(*parts: str | None) -> str:
+    """Lowercase words with every number folded to 0, so a new fiscal year still matches."""
+    text = " ".join(p for p in parts if p).lower()
+    return " ".join(_WORD.findall(_NUMBER.sub("0", text)))
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def _to_signed(value: int) -> int:
+    # postgres BIGINT is signed
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def simhash(text: str, shingle: int = 3) -> int:
+    words = text.split()
+    hashes = np.array([
+        int.from_bytes(
+            hashlib.blake2b(" ".join(words[i:i + shingle]).encode(), digest_size=8).digest(), "big"
+        )
+        for i in range(max(1, len(words) - shingle + 1))
+    ], dtype=np.uint64)
+    # per bit: set in more than half of the shingles
+    ones = ((hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64)) & np.uint64(1)).sum(axis=0)
+    value = sum(1 << bit for bit in np.flatnonzero(ones * 2 > len(hashes)).tolist())
+    return _to_signed(value)
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & ((1 << SIMHASH_BITS) - 1)).bit_count()
+
+def fingerprint(title: str | None, body: str | None, tables: str | None) -> tuple[str, int | None]:
+    """(content_hash, simhash), simhash only for sections long enough to be stable."""
+    text = normalize_text(title, body, tables)
+    return content_hash(text), (
+        simhash(text) if len(text.split()) >= settings.SECTION_MEMO_MIN_WORDS else None
+    )
+
+def fingerprint_source(source: Source):
+    source.content_hash, source.simhash = fingerprint(source.title, source.body, source.tables)
+
+@dataclass
+class MemoMatch:
+    source: Source
+    score: float
+    exact: bool
+
+class SectionMemo:
+    """
+    Classified sections of a company's previous reports, looked up by exact
+    content hash first and then by SimHash within `max_distance` bits.
+    """
+
+    def __init__(self, sources: Iterable[Source], min_similarity: float = 0.92):
+        self.max_distance = int(SIMHASH_BITS * (1 - min_similarity))
+        self.exact: dict[str, Source] = {}
+        self.bands: list[dict[int, list[tuple[int, Source]]]] = [{} for _ in range(BANDS)]
+        self.size = 0
+        for source in sources:
+            self.add(source)
+
+    def add(self, source: Source):
+        if not source.content_hash:
+            fingerprint_source(source)
+        self.size += 1
+        self.exact.setdefault(source.content_hash, source) # type: ignore
+        if source.simhash is None:
+            return
+        for band, key in enumerate(self._band_keys(source.simhash)):
+            self.bands[band].setdefault(key, []).append((source.simhash, source))
+
+    def _band_keys(self, value: int) -> list[int]:
+        mask = (1 << BAND_BITS) - 1
+        return [(value >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+    def lookup(self, source: Source) -> MemoMatch | None:
+        if not source.content_hash:
+            fingerprint_source(source)
+        found = self.exact.get(source.content_hash) # type: ignore
+        if found is not None:
+            return MemoMatch(found, 1.0, True)
+        if source.simhash is None:
+            return None
+        best: tuple[int, Source] | None = None
+        for band, key in enumerate(self._band_keys(source.simhash)):
+            for value, candidate in self.bands[band].get(key, ()):
+                distance = hamming(value, source.simhash)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate)
+        if best is None:
+            return None
+        return MemoMatch(best[1], 1 - best[0] / SIMHASH_BITS, False)
+
+def build_section_memo(db: Session, company_id: int | None, exclude_report_id: int | None = None) -> SectionMemo | None:
+    if company_id is None or not settings.SECTION_MEMO_ENABLED:
+        return None
+    stmt = (
+        select(Source)
+        .join(CompanyReport, Source.report_id == CompanyReport.id)
+        .where(
+            (CompanyReport.company_id == company_id) & (Source.confidence > 0)
+        )
+        .options(load_only(
+            Source.id, Source.title, Source.body, Source.tables, Source.signals,
+            Source.statement_type, Source.confidence, Source.classification_remarks,
+            Source.content_hash, Source.simhash,
+        ))
+        .order_by(Source.id.desc())
+    )
+    if exclude_report_id is not None:
+        stmt = stmt.where(CompanyReport.id != exclude_report_id)
+    # rows from before fingerprints existed get them filled here and saved with the task
+    sources = db.execute(stmt).scalars().all()
+    if not sources:
+        return None
+    return SectionMemo(sources, settings.SECTION_MEMO_MIN_SIMILARITY)
@@ -1,7 +1,11 @@
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from app.services.ai_prompt import get_gemini_client, enum_to_examples
+from app.services.organize_section import closest_str_enum_match
 from app.schemas.company_info import CompanyInfo
 from app.models.source import Source
-from app.models.report import Industry
+from app.models.report import Company, Industry
 from app.core.logging import logger
 
 def prompt_company_info(text: str) -> CompanyInfo:
@@ -13,7 +17,8 @@ def prompt_company_info(text: str) -> CompanyInfo:
             f"USE the closest industry from this list: {enum_to_examples(Industry)}"
         ),
         usr_prompt=text,
-        response_schema=CompanyInfo
+        response_schema=CompanyInfo,
+        prompt_type='company_id.report'
     )
     return result # type: ignore
 
@@ -27,3 +32,38 @@ def get_company_info(sources_list: list[Source]) -> CompanyInfo | None:
         if len(res) > 10000:
             break
     return prompt_company_info(res)
+
+def identify_company(data: list[Source], db: Session) -> tuple[Company, int]:
+    return resolve_company(get_company_info(data), db)
+
+def resolve_company(company_info: CompanyInfo | None, db: Session) -> tuple[Company, int]:
+    """The db half of identify_company, for callers that prompt outside their transaction."""
+    # logger.info(company_info)
+    if not company_info:
+        raise ValueError(f'Company Identification Failed')
+    if not company_info.company_name and not company_info.resigtration_no:
+        raise ValueError("Both company name and resigtration no unable to indentify")
+    company = db.execute(
+        select(Company).where(Company.company_id == company_info.resigtration_no)
+    ).scalar_one_or_none()
+    if not company:
+        company = db.execute(
+            select(Company)
+            .where(Company.company_name == company_info.company_name)
+        ).scalar_one_or_none()
+    if not company:
+        company = Company(
+            company_id=company_info.resigtration_no,
+            company_name=company_info.company_name,
+            industry=(
+                closest_str_enum_match(Industry, company_info.industry)
+                if company_info.industry else None
+            )
+        )
+        db.add(company)
+    if not company.company_id and company_info.resigtration_no:
+        company.company_id = company_info.resigtration_no
+    if not company.industry and company_info.industry:
+        company.industry = closest_str_enum_match(Industry, company_info.industry)
+    fiscal_year = company_info.fiscal_year or int(datetime.now().year) - 1
+    return company, fiscal_year
@@ -0,0 +1,107 @@
+import re
+from difflib import SequenceMatcher
+from typing import Protocol, Sequence
+
+from app.core.config import settings
+from app.models.source import Source
+
+ENGLISH_STOPWORDS = frozenset("""
+the and of to in is for on with as by that this are was be at from an which our has
+have its were will not or it their we been also during these other such into than
+""".split())
+
+MALAY_STOPWORDS = frozenset("""
+dan yang untuk dalam pada dengan ini itu kepada oleh adalah telah akan daripada bagi
+serta atau tidak lebih kami sebagai di ke juga mereka secara antara bahawa semua setiap
+tersebut iaitu manakala berikut turut namun sejak bagi selain melalui terhadap
+""".split())
+
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+_NUMBER = re.compile(r"\d[\d,.]*\d|\d")
+_NAME = re.compile(r"\b[A-Z][A-Za-z&'-]{2,}\b")
+
+class SectionLike(Protocol):
+    title: str | None
+    body: str | None
+    tables: str | None
+    page_number: int
+
+def detect_language(text: str, min_hits: int = 5) -> str | None:
+    """'en' or 'ms' by stopword counts, None when the text is too short to tell."""
+    words = [w.lower() for w in _WORD.findall(text)]
+    en = sum(1 for w in words if w in ENGLISH_STOPWORDS)
+    ms = sum(1 for w in words if w in MALAY_STOPWORDS)
+    if en + ms < min_hits:
+        return None
+    if en >= 2 * ms:
+        return "en"
+    if ms >= 2 * en:
+        return "ms"
+    return None
+
+def _numbers(text: str) -> set[str]:
+    # 1,234.5 and 1234.5 are the same figure, the separators differ between languages
+    return {n.replace(",", "").rstrip(".") for n in _NUMBER.findall(text)}
+
+def _names(text: str) -> set[str]:
+    # capitalised words that are not stopwords: company, people and place names survive translation
+    return {
+        w.lower() for w in _NAME.findall(text)
+        if w.lower() not in ENGLISH_STOPWORDS and w.lower() not in MALAY_STOPWORDS
+    }
+
+def _jaccard(a: set, b: set) -> float | None:
+    if not a and not b:
+        return None
+    return len(a & b) / len(a | b)
+
+def _section_text(section: SectionLike) -> str:
+    return "\n".join(p for p in (section.title, section.body, section.tables) if p)
+
+def translation_score(english: SectionLike, malay: SectionLike) -> float:
+    en_text, ms_text = _section_text(english), _section_text(malay)
+    len_ratio = min(len(en_text), len(ms_text)) / max(len(en_text), len(ms_text), 1)
+    if len_ratio < 0.5:
+        return 0.0
+    features = [
+        (_jaccard(_numbers(en_text), _numbers(ms_text)), 0.45),
+        (_jaccard(_names(en_text), _names(ms_text)), 0.3),
+        (SequenceMatcher(None, (english.title or "").lower(), (malay.title or "").lower()).ratio(), 0.1),
+        (len_ratio, 0.15),
+    ]
+    # a side with no numbers or names says nothing, spread its weight over the rest
+    known = [(value, weight) for value, weight in features if value is not None]
+    return sum(value * weight for value, weight in known) / sum(weight for _, weight in known)
+
+def find_translations(sections: Sequence[SectionLike]) -> tuple[list[str | None], dict[int, int]]:
+    """
+    Detect the language of every section and pair each Malay section with the
+    English section it translates, looking only within a few pages.
+    Returns (languages, {malay index: english index}); indices into `sections`.
+    """
+    languages = [detect_language(_section_text(s)) for s in sections]
+    english = [i for i, lang in enumerate(languages) if lang == "en"]
+    max_gap = settings.TRANSLATION_MAX_PAGE_GAP
+    candidates: list[tuple[float, int, int]] = []
+    for m, lang in enumerate(languages):
+        if lang != "ms":
+            continue
+        for e in english:
+            if abs(sections[e].page_number - sections[m].page_number) > max_gap:
+                continue
+            score = translation_score(sections[e], sections[m])
+            if score >= settings.TRANSLATION_MIN_SCORE:
+                candidates.append((score, m, e))
+
+    # best pairs first, every section takes part in at most one pair
+    pairs: dict[int, int] = {}
+    used: set[int] = set()
+    for _, m, e in sorted(candidates, reverse=True):
+        if m in pairs or e in used:
+            continue
+        pairs[m] = e
+        used.add(e)
+    return languages, pairs
+
+def is_translation(source: Source) -> bool:
+    return source.translation_of_id is not None or source.translation_of is not None
@@ -6,6 +6,7 @@ import cv2
 import numpy as np
 from pymupdf import Document, Page, Matrix, open as pdf_open
 from pymupdf.utils import get_pixmap
+from app.core.config import settings
 from app.core.logging import logger
 from app.schemas.classify import SectionTypes, TextSection
 
@@ -13,8 +14,8 @@ from app.schemas.classify import SectionTypes, TextSection
 import os
 
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"      # hard disable GPU
-os.environ["OMP_NUM_THREADS"] = "4"
-os.environ["MKL_NUM_THREADS"] = "4"
+os.environ["OMP_NUM_THREADS"] = str(settings.OCR_CPU_THREADS)
+os.environ["MKL_NUM_THREADS"] = str(settings.OCR_CPU_THREADS)
 
 loaded: bool = False
 det_model_name = 'PP-OCRv5_mobile_det'
@@ -48,7 +49,9 @@ def get_ocr_engine():
         use_doc_orientation_classify=False,
         use_doc_unwarping=False,
         use_textline_orientation=False,
-        enable_mkldnn=False
+        enable_mkldnn=False,
+        # the worker pool is sized by cores // OCR_CPU_THREADS
+        cpu_threads=settings.OCR_CPU_THREADS,
         # device="CPU",
 
         # lang="en",
@@ -1,16 +1,22 @@
+from dataclasses import dataclass
 from datetime import datetime
 import re
 from typing import  TypeVar
 from difflib import SequenceMatcher
 from enum import Enum
 import json
-from typing import Iterable
+from typing import Iterable, Sequence
 from venv import logger
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
 from app.schemas.classify import TextSection, SectionTypes
 from app.models.source import Source, FinancialElementBase
 from app.models.report import CompanyReport, Company, ReportingPeriod
 from app.schemas.shared_identifier import DataListBase, IdentifierBase
+from app.core.config import settings
 from app.core.database import from_dict
+from app.services.fingerprint import fingerprint
+from app.services.language import find_translations
 
 def _tokens(s: str) -> set[str]:
     return set(re.findall(r"[a-z0-9]+", s.lower()))
@@ -74,24 +80,81 @@ def group_sections(text_sections: list[TextSection]) -> list[dict[str, str]]:
         res.append(buffer)
     return res
 
-def save_text_sections(report: CompanyReport, text_sections: list[list[TextSection]]):
-    sources_list = []
+@dataclass(slots=True)
+class SectionRow:
+    """A source row before insert, cheap enough to build thousands per report."""
+    page_number: int
+    title: str | None
+    body: str | None
+    tables: str | None
+    content_hash: str | None = None
+    simhash: int | None = None
+    language: str | None = None
+
+def build_section_rows(text_sections: list[list[TextSection]]) -> list[SectionRow]:
+    rows = []
     for page_no, section in enumerate(text_sections):
-        groups = group_sections(section)
-        # if groups:
-        #     logger.info(f'debuggin {json.dumps(groups[0], indent=2)}')
-        buffer = [from_dict(Source, group) for group in groups]
-        for b in buffer: b.page_number = int(page_no)
-        sources_list.extend(buffer)
-    report.report_sources = sources_list
-    logger.info(f'debug total len report sources {len(report.report_sources)}')
+        for group in group_sections(section):
+            row = SectionRow(int(page_no), group['title'], group['body'], group['tables'])
+            row.content_hash, row.simhash = fingerprint(row.title, row.body, row.tables)
+            rows.append(row)
+    return rows
+
+def save_text_sections(
+    db: Session, report: CompanyReport, text_sections: list[list[TextSection]],
+    batch_size: int | None = None
+) -> list[int]:
+    """
+    Replace the report sources with the ocr sections through multi-row
+    INSERT .. RETURNING, no Source objects are built. Returns the new ids in page order.
+    """
+    batch_size = batch_size or settings.SOURCE_INSERT_BATCH_SIZE
+    rows = build_section_rows(text_sections)
+    pairs = {}
+    if settings.TRANSLATION_DEDUP_ENABLED:
+        languages, pairs = find_translations(rows)
+        for row, language in zip(rows, languages):
+            row.language = language
+
+    db.execute(delete(Source).where(Source.report_id == report.id))
+    now = datetime.now()
+    ids: list[int] = []
+    for start in range(0, len(rows), batch_size):
+        ids.extend(db.scalars(
+            insert(Source).returning(Source.id, sort_by_parameter_order=True),
+            [
+                {
+                    'report_id': report.id, 'page_number': row.page_number,
+                    'title': row.title, 'body': row.body, 'tables': row.tables,
+                    'signals': [], 'confidence': 0.0, 'is_from_lastest_report': False,
+                    'content_hash': row.content_hash, 'simhash': row.simhash,
+                    'language': row.language, 'created_at': now, 'updated_at': now,
+                }
+                for row in rows[start:start + batch_size]
+            ],
+        ))
+    if pairs:
+        # the links need both ids so they go in after the insert
+        db.execute(update(Source), [
+            {'id': ids[m], 'translation_of_id': ids[e]} for m, e in pairs.items()
+        ])
+        logger.info(f'tagged {len(pairs)}/{len(rows)} sections as translations')
+    # the relationship reloads the new rows on next access
+    db.expire(report, ['report_sources'])
+    logger.info(f'debug total len report sources {len(ids)}')
+    return ids
 
 def save_ai_response_schema(
         company: Company, response: DataListBase, db_model: type[FinancialElementBase],
         db_field: str, data_date: datetime, default_year: int,
-        sources_id: Iterable[int] = []
+        sources_id: Iterable[int] = [],
+        item_sources_id: Sequence[Iterable[int]] | None = None
 ):
-    for statement in response.data:
+    """
+    item_sources_id, when given, holds the source ids of each item in
+    response.data and takes precedence over sources_id.
+    """
+    for i, statement in enumerate(response.data):
         assert isinstance(statement, IdentifierBase)
         buffer = statement.model_dump()
         # logger.info(f'converting {json.dumps(buffer, indent=2)}')
@@ -105,7 +168,7 @@ def save_ai_response_schema(
             company.reporting_period.append(period)
         data = from_dict(db_model, buffer)
         # logger.info(f'conversion result {json.dumps(data.to_dict(), indent=2)}')
-        for id_ in sources_id: data.add_source(id_)
+        for id_ in (item_sources_id[i] if item_sources_id else sources_id): data.add_source(id_)
         logger.info(f'check typing {type(period)} field: {db_field} data , type {type(data)}')
         setattr(period, db_field, data) # assume the lastest info is the most accurate info
 
@@ -128,5 +191,6 @@ def adjust_raw_json_with_enum(data: dict, enum: type[Enum]):
 def adjust_json_enum_key_2_str(data: dict):
     res = {}
     for key, val in data.items():
-        res[str(key)] = val
+        # store the enum value so adjust_raw_json_with_enum can map it back on resume
+        res[key.value if isinstance(key, Enum) else str(key)] = val
     return res
\ No newline at end of file
@@ -0,0 +1,472 @@
+"""
+Report ingestion as a DAG of stages
+
+    ocr -> group -> company_id -> classify -> {statements, signals} -> dashboard
+
+Every execution of a stage is saved as a PipelineStageRun under the hash of
+its inputs: its version, an optional key (the file for ocr) and the output
+hashes of the stages it depends on. A stage whose input hash already has a
+finished run is skipped, so a rerun only redoes what changed downstream of
+the first stage that did. A stage stopped part way keeps its resume state in
+the run's output and picks it up on the next run with the same input.
+
+Each stage names the celery queue it runs on. OCR and grouping need the
+paddle engine and run on the prefork ocr workers, everything after runs on
+the llm thread pool; when the next stage belongs to the other queue the run
+stops and hands the report over (see app/celery/pipeline.py).
+
+Stages whose dependencies are all done run together. Stages that are only
+prompts (statements and signals) hand back a PromptBatch, the prompts of all
+of them share one thread pool and their db writes are applied one by one.
+"""
+import json
+import time
+import hashlib
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Callable, Iterable
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import llm_scope
+from app.core.redis import get_sync_redis
+from app.core.database import release_connection
+from app.models.pipeline import PipelineStageRun, StageStatus
+from app.models.report import Company, CompanyReport
+from app.schemas.classify import TextSection
+from app.services.ai_prompt import PromptBatch, run_concurrently
+from app.services.circuit_breaker import LLMUnavailable
+from app.services.classify import classify_text_sections
+from app.celery.dashboard import schedule_dashboard
+from app.services.extract_statement import plan_statement_extraction
+from app.services.file import file_manager
+from app.services.fingerprint import build_section_memo
+from app.services.get_company import get_company_info, resolve_company
+from app.services.organize_section import save_text_sections
+from app.services.text_analysis import plan_text_extraction
+
+PIPELINE_CANCEL_KEY = "pipeline:cancel:"
+CANCEL_TTL = 24 * 3600
+# storage directory of the ocr pages, one json file per report and result
+OCR_RESULT_DIR = "ocr"
+
+class PipelineCancelled(Exception):
+    def __init__(self, message: str, state: dict | None = None):
+        super().__init__(message)
+        self.state = state
+
+class StageWaiting(Exception):
+    """A stage stopped part way, state is what the next run resumes from."""
+    def __init__(self, message: str, state: dict, retry_after: float | None = None):
+        super().__init__(message)
+        self.state = state
+        self.retry_after = retry_after
+
+@dataclass
+class PipelineContext:
+    db: Session
+    report: CompanyReport
+    # output of every stage finished or skipped in this run, loaded on demand
+    outputs: dict[str, dict | None] = field(default_factory=dict)
+
+    def release(self):
+        """Give the connection back before slow work, see release_connection."""
+        release_connection(self.db)
+
+    def cancelled(self) -> bool:
+        redis = get_sync_redis()
+        if redis is None:
+            return False
+        try:
+            return bool(redis.exists(f"{PIPELINE_CANCEL_KEY}{self.report.id}"))
+        except Exception as e:
+            logger.warning(f'cannot read pipeline cancel flag: {e}')
+            return False
+
+@dataclass
+class Stage:
+    name: str
+    deps: tuple[str, ...] = ()
+    # exactly one of run (does the work, returns the output) or plan (returns prompts + writer)
+    run: Callable[[PipelineContext, dict | None], dict] | None = None
+    plan: Callable[[PipelineContext, dict | None], PromptBatch] | None = None
+    # bump when the stage logic changes so old runs stop matching
+    version: int = 1
+    key: Callable[[PipelineContext], str] | None = None
+    queue: str = settings.CELERY_LLM_QUEUE
+    # reporting period relationships a plan stage writes, its output is their content
+    writes: tuple[str, ...] = ()
+
+@dataclass
+class Handoff:
+    """The next stage runs on another queue, force holds the forced stages not done yet."""
+    queue: str
+    force: list[str]
+
+def _hash(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def _check_result(name: str, check: dict):
+    """Raise for the {'status', 'data', 'index'} dict of an extract function that did not finish."""
+    if check.get('cancelled'):
+        raise PipelineCancelled(f'{name} cancelled at {check["index"]}', {'index': check['index']})
+    if not check['status']:
+        raise StageWaiting(
+            f'{name} stopped at {check["index"]}',
+            {'data': check.get('data'), 'index': check['index']},
+            check.get('retry_after'),
+        )
+
+# row bookkeeping, a rewrite of the same figures must hash the same
+_UNHASHED_COLUMNS = {'id', 'created_at', 'updated_at', 'reporting_period_id'}
+
+def _written_rows(ctx: PipelineContext, fields: Iterable[str]) -> dict:
+    """Digest of what the company's reporting periods hold in fields, so the dashboard only reruns on a change."""
+    rows = []
+    company = ctx.report.company
+    for period in company.reporting_period if company else []:
+        for name in fields:
+            row = getattr(period, name)
+            if row is not None:
+                rows.append((period.fiscal_year, period.period_label, name, {
+                    column: value for column, value in row.to_dict().items()
+                    if column not in _UNHASHED_COLUMNS
+                }))
+    rows.sort(key=lambda row: (row[0], row[1], row[2]))
+    return {'rows': len(rows), 'digest': _hash(rows)}
+
+def ocr_stage(ctx: PipelineContext, resume: dict | None) -> dict:
+    # only the ocr workers load paddle
+    from app.services.ocr import ocr_pdf_report
+    ctx.release()
+    pdf_bytes = file_manager.download_file(ctx.report.file_key)
+    if not pdf_bytes:
+        raise ValueError(f'Cannot retrieve file content {ctx.report.file_key}')
+    pages, page_count = ocr_pdf_report(pdf_bytes)
+    ctx.report.total_pages = page_count
+    payload = json.dumps(
+        [[section.model_dump(mode='json') for section in page] for page in pages]
+    ).encode()
+    digest = hashlib.sha1(payload).hexdigest()
+    # stored next to the pdf so the group stage can be redone without paying for
+    # ocr again, the run only keeps where it is
+    pages_key = file_manager.upload_file(payload, f'{ctx.report.id}_{digest}.json', OCR_RESULT_DIR)
+    return {'page_count': page_count, 'pages_key': pages_key, 'digest': digest}
+
+def group_stage(ctx: PipelineContext, resume: dict | None) -> dict:
+    ocr = ctx.outputs['ocr'] or {}
+    payload = file_manager.download_file(ocr['pages_key']) if ocr.get('pages_key') else None
+    if payload is None:
+        raise ValueError(f'ocr result of report {ctx.report.id} is gone, rerun with force=ocr')
+    pages = [[TextSection(**section) for section in page] for page in json.loads(payload)]
+    ids = save_text_sections(ctx.db, ctx.report, pages)
+    # new source rows mean classify has to run again even when the text is the same
+    return {
+        'sources': len(ids),
+        'digest': _hash([(s.id, s.content_hash) for s in ctx.report.report_sources]),
+    }
+
+def company_stage(ctx: PipelineContext, resume: dict | None) -> dict:
+    sources = ctx.report.report_sources
+    ctx.release()
+    company, fiscal_year = resolve_company(get_company_info(sources), ctx.db)
+    if ctx.report not in company.company_reports:
+        company.company_reports.append(ctx.report)
+    ctx.report.report_year = fiscal_year
+    ctx.db.flush()
+    return {'company_id': company.id, 'fiscal_year': fiscal_year}
+
+def classify_stage(ctx: PipelineContext, resume: dict | None) -> dict:
+    report = ctx.report
+    memo = build_section_memo(ctx.db, report.company_id, report.id)
+    sources = report.report_sources
+    # classification only touches loaded objects, it is written when the stage finishes
+    ctx.release()
+    check = classify_text_sections(
+        sources, (resume or {}).get('index') or 0, memo, cancelled=ctx.cancelled
+    )
+    _check_result('classify', check)
+    return {
+        'digest': _hash([
+            (s.id, s.statement_type, sorted(signal.value for signal in s.signals or []))
+            for s in report.report_sources
+        ]),
+    }
+
+def statements_plan(ctx: PipelineContext, resume: dict | None) -> PromptBatch:
+    report = ctx.report
+    return plan_statement_extraction(
+        report, report.company, (resume or {}).get('data'), (resume or {}).get('index') or 0,
+        report.report_year,
+    )
+
+def signals_plan(ctx: PipelineContext, resume: dict | None) -> PromptBatch:
+    report = ctx.report
+    return plan_text_extraction(
+        report, report.company, (resume or {}).get('data'), (resume or {}).get('index') or 0,
+        report.report_year,
+    )
+
+def dashboard_stage(ctx: PipelineContext, resume: dict | None) -> dict:
+    # debounced per company, several reports landing together share one rebuild
+    schedule_dashboard(ctx.report.company_id) # type: ignore
+    return {'company_id': ctx.report.company_id}
+
+STAGES: list[Stage] = [
+    Stage(
+        'ocr', run=ocr_stage, key=lambda ctx: ctx.report.file_key, queue=settings.CELERY_OCR_QUEUE,
+        version=2,
+    ),
+    Stage('group', ('ocr',), run=group_stage, queue=settings.CELERY_OCR_QUEUE),
+    Stage('company_id', ('group',), run=company_stage),
+    Stage('classify', ('group', 'company_id'), run=classify_stage),
+    Stage(
+        'statements', ('classify',), plan=statements_plan,
+        writes=('income_statement', 'balance_sheet', 'cash_flow_statement'),
+    ),
+    Stage(
+        'signals', ('classify',), plan=signals_plan,
+        writes=('business_strategy', 'growth_potential', 'risk_analysis', 'qualitative_performance'),
+    ),
+    Stage('dashboard', ('statements', 'signals'), run=dashboard_stage),
+]
+
+def request_cancel(report_id: int) -> bool:
+    redis = get_sync_redis()
+    if redis is None:
+        return False
+    redis.set(f"{PIPELINE_CANCEL_KEY}{report_id}", 1, ex=CANCEL_TTL)
+    return True
+
+def clear_cancel(report_id: int):
+    redis = get_sync_redis()
+    if redis is not None:
+        redis.delete(f"{PIPELINE_CANCEL_KEY}{report_id}")
+
+def latest_stage_runs(db: Session, report_id: int) -> list[PipelineStageRun]:
+    runs = db.execute(
+        select(PipelineStageRun)
+        .where(PipelineStageRun.report_id == report_id)
+        .order_by(PipelineStageRun.id.desc())
+    ).scalars().all()
+    latest: dict[str, PipelineStageRun] = {}
+    for run in runs:
+        latest.setdefault(run.stage, run)
+    order = [stage.name for stage in STAGES]
+    return sorted(latest.values(), key=lambda run: order.index(run.stage) if run.stage in order else len(order))
+
+class PipelineRunner:
+    def __init__(
+        self, db: Session, report: CompanyReport, force: Iterable[str] = (), queue: str | None = None
+    ):
+        self.ctx = PipelineContext(db, report)
+        # None runs every stage here, whatever its queue
+        self.queue = queue
+        self.db = db
+        self.force = set(force)
+        self.output_hashes: dict[str, str] = {}
+        self.started: dict[str, float] = {}
+
+    def _previous(self, stage: Stage, input_hash: str) -> PipelineStageRun | None:
+        return self.db.execute(
+            select(PipelineStageRun)
+            .where(
+                (PipelineStageRun.report_id == self.ctx.report.id) &
+                (PipelineStageRun.stage == stage.name) &
+                (PipelineStageRun.input_hash == input_hash)
+            )
+            .order_by(PipelineStageRun.id.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+
+    def _load_output(self, name: str):
+        if name in self.ctx.outputs:
+            return
+        run = self.db.execute(
+            select(PipelineStageRun)
+            .where(
+                (PipelineStageRun.report_id == self.ctx.report.id) &
+                (PipelineStageRun.stage == name) &
+                (PipelineStageRun.output_hash == self.output_hashes[name])
+            )
+            .order_by(PipelineStageRun.id.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+        self.ctx.outputs[name] = run.output if run else None
+
+    def _input_hash(self, stage: Stage) -> str:
+        return _hash(
+            stage.name, stage.version, [self.output_hashes[d] for d in stage.deps],
+            stage.key(self.ctx) if stage.key else None,
+        )
+
+    def _start(self, stage: Stage, input_hash: str, previous: PipelineStageRun | None):
+        """Open a run for the stage, returns it with the resume state of the previous run."""
+        resume = None
+        if previous and previous.status in (StageStatus.waiting, StageStatus.cancelled):
+            resume = previous.output
+        for dep in stage.deps:
+            self._load_output(dep)
+        run = PipelineStageRun(
+            report_id=self.ctx.report.id, stage=stage.name, input_hash=input_hash,
+            status=StageStatus.running,
+        )
+        self.db.add(run)
+        self.db.commit()
+        self.force.discard(stage.name)
+        self.started[stage.name] = time.perf_counter()
+        return run, resume
+
+    def _finish(self, stage: Stage, run: PipelineStageRun, output: dict, usage):
+        run.status = StageStatus.done
+        run.output = output
+        run.output_hash = _hash(output)
+        run.finished_at = datetime.now()
+        run.llm_usage = usage.to_dict()
+        self.output_hashes[stage.name] = run.output_hash
+        self.ctx.outputs[stage.name] = output
+        # the stage's own writes and its run row land together
+        self.db.commit()
+        logger.info(
+            f'pipeline {self.ctx.report.id}: {stage.name} done in '
+            f'{time.perf_counter() - self.started[stage.name]:.1f}s'
+        )
+
+    def _fail(self, run: PipelineStageRun, e: Exception, usage):
+        if not isinstance(e, (StageWaiting, PipelineCancelled)):
+            self.db.rollback()
+        # otherwise keep what was written before the stop, the resume state starts after it
+        if isinstance(e, PipelineCancelled):
+            run.status = StageStatus.cancelled
+        elif isinstance(e, (StageWaiting, LLMUnavailable)):
+            run.status = StageStatus.waiting
+        else:
+            run.status = StageStatus.failed
+        if isinstance(e, (StageWaiting, PipelineCancelled)):
+            run.output = e.state
+        run.error = str(e)
+        run.finished_at = datetime.now()
+        run.llm_usage = usage.to_dict()
+        self.db.commit()
+
+    def _scope(self):
+        return llm_scope(report_id=self.ctx.report.id, company_id=self.ctx.report.company_id)
+
+    def _run_stage(self, stage: Stage, run: PipelineStageRun, resume: dict | None):
+        with self._scope() as usage:
+            try:
+                output = stage.run(self.ctx, resume) # type: ignore
+            except Exception as e:
+                self._fail(run, e, usage)
+                raise
+            self._finish(stage, run, output, usage)
+
+    def _abandon(self, started: list[tuple[Stage, PipelineStageRun, dict | None]], e: Exception):
+        """Close the runs of started stages that will not run because of e."""
+        for _, run, _ in started:
+            with self._scope() as usage:
+                self._fail(run, e, usage)
+
+    def _run_batches(self, started: list[tuple[Stage, PipelineStageRun, dict | None]]):
+        plans = []
+        for i, (stage, run, resume) in enumerate(started):
+            with self._scope() as usage:
+                try:
+                    batch = stage.plan(self.ctx, resume) # type: ignore
+                    # a context copy per call, so each prompt counts towards its own stage
+                    calls = [partial(copy_context().run, self._guard, call) for call in batch.calls]
+                except Exception as e:
+                    self._fail(run, e, usage)
+                    self._abandon(started[:i] + started[i + 1:], e)
+                    raise
+            plans.append((stage, run, batch, calls, usage))
+
+        # planning did the reads, no connection is held while the prompts run
+        self.ctx.release()
+        try:
+            answers = iter(run_concurrently([call for *_, calls, _ in plans for call in calls]))
+        except Exception as e:
+            for _, run, _, _, usage in plans:
+                self._fail(run, e, usage)
+            raise
+        errors: list[Exception] = []
+        for stage, run, batch, calls, usage in plans:
+            try:
+                _check_result(stage.name, batch.apply([next(answers) for _ in calls]))
+                output = _written_rows(self.ctx, stage.writes)
+            except Exception as e:
+                self._fail(run, e, usage)
+                errors.append(e)
+                continue
+            self._finish(stage, run, output, usage)
+        if errors:
+            raise errors[0]
+
+    def _guard(self, call):
+        if self.ctx.cancelled():
+            raise PipelineCancelled(f'report {self.ctx.report.id} cancelled')
+        return call()
+
+    def run(self) -> Handoff | None:
+        start = time.perf_counter()
+        pending = list(STAGES)
+        while pending:
+            ready = [s for s in pending if all(d in self.output_hashes for d in s.deps)]
+            if not ready:
+                raise RuntimeError(f'pipeline stages {[s.name for s in pending]} have unmet dependencies')
+            if self.ctx.cancelled():
+                raise PipelineCancelled(f'report {self.ctx.report.id} cancelled')
+            batches = []
+            handoff = None
+            for stage in ready:
+                input_hash = self._input_hash(stage)
+                previous = self._previous(stage, input_hash)
+                if previous and previous.status == StageStatus.done and stage.name not in self.force:
+                    logger.info(f'pipeline {self.ctx.report.id}: {stage.name} unchanged, skipped')
+                    self.output_hashes[stage.name] = previous.output_hash # type: ignore
+                    continue
+                if self.queue and stage.queue != self.queue:
+                    handoff = stage.queue
+                    continue
+                run, resume = self._start(stage, input_hash, previous)
+                if stage.plan:
+                    batches.append((stage, run, resume))
+                else:
+                    try:
+                        self._run_stage(stage, run, resume)
+                    except Exception as e:
+                        self._abandon(batches, e)
+                        raise
+            if batches:
+                self._run_batches(batches)
+            if handoff:
+                logger.info(
+                    f'pipeline {self.ctx.report.id}: handing over to {handoff} after '
+                    f'{time.perf_counter() - start:.1f}s'
+                )
+                return Handoff(handoff, sorted(self.force))
+            pending = [s for s in pending if s.name not in self.output_hashes]
+        logger.info(f'pipeline {self.ctx.report.id} finished in {time.perf_counter() - start:.1f}s')
+        return None
+
+def run_pipeline(
+    db: Session, report_id: int, force: Iterable[str] = (), queue: str | None = None
+) -> Handoff | None:
+    """
+    Run every stage of the report that is not up to date and belongs to
+    queue. Returns where to continue when a later stage needs the other
+    queue. Raises LLMUnavailable/StageWaiting when a stage has to be resumed
+    later and PipelineCancelled when the report was cancelled.
+    """
+    report = db.execute(
+        select(CompanyReport)
+        .where(CompanyReport.id == report_id)
+        .options(selectinload(CompanyReport.company, Company.reporting_period))
+    ).scalar_one_or_none()
+    if not report:
+        raise ValueError(f'Cannot retrieve company report {report_id}')
+    return PipelineRunner(db, report, force, queue).run()
@@ -0,0 +1,128 @@
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Sequence
+from app.schemas.shared_identifier import DataListBase, IdentifierBase
+
+@dataclass
+class PromptChunk:
+    text: str = ''
+    tokens: int = 0
+    source_ids: list[int] = field(default_factory=list)
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _split_body(body: str, max_chars: int) -> list[str]:
+    """Split on line breaks first, hard cut only a single line longer than max_chars."""
+    pieces: list[str] = []
+    buffer: list[str] = []
+    size = 0
+    for line in body.split('\n'):
+        while len(line) > max_chars:
+            if buffer:
+                pieces.append('\n'.join(buffer))
+                buffer, size = [], 0
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if size + len(line) > max_chars and buffer:
+            pieces.append('\n'.join(buffer))
+            buffer, size = [], 0
+        buffer.append(line)
+        size += len(line) + 1
+    if buffer:
+        pieces.append('\n'.join(buffer))
+    return pieces
+
+def plan_chunks(
+    sections: Iterable[Sequence],
+    render: Callable[[str, str], str],
+    token_budget: int,
+    estimate: Callable[[str], int] = estimate_tokens,
+) -> list[PromptChunk]:
+    """
+    Pack (title, body, source_id) sections into prompts of at most `token_budget`
+    tokens, keeping document order. Chunks are balanced to roughly equal size so
+    the slowest chunk is as small as possible when they run concurrently.
+    A section that alone exceeds the budget is split into parts.
+    """
+    rendered: list[tuple[str, int, int]] = []
+    for title, body, source_id in sections:
+        text = render(title, body)
+        tokens = estimate(text)
+        if tokens <= token_budget:
+            rendered.append((text, tokens, source_id))
+            continue
+        max_chars = max(1, len(body) * token_budget // (tokens * 2))
+        parts = _split_body(body, max_chars)
+        for i, part in enumerate(parts, start=1):
+            text = render(f'{title} (part {i}/{len(parts)})', part)
+            rendered.append((text, estimate(text), source_id))
+
+    total = sum(tokens for _, tokens, _ in rendered)
+    if not rendered:
+        return []
+    target = total / math.ceil(total / token_budget)
+
+    chunks: list[PromptChunk] = []
+    texts: list[str] = []
+    current = PromptChunk()
+    for text, tokens, source_id in rendered:
+        if texts and (
+            current.tokens + tokens > token_budget or current.tokens >= target
+        ):
+            current.text = ''.join(texts)
+            chunks.append(current)
+            texts, current = [], PromptChunk()
+        texts.append(text)
+        current.tokens += tokens
+        if source_id not in current.source_ids:
+            current.source_ids.append(source_id)
+    current.text = ''.join(texts)
+    chunks.append(current)
+    return chunks
+
+def _merge_item(base: IdentifierBase, other: IdentifierBase) -> IdentifierBase:
+    """Fill gaps in base from other, list of strings are unioned without duplicates."""
+    update = {}
+    for name in type(base).model_fields:
+        mine, theirs = getattr(base, name), getattr(other, name)
+        if isinstance(mine, list) and isinstance(theirs, list):
+            seen = {str(v).strip().lower() for v in mine}
+            merged = list(mine)
+            for v in theirs:
+                key = str(v).strip().lower()
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(v)
+            update[name] = merged
+        elif mine in (None, '') and theirs not in (None, ''):
+            update[name] = theirs
+    return base.model_copy(update=update)
+
+def merge_chunk_results(
+    results: Sequence[tuple[DataListBase, Sequence[int]]],
+    response_schema: type[DataListBase],
+    default_year: int,
+) -> tuple[DataListBase, list[list[int]]]:
+    """
+    Reduce per-chunk responses into one, one item per reporting period.
+    The period key matches save_ai_response_schema (year, else default_year);
+    the most confident item wins and the others only fill its gaps.
+    Returns the merged response and the source ids backing each item.
+    """
+    grouped: dict[int, list[tuple[IdentifierBase, Sequence[int]]]] = {}
+    for response, source_ids in results:
+        for item in response.data:
+            grouped.setdefault(item.year or default_year, []).append((item, source_ids))
+
+    items = []
+    item_sources = []
+    for candidates in grouped.values():
+        candidates.sort(key=lambda c: c[0].confidence or 0.0, reverse=True)
+        merged, sources = candidates[0][0], list(candidates[0][1])
+        for item, source_ids in candidates[1:]:
+            merged = _merge_item(merged, item)
+            sources.extend(id_ for id_ in source_ids if id_ not in sources)
+        items.append(merged)
+        item_sources.append(sources)
+    return response_schema(data=items), item_sources
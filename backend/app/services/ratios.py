@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, Sequence
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import get_redis
+from app.models.report import ReportingPeriod
+from app.models.statements import IncomeStatement, BalanceSheet, CashFlowStatement
+from app.schemas.bot_query import Metric
+from app.schemas.ratios import CompanyRatios, PeriodRatios
+from app.services.dashboard_cache import DASHBOARD_VERSION_KEY
+
+# the periods version is bumped by every commit touching the company's statements
+RATIOS_CACHE_KEY = "ratios:"
+RATIOS_CACHE_TTL = 24 * 3600
+
+STATEMENT_COLUMNS = {
+    IncomeStatement: (
+        "revenue", "cost", "gross_profit", "operating_income", "finance_costs", "net_income",
+    ),
+    BalanceSheet: (
+        "current_assets", "total_assets", "current_liabilities", "total_liabilities", "equity",
+    ),
+    CashFlowStatement: ("operating_cash_flow", "investing_cash_flow"),
+}
+
+# yoy of these is the relative change, of the ratios the change in points
+AMOUNT_METRICS = {
+    Metric.revenue, Metric.gross_profit, Metric.operating_income, Metric.net_income,
+    Metric.operating_cash_flow, Metric.free_cash_flow,
+}
+
+# metrics that are not the textbook definition, shown with the ratios and in chat answers
+METRIC_NOTES = {
+    Metric.quick_ratio: "not available, the balance sheet is stored without inventories",
+    Metric.free_cash_flow: (
+        "operating cash flow plus investing cash flow, capex is not stored on its own so "
+        "acquisitions, disposals and other investing flows count as capex"
+    ),
+}
+
+def statement_query(company_ids: Iterable[int]):
+    """One row per reporting period with the statement columns the ratios need."""
+    columns = [ReportingPeriod.company_id, ReportingPeriod.fiscal_year, ReportingPeriod.updated_at]
+    stmt = select(*columns)
+    for model, names in STATEMENT_COLUMNS.items():
+        columns = [getattr(model, name) for name in names]
+        stmt = stmt.add_columns(*columns).outerjoin(model, model.reporting_period_id == ReportingPeriod.id)
+    return stmt.where(ReportingPeriod.company_id.in_(list(company_ids)))
+
+def statement_frame(rows: Sequence) -> pd.DataFrame:
+    """Rows of statement_query as floats indexed by (company_id, fiscal_year), the newest period per year wins."""
+    names = [name for names in STATEMENT_COLUMNS.values() for name in names]
+    frame = pd.DataFrame.from_records(
+        rows, columns=["company_id", "fiscal_year", "updated_at", *names]
+    )
+    frame = (
+        frame.sort_values(["company_id", "fiscal_year", "updated_at"])
+        .drop_duplicates(["company_id", "fiscal_year"], keep="last")
+        .drop(columns="updated_at")
+        .set_index(["company_id", "fiscal_year"])
+    )
+    return frame.astype("float64")
+
+def _div(a: pd.Series, b: pd.Series) -> pd.Series:
+    return a / b.where(b != 0)
+
+def _previous(frame: pd.DataFrame) -> pd.DataFrame:
+    """The row of the year before, NaN where that year is missing."""
+    previous = frame.groupby(level="company_id").shift(1)
+    years = pd.Series(frame.index.get_level_values("fiscal_year"), index=frame.index)
+    previous.loc[(years - years.groupby(level="company_id").shift(1)) != 1] = np.nan
+    return previous
+
+def _average(frame: pd.DataFrame, previous: pd.DataFrame, column: str) -> pd.Series:
+    # opening and closing balance, the closing one alone for the first year
+    return ((frame[column] + previous[column]) / 2).fillna(frame[column])
+
+def compute_ratios(frame: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Every Metric for every (company, year) row of a statement_frame, and
+    their change against the previous year. Missing inputs give NaN.
+    Expenses may be stored signed or absolute, they are used as absolutes.
+    See METRIC_NOTES for the metrics that are approximated or never computed.
+    """
+    frame = frame.sort_index()
+    previous = _previous(frame)
+    revenue = frame["revenue"]
+    gross_profit = frame["gross_profit"].fillna(revenue - frame["cost"].abs())
+    res = pd.DataFrame(index=frame.index)
+    res[Metric.revenue.value] = revenue
+    res[Metric.gross_profit.value] = gross_profit
+    res[Metric.operating_income.value] = frame["operating_income"]
+    res[Metric.net_income.value] = frame["net_income"]
+    res[Metric.operating_cash_flow.value] = frame["operating_cash_flow"]
+    # capex is not stored, investing cash flow stands in for it
+    res[Metric.free_cash_flow.value] = frame["operating_cash_flow"] + frame["investing_cash_flow"]
+    res[Metric.gross_margin.value] = _div(gross_profit, revenue)
+    res[Metric.operating_margin.value] = _div(frame["operating_income"], revenue)
+    res[Metric.net_margin.value] = _div(frame["net_income"], revenue)
+    res[Metric.current_ratio.value] = _div(frame["current_assets"], frame["current_liabilities"])
+    # needs inventories, which the balance sheet does not keep
+    res[Metric.quick_ratio.value] = np.nan
+    res[Metric.debt_to_equity.value] = _div(frame["total_liabilities"], frame["equity"])
+    res[Metric.interest_coverage.value] = _div(frame["operating_income"], frame["finance_costs"].abs())
+    res[Metric.roe.value] = _div(frame["net_income"], _average(frame, previous, "equity"))
+    res[Metric.roa.value] = _div(frame["net_income"], _average(frame, previous, "total_assets"))
+
+    before = _previous(res)
+    yoy = res - before
+    amounts = [metric.value for metric in AMOUNT_METRICS]
+    yoy[amounts] = _div(yoy[amounts], before[amounts].abs())
+    return res, yoy
+
+def _clean(row: pd.Series) -> dict[str, float | None]:
+    return {key: (None if pd.isna(value) else round(float(value), 6)) for key, value in row.items()}
+
+def ratios_by_company(frame: pd.DataFrame) -> dict[int, list[PeriodRatios]]:
+    values, yoy = compute_ratios(frame)
+    res: dict[int, list[PeriodRatios]] = {}
+    for (company_id, year), row in values.iterrows():
+        res.setdefault(int(company_id), []).append(PeriodRatios(
+            fiscal_year=int(year), values=_clean(row), yoy=_clean(yoy.loc[(company_id, year)])
+        ))
+    return res
+
+async def load_ratios(db: AsyncSession, company_ids: Iterable[int]) -> dict[int, list[PeriodRatios]]:
+    rows = (await db.execute(statement_query(company_ids))).all()
+    return ratios_by_company(statement_frame(rows))
+
+async def company_ratios_json(db: AsyncSession, company_id: int) -> str:
+    """CompanyRatios json of one company, cached until its periods change."""
+    redis = await get_redis()
+    version = 0
+    if redis is not None:
+        version = int(await redis.get(f"{DASHBOARD_VERSION_KEY}{company_id}") or 0)
+        cached = await redis.get(f"{RATIOS_CACHE_KEY}{company_id}:{version}")
+        if cached:
+            return cached
+    periods = (await load_ratios(db, [company_id])).get(company_id, [])
+    body = CompanyRatios(
+        company_id=company_id, version=version, periods=periods,
+        notes={metric.value: note for metric, note in METRIC_NOTES.items()},
+    ).model_dump_json()
+    if redis is not None:
+        await redis.set(f"{RATIOS_CACHE_KEY}{company_id}:{version}", body, ex=RATIOS_CACHE_TTL)
+    return body
+
+async def company_ratios(db: AsyncSession, company_id: int) -> CompanyRatios:
+    return CompanyRatios.model_validate_json(await company_ratios_json(db, company_id))
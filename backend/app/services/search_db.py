@@ -1,6 +1,9 @@
+import time
+import asyncio
 from rapidfuzz import process, fuzz
 from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.report import Company
 
 
@@ -75,3 +78,55 @@ def find_closest_companies(
     likely_matches.sort(key=lambda x: x["confidence"], reverse=True)
 
     return likely_matches[:max_results]
+
+class CompanyNameIndex:
+    """
+    Normalized company names kept in memory and matched in one rapidfuzz
+    call, reloaded after ttl seconds, or after miss_reload seconds when a
+    lookup finds nothing.
+    """
+    def __init__(self, ttl: float = 300.0, miss_reload: float = 30.0):
+        self.ttl = ttl
+        self.miss_reload = miss_reload
+        self.loaded_at: float | None = None
+        self.ids: list[int] = []
+        self.names: list[str] = []
+        self.choices: list[str] = []
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        async with self._lock:
+            if not force and self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+                return
+            rows = (await db.execute(
+                select(Company.id, Company.company_name).where(Company.company_name.is_not(None))
+            )).all()
+            self.ids = [row.id for row in rows]
+            self.names = [row.company_name for row in rows]
+            self.choices = [normalize(name) for name in self.names]
+            self.loaded_at = time.monotonic()
+
+    def match(self, user_input: str, min_confidence: float, max_results: int) -> list[dict]:
+        matches = process.extract(
+            normalize(user_input), self.choices, scorer=fuzz.WRatio,
+            limit=max_results, score_cutoff=min_confidence * 100
+        )
+        return [
+            {"id": self.ids[i], "company_name": self.names[i], "confidence": score / 100.0}
+            for _, score, i in matches
+        ]
+
+    async def search(
+        self, db: AsyncSession, user_input: str,
+        min_confidence: float = 0.75, max_results: int = 5,
+    ) -> list[dict]:
+        """Same result shape as find_closest_companies."""
+        await self.refresh(db)
+        matches = self.match(user_input, min_confidence, max_results)
+        if not matches and self.loaded_at is not None and time.monotonic() - self.loaded_at > self.miss_reload:
+            # the company may have been added since the last load
+            await self.refresh(db, force=True)
+            matches = self.match(user_input, min_confidence, max_results)
+        return matches
+
+company_index = CompanyNameIndex()
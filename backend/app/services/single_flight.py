@@ -0,0 +1,121 @@
+import time
+import threading
+from uuid import uuid4
+from typing import Any, Callable
+from redis.exceptions import RedisError
+
+from app.core.logging import logger
+from app.core.redis import get_sync_redis
+
+LOCK_KEY = "llm:sf:lock:"
+RESULT_KEY = "llm:sf:result:"
+
+# delete the lock only if we still own it, a slow leader must not drop a newer one
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    Inside a process the first caller runs `compute` and the rest block on it.
+    Across processes the leader holds a redis lock and publishes the serialized
+    result under a result key that followers poll, so only one process
+    reaches upstream. Without redis it degrades to process-local coalescing.
+    The result only lives a few poll intervals, long enough for every waiting
+    follower to read it; it is not a response cache.
+    """
+
+    def __init__(self, lock_ttl: int = 300, poll_interval: float = 0.25):
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        # followers see the result on their next poll, leave room for a slow one
+        self.result_ttl_ms = max(1000, int(poll_interval * 4 * 1000))
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+
+    def do(
+        self, key: str, compute: Callable[[], Any],
+        dumps: Callable[[Any], str], loads: Callable[[str], Any],
+    ) -> tuple[Any, bool]:
+        """Returns (result, shared) where shared is True if another caller did the work."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error:
+                raise flight.error
+            return flight.result, True
+
+        shared = False
+        try:
+            flight.result, shared = self._do_remote(key, compute, dumps, loads)
+            return flight.result, shared
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _do_remote(self, key, compute, dumps, loads) -> tuple[Any, bool]:
+        r = get_sync_redis()
+        if r is None:
+            return compute(), False
+        lock_key, result_key = LOCK_KEY + key, RESULT_KEY + key
+        token = uuid4().hex
+        try:
+            cached = r.get(result_key)
+            if cached is not None:
+                return loads(cached), True
+            acquired = r.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except RedisError as e:
+            logger.debug(f"single flight redis unavailable, computing locally: {e}")
+            return compute(), False
+
+        if acquired:
+            try:
+                result = compute()
+                if result is not None:
+                    try:
+                        r.set(result_key, dumps(result), px=self.result_ttl_ms)
+                    except RedisError as e:
+                        logger.debug(f"single flight failed to publish {key}: {e}")
+                return result, False
+            finally:
+                try:
+                    r.eval(_RELEASE_LOCK, 1, lock_key, token)
+                except RedisError:
+                    pass
+
+        # another process is already asking the same thing, wait for its answer
+        deadline = time.time() + self.lock_ttl
+        try:
+            while time.time() < deadline:
+                time.sleep(self.poll_interval)
+                cached = r.get(result_key)
+                if cached is not None:
+                    return loads(cached), True
+                if not r.exists(lock_key):
+                    # leader finished without a result (failed), try ourselves
+                    break
+        except RedisError as e:
+            logger.debug(f"single flight lost redis while waiting on {key}: {e}")
+        return compute(), False
@@ -0,0 +1,330 @@
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pydantic import ValidationError
+
+from app.core.logging import logger
+from app.models.source import PossibleStatement
+from app.schemas.shared_identifier import DataListBase, IdentifierBase
+from app.schemas.statements import (
+    IncomeStatement, IncomeStatements, BalanceSheet, BalanceSheets,
+    CashFlowStatement, CashFlowStatments,
+)
+
+# field -> label patterns (fullmatch on the normalized label), earlier patterns win
+INCOME_SYNONYMS = {
+    "revenue": (r"revenue", r"total revenue", r"turnover", r"sales", r"hasil"),
+    "cost": (r"cost of sales", r"cost of revenue", r"cost of goods sold", r"direct costs?"),
+    "gross_profit": (r"gross profit",),
+    "operating_expenses": (
+        r"(total )?operating expenses", r"other operating expenses",
+    ),
+    "operating_income": (
+        r"operating profit", r"operating income", r"profit from operations",
+        r"results from operating activities",
+    ),
+    "finance_costs": (r"finance costs?", r"interest expenses?"),
+    "profit_before_tax": (r"profit before tax", r"profit before income tax"),
+    "tax": (r"(income )?tax expense", r"tax", r"income tax"),
+    "net_income": (
+        r"(net )?profit for the (financial )?(year|period)", r"net profit", r"profit after tax",
+    ),
+    "eps": (
+        r"basic (earnings )?(profit )?per (ordinary )?share( sen)?",
+        r"(earnings )?(profit )?per (ordinary )?share( sen)?( basic)?", r"basic( sen)?",
+    ),
+}
+
+BALANCE_SYNONYMS = {
+    "current_assets": (r"total current assets", r"current assets"),
+    "non_current_assets": (r"total non current assets", r"non current assets"),
+    "total_assets": (r"total assets",),
+    "current_liabilities": (r"total current liabilities", r"current liabilities"),
+    "non_current_liabilities": (r"total non current liabilities", r"non current liabilities"),
+    "total_liabilities": (r"total liabilities",),
+    "equity": (
+        r"total equity", r"equity",
+        r"(total )?equity attributable to (the )?(owners|equity holders|shareholders) of the (company|parent)",
+    ),
+}
+
+CASH_SYNONYMS = {
+    "operating_cash_flow": (r"net cash( flows?)? .*operating activities",),
+    "investing_cash_flow": (r"net cash( flows?)? .*investing activities",),
+    "financing_cash_flow": (r"net cash( flows?)? .*financing activities",),
+    "net_change_in_cash": (
+        r"net (increase|decrease|change)( (increase|decrease))? in cash( and cash equivalents)?",
+    ),
+    "beginning_cash": (
+        r"cash and cash equivalents at (the )?(beginning|start) of (the )?(financial )?(year|period)",
+    ),
+    "ending_cash": (r"cash and cash equivalents at (the )?end of (the )?(financial )?(year|period)",),
+    # not a schema field, only needed to check beginning + change = ending
+    "_fx": (r"effects? of (foreign )?exchange rate (changes|fluctuations?|differences?).*",),
+}
+
+# printed either way, stored as positive amounts like the llm prompt asks for
+EXPENSE_FIELDS = {"cost", "operating_expenses", "finance_costs", "tax"}
+# per share figures are printed in sen and are never in RM'000
+UNSCALED_FIELDS = {"eps"}
+
+@dataclass
+class StatementSpec:
+    item: type[IdentifierBase]
+    data_list: type[DataListBase]
+    synonyms: dict[str, tuple[str, ...]]
+
+SPECS = {
+    PossibleStatement.income_statement: StatementSpec(IncomeStatement, IncomeStatements, INCOME_SYNONYMS),
+    PossibleStatement.balance_sheet: StatementSpec(BalanceSheet, BalanceSheets, BALANCE_SYNONYMS),
+    PossibleStatement.cash_flow_statement: StatementSpec(CashFlowStatement, CashFlowStatments, CASH_SYNONYMS),
+}
+
+_COMPILED = {
+    type_: {name: [re.compile(p) for p in patterns] for name, patterns in spec.synonyms.items()}
+    for type_, spec in SPECS.items()
+}
+
+class _TableGrid(HTMLParser):
+    """Rows of cell text, colspan/rowspan cells repeated into every slot they cover."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows: list[list[str]] = []
+        self._row: list[str] | None = None
+        self._cell: list[str] | None = None
+        self._span = (1, 1)
+        # column -> (rows left, text) of rowspans coming from rows above
+        self._pending: dict[int, tuple[int, str]] = {}
+
+    def _fill_pending(self):
+        assert self._row is not None
+        while len(self._row) in self._pending:
+            col = len(self._row)
+            left, text = self._pending.pop(col)
+            self._row.append(text)
+            if left > 1:
+                self._pending[col] = (left - 1, text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._pending = {}
+        elif tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            attrs = dict(attrs)
+            self._cell = []
+            self._span = (_int_attr(attrs.get("rowspan")), _int_attr(attrs.get("colspan")))
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._row is not None and self._cell is not None:
+            self._fill_pending()
+            text = " ".join("".join(self._cell).split())
+            rowspan, colspan = self._span
+            for _ in range(colspan):
+                if rowspan > 1:
+                    self._pending[len(self._row)] = (rowspan - 1, text)
+                self._row.append(text)
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self._fill_pending()
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+def _int_attr(value: str | None) -> int:
+    try:
+        return max(1, int(value or 1))
+    except ValueError:
+        return 1
+
+def parse_table_grid(html: str) -> list[list[str]]:
+    parser = _TableGrid()
+    parser.feed(html)
+    parser.close()
+    return parser.rows
+
+_DASHES = {"-", "–", "—", "nil", "n/a"}
+_AMOUNT = re.compile(r"\(?-?\d[\d,]*(?:\.\d+)?\)?")
+
+def parse_number(cell: str) -> float | None:
+    """'(1,234)' -> -1234.0, '-' -> 0.0, anything that is not an amount -> None."""
+    text = cell.replace("\xa0", " ").replace(" ", "").rstrip("*").lower()
+    if text.startswith("rm"):
+        text = text[2:]
+    if text in _DASHES:
+        return 0.0
+    if not _AMOUNT.fullmatch(text):
+        return None
+    negative = text.startswith("(") and text.endswith(")") or text.startswith("-")
+    value = float(text.strip("()-").replace(",", ""))
+    return -value if negative else value
+
+def detect_scale(text: str) -> float:
+    text = text.lower().replace("’", "'").replace("‘", "'")
+    if re.search(r"rm\s*'?\s*000|'000", text):
+        return 1_000.0
+    if re.search(r"rm\s*'?\s*(mil|million|m)\b", text):
+        return 1_000_000.0
+    return 1.0
+
+def normalize_label(label: str) -> str:
+    text = label.lower().replace("’", "'")
+    text = re.sub(r"\(?\bnote\s*\d+\w*\)?", " ", text)
+    text = re.sub(r"[^a-z ]+", " ", text)
+    # 'profit/(loss)', '(loss)/profit' and 'loss' all read as profit, the sign is in the amount
+    text = re.sub(r"\b(?:profit|loss)(?: (?:profit|loss))*\b", "profit", text)
+    text = re.sub(r"\btaxation\b", "tax", text)
+    text = re.sub(r"\bnon current\b|\bnoncurrent\b", "non current", text)
+    return " ".join(text.split())
+
+_YEAR = re.compile(r"\b((?:19|20)\d\d)\b")
+
+def _label(row: list[str]) -> str:
+    for cell in row:
+        if cell and parse_number(cell) is None:
+            return cell
+    return ""
+
+def _year_columns(grid: list[list[str]], expected_year: int | None) -> dict[int, int]:
+    """column -> fiscal year. The first column of each year wins (group before company)."""
+    columns: dict[int, int] = {}
+    seen: set[int] = set()
+    for row in grid[:6]:
+        for col, cell in enumerate(row):
+            if col == 0 or len(cell) > 24:
+                continue
+            match = _YEAR.search(cell)
+            # '2023', '2023 RM'000' or '2022 (Restated)', not an amount that happens to look like a year
+            if match and (cell == match.group(1) or parse_number(cell) is None):
+                year = int(match.group(1))
+                if year not in seen and col not in columns:
+                    columns[col] = year
+                    seen.add(year)
+        if columns:
+            return columns
+    if expected_year is None:
+        return {}
+    # no year header, assume current then comparative in the first two amount columns
+    notes = {
+        col for row in grid[:6] for col, cell in enumerate(row)
+        if normalize_label(cell) in ("note", "notes", "nota")
+    }
+    counts: dict[int, int] = {}
+    for row in grid:
+        for col, cell in enumerate(row):
+            if col and col not in notes and cell and parse_number(cell) is not None:
+                counts[col] = counts.get(col, 0) + 1
+    amount_cols = sorted(col for col, n in counts.items() if n * 2 >= max(counts.values()))
+    return {col: expected_year - i for i, col in enumerate(amount_cols[:2])}
+
+def _close(a: float, b: float, unit: float) -> bool:
+    return abs(a - b) <= max(0.01 * max(abs(a), abs(b)), unit)
+
+def _derive_and_check(type_: PossibleStatement, values: dict[str, float], unit: float) -> tuple[list[str], int]:
+    """Fill totals that can be derived and check the accounting identities. Returns (failed checks, checks run)."""
+    v = values
+    checks: list[tuple[str, float, float]] = []
+    if type_ == PossibleStatement.income_statement:
+        if "gross_profit" not in v and {"revenue", "cost"} <= v.keys():
+            v["gross_profit"] = v["revenue"] - v["cost"]
+        elif {"revenue", "cost", "gross_profit"} <= v.keys():
+            checks.append(("revenue - cost = gross profit", v["revenue"] - v["cost"], v["gross_profit"]))
+        if {"profit_before_tax", "tax", "net_income"} <= v.keys():
+            # tax may be a credit, accept either sign
+            expected = v["profit_before_tax"] - v["tax"]
+            if not _close(expected, v["net_income"], unit):
+                expected = v["profit_before_tax"] + v["tax"]
+            checks.append(("profit before tax - tax = net income", expected, v["net_income"]))
+    elif type_ == PossibleStatement.balance_sheet:
+        for total, parts in (
+            ("total_assets", ("current_assets", "non_current_assets")),
+            ("total_liabilities", ("current_liabilities", "non_current_liabilities")),
+        ):
+            if set(parts) <= v.keys():
+                if total in v:
+                    checks.append((f"{' + '.join(parts)} = {total}", v[parts[0]] + v[parts[1]], v[total]))
+                else:
+                    v[total] = v[parts[0]] + v[parts[1]]
+        if {"total_assets", "total_liabilities", "equity"} <= v.keys():
+            checks.append(("assets = liabilities + equity", v["total_assets"], v["total_liabilities"] + v["equity"]))
+    elif type_ == PossibleStatement.cash_flow_statement:
+        flows = ("operating_cash_flow", "investing_cash_flow", "financing_cash_flow")
+        if set(flows) <= v.keys() and "net_change_in_cash" in v:
+            checks.append(("operating + investing + financing = net change", sum(v[f] for f in flows), v["net_change_in_cash"]))
+        if {"beginning_cash", "net_change_in_cash", "ending_cash"} <= v.keys():
+            checks.append((
+                "beginning + net change = ending",
+                v["beginning_cash"] + v["net_change_in_cash"] + v.get("_fx", 0.0), v["ending_cash"],
+            ))
+    failed = [name for name, a, b in checks if not _close(a, b, unit)]
+    return failed, len(checks)
+
+@dataclass
+class StatementParse:
+    data: DataListBase
+    confidence: float
+    issues: list[str] = field(default_factory=list)
+
+def parse_statement(
+    type_: PossibleStatement, title: str, tables: str, expected_year: int | None = None
+) -> StatementParse | None:
+    """
+    Read a statement straight from the PP-Structure html. Confidence is the
+    share of accounting identities that hold, 0 for a year missing a field the
+    schema requires; the caller sends anything below its threshold to the llm.
+    """
+    spec = SPECS.get(type_)
+    grid = parse_table_grid(tables)
+    if spec is None or not grid:
+        return None
+    columns = _year_columns(grid, expected_year)
+    if not columns:
+        return None
+    scale = detect_scale(f"{title}\n{tables}")
+    patterns = _COMPILED[type_]
+
+    # field -> (pattern rank, row) of the best label match
+    rows: dict[str, tuple[int, list[str]]] = {}
+    for row in grid:
+        label = normalize_label(_label(row))
+        if not label:
+            continue
+        for name, compiled in patterns.items():
+            rank = next((i for i, p in enumerate(compiled) if p.fullmatch(label)), None)
+            if rank is not None and (name not in rows or rank < rows[name][0]):
+                rows[name] = (rank, row)
+
+    fields = [name for name in spec.synonyms if not name.startswith("_")]
+    items, issues, confidences = [], [], []
+    for col, year in sorted(columns.items(), key=lambda c: -c[1]):
+        values: dict[str, float] = {}
+        for name, (_, row) in rows.items():
+            amount = parse_number(row[col]) if col < len(row) else None
+            if amount is None:
+                continue
+            if name in EXPENSE_FIELDS:
+                amount = abs(amount)
+            values[name] = amount if name in UNSCALED_FIELDS else amount * scale
+        failed, checked = _derive_and_check(type_, values, scale)
+        # nothing cross checked the numbers, do not trust them as much
+        confidence = 1 - len(failed) / checked if checked else 0.7
+        issues += [f"{year}: {name} does not hold" for name in failed]
+        missing = [name for name in fields if name not in values]
+        if missing:
+            issues.append(f"{year}: missing {', '.join(missing)}")
+        try:
+            items.append(spec.item.model_validate({
+                "period_label": f"FY {year}", "year": year, "period_type": "annual",
+                "confidence": round(confidence, 2), "remarks": "parsed from the statement table",
+                **{name: values[name] for name in fields if name in values},
+            }))
+        except ValidationError as e:
+            # the schema requires every field, a partial statement is left to the llm
+            logger.debug(f"{type_.value} {year} parse does not validate: {e}")
+            confidence = 0.0
+        confidences.append(confidence)
+    return StatementParse(spec.data_list(data=items), min(confidences), issues)
@@ -1,7 +1,7 @@
 import json
 from copy import deepcopy
 from datetime import datetime
-from functools import lru_cache
+from functools import lru_cache, partial
 from string import Template
 from app.core.database import from_dict
 from app.core.logging import logger
@@ -15,7 +15,11 @@ from app.schemas.analysis import (
     BusinessStrategyData, RiskAnalysisData,
     QualitativePerformanceData, GrowthPotentialData
 )
-from app.services.ai_prompt import get_gemini_client
+from app.core.config import settings
+from app.services.ai_prompt import get_gemini_client, PromptBatch
+from app.services.circuit_breaker import LLMUnavailable
+from app.services.language import is_translation
+from app.services.prompt_chunking import plan_chunks, merge_chunk_results
 from app.services.organize_section import (
     save_ai_response_schema, flexible_iterator,
     adjust_json_enum_key_2_str, adjust_raw_json_with_enum
@@ -117,6 +121,9 @@ BODY
 $body
 """)
 
+def render_section(title: str, body: str) -> str:
+    return template_user.substitute(title=title, body=body)
+
 @lru_cache
 def __cache_mapping():
     return {
@@ -129,7 +136,7 @@ def __cache_mapping():
 def prepare_text_analysis(sources: list[Source]):
     data_group : dict[PossibleSignal, list[tuple[str, str, int]]] = {}
     for data in sources:
-        if not data.body:
+        if not data.body or is_translation(data):
             continue
         for signal in data.signals:
             check = data_group.get(signal)
@@ -141,11 +148,11 @@ def prepare_text_analysis(sources: list[Source]):
                 check.append((data.title or '', data.tables or '', data.id))
     return data_group
 
-def extract_text_from_sources(
+def plan_text_extraction(
         report: CompanyReport, company: Company,
         data_group: dict[str, list[tuple[str, str, int]]] | None = None,
-        start_index: int = 0, expected_year: int | None = None 
-):
+        start_index: int = 0, expected_year: int | None = None
+) -> PromptBatch:
     mapping = __cache_mapping()
     if not data_group:
         data = prepare_text_analysis(report.report_sources)
@@ -154,6 +161,7 @@ def extract_text_from_sources(
     if not expected_year: expected_year = int(datetime.now().year)
     logger.info(f'checking data fields {data.keys()}')
     client = get_gemini_client()
+    jobs = []
     for idx, type_, (sys_prompt, prompt_schema, db_model) in flexible_iterator(mapping, start_index):
         try:
             buffer = data[type_]
@@ -162,21 +170,45 @@ def extract_text_from_sources(
                 f'{report.celery_task_id}, {report.file_key}: {type_} not found'
             )
             continue
-        logger.info(f'checking prompt with {type_}')
-        usr_prompt = ''
-        source_ids = []
-        for title, body, source_id in buffer:
-            usr_prompt += template_user.substitute(title=title, body=body)
-            source_ids.append(source_id)
-        response = client.single_prompt_answer(
-            sys_prompt=sys_prompt, usr_prompt=usr_prompt,
-            response_schema=prompt_schema
+        chunks = plan_chunks(
+            buffer, render_section, settings.LLM_CHUNK_TOKEN_BUDGET
         )
-        if not response:
-            return {'status': False, 'data': adjust_json_enum_key_2_str(data), 'index': idx}
-        save_ai_response_schema(
-            company, response, db_model, type_.value, # type: ignore
-            report.uploaded_at, default_year=expected_year,
-            sources_id=source_ids
-        )
-    return {'status': True, 'data': None, 'index': None}
\ No newline at end of file
+        logger.info(f'checking prompt with {type_} in {len(chunks)} chunk(s)')
+        calls = [
+            partial(
+                client.single_prompt_answer,
+                sys_prompt=sys_prompt, usr_prompt=chunk.text,
+                response_schema=prompt_schema,
+                prompt_type=f'signal.{type_.value}', cacheable=True
+            )
+            for chunk in chunks
+        ]
+        jobs.append((idx, type_, prompt_schema, db_model, chunks, calls))
+    # every chunk of every signal is an independent prompt,
+    # only the db writes in apply need to stay in order
+    def apply(answers: list):
+        responses = iter(answers)
+        for idx, type_, prompt_schema, db_model, chunks, calls in jobs:
+            results = [(next(responses), chunk.source_ids) for chunk in chunks]
+            unavailable = [r for r, _ in results if isinstance(r, LLMUnavailable)]
+            if unavailable or not all(response for response, _ in results):
+                # later signals are dropped even if they succeeded, resume redoes them from idx
+                return {
+                    'status': False, 'data': adjust_json_enum_key_2_str(data), 'index': idx,
+                    'retry_after': max((e.retry_after for e in unavailable), default=None)
+                }
+            response, item_sources = merge_chunk_results(results, prompt_schema, expected_year)
+            save_ai_response_schema(
+                company, response, db_model, type_.value, # type: ignore
+                report.uploaded_at, default_year=expected_year,
+                item_sources_id=item_sources
+            )
+        return {'status': True, 'data': None, 'index': None}
+    return PromptBatch([call for *_, calls in jobs for call in calls], apply)
+
+def extract_text_from_sources(
+        report: CompanyReport, company: Company,
+        data_group: dict[str, list[tuple[str, str, int]]] | None = None,
+        start_index: int = 0, expected_year: int | None = None 
+):
+    return plan_text_extraction(report, company, data_group, start_index, expected_year).run()
\ No newline at end of file
@@ -1,14 +1,29 @@
-import paddle
-import os
+"""
+OCR worker: prefork, one paddle engine of OCR_CPU_THREADS threads per child,
+consumes only the ocr queue.
 
-# Hard limits (environment-level)
-os.environ["OMP_NUM_THREADS"] = "1"
-os.environ["MKL_NUM_THREADS"] = "1"
-os.environ["CPU_NUM_THREADS"] = "1"
+    celery -A app.worker worker -Q ocr
 
+LLM bound tasks run on app.worker_llm.
+"""
+import paddle
 
 from app.core.celery import celery_app
+from app.core.config import settings
+from app.celery.worker_signals import serve_worker_metrics
 import app.celery.ocr
+import app.celery.pipeline
 from app.services.ocr import get_ocr_engine
 
-get_ocr_engine()
\ No newline at end of file
+assert celery_app is not None
+celery_app.conf.update(
+    worker_pool="prefork",
+    worker_concurrency=settings.CELERY_OCR_CONCURRENCY,
+    # an ocr task holds a core for minutes, don't reserve work another child could take
+    worker_prefetch_multiplier=settings.CELERY_OCR_PREFETCH,
+    task_acks_late=True,
+)
+
+get_ocr_engine()
+
+serve_worker_metrics(settings.METRICS_WORKER_PORT)
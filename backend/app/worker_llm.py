@@ -0,0 +1,20 @@
+"""
+LLM worker: thread pool for classification, extraction and dashboard tasks,
+which spend their time waiting on gemini. Never imports paddle.
+
+    celery -A app.worker_llm worker -Q llm
+"""
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.celery.worker_signals import serve_worker_metrics
+import app.celery.pipeline
+import app.celery.dashboard
+
+assert celery_app is not None
+celery_app.conf.update(
+    worker_pool="threads",
+    worker_concurrency=settings.CELERY_LLM_CONCURRENCY,
+    worker_prefetch_multiplier=settings.CELERY_LLM_PREFETCH,
+)
+
+serve_worker_metrics(settings.METRICS_LLM_WORKER_PORT)
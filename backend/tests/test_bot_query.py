@@ -0,0 +1,53 @@
+import pytest
+
+from app.schemas.bot_query import (
+    AnalysisIntent, AnalysisType, Comparison, CompanyReference, Metric, QueryPlan, TimeMode, TimeScope,
+)
+from app.services.bot_query import named_company, resolve_years
+
+STORED = [2020, 2021, 2022, 2023, 2024]
+
+def scope(*years, mode=TimeMode.single_period) -> TimeScope:
+    return TimeScope(mode=mode, years=list(years))
+
+@pytest.mark.parametrize("years, mode, expected", [
+    ((2023,), TimeMode.single_period, [2023]),
+    (("2022",), TimeMode.single_period, [2022]),
+    (("latest",), TimeMode.single_period, [2024]),
+    (("latest", "previous"), TimeMode.comparison, [2023, 2024]),
+    (("last_3_years",), TimeMode.trend, [2022, 2023, 2024]),
+    (("last_1_year",), TimeMode.trend, [2024]),
+    # symbolic values the resolver does not know fall back to the most recent years
+    (("recent",), TimeMode.single_period, [2024]),
+    (("recent",), TimeMode.trend, STORED),
+])
+def test_years_are_resolved_against_the_stored_ones(years, mode, expected):
+    assert resolve_years(scope(*years, mode=mode), STORED) == (expected, [])
+
+def test_explicit_years_that_are_not_stored_are_reported():
+    assert resolve_years(scope(2019, 2024), STORED) == ([2024], [2019])
+    # nothing stored was asked for, no other year stands in for it
+    assert resolve_years(scope(2025), STORED) == ([], [2025])
+
+def test_nothing_stored():
+    assert resolve_years(scope("latest"), []) == ([], [])
+    assert resolve_years(scope(2024), []) == ([], [2024])
+
+def plan(reference: str | None) -> QueryPlan:
+    return QueryPlan(
+        company=CompanyReference(raw_reference=reference, confidence=0.9),
+        analysis=AnalysisIntent(type=AnalysisType.profitability),
+        metrics=[Metric.net_margin],
+        time=scope("latest"),
+        comparison=Comparison(enabled=False),
+    )
+
+@pytest.mark.parametrize("reference", [
+    None, "", "it", "their", "them", "the company", "This Group", "the company's", "its business",
+])
+def test_implied_references_name_no_company(reference):
+    assert named_company(plan(reference)) is None
+
+def test_named_reference():
+    assert named_company(plan(" Sime Darby Plantation ")) == "Sime Darby Plantation"
+    assert named_company(plan("the group's subsidiary")) == "the group's subsidiary"
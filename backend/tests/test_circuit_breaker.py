@@ -0,0 +1,113 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+from app.core.config import settings
+from app.services import ai_prompt
+from app.services.circuit_breaker import BreakerState, LLMUnavailable
+
+class FakeContextCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def get(self, sys_prompt, tokens):
+        return "cachedContents/stale"
+
+    def invalidate(self, sys_prompt):
+        self.invalidated.append(sys_prompt)
+
+class FakeModels:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.configs = []
+
+    def generate_content(self, model, contents, config):
+        self.configs.append(config)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(settings, "LLM_CONTEXT_CACHE_ENABLED", True)
+    # keep the breaker state in process
+    monkeypatch.setattr(settings, "REDIS_ENABLED", False)
+    client = ai_prompt.GeminiRateLimitedClient(max_retries=3)
+    client.breaker.failure_threshold = 1
+    return client
+
+def open_breaker(client):
+    client.breaker.record_failure()
+    assert client.breaker.state == BreakerState.open
+    with pytest.raises(LLMUnavailable):
+        client.breaker.before_call()
+    # reset timeout passed, the next call is the half open probe
+    client.breaker.opened_at = time.time() - client.breaker.reset_timeout - 1
+
+def test_cache_error_during_probe_closes_the_breaker(client):
+    cache = FakeContextCache()
+    client.context_caches[client.model] = cache
+    answer = SimpleNamespace(text="ok", parsed=None, usage_metadata=None)
+    models = FakeModels(errors.APIError(404, {"error": {"message": "cached content not found"}}), answer)
+    client.client = SimpleNamespace(models=models)
+    open_breaker(client)
+
+    res, _ = client._generate("system", "hi", 2, cacheable=True)
+
+    assert res == "ok"
+    assert cache.invalidated == ["system"]
+    # the retry went out inline instead of through the rejected cache
+    assert [config.cached_content for config in models.configs] == ["cachedContents/stale", None]
+    assert client.breaker.state == BreakerState.closed
+    assert not client.breaker.probing
+
+def test_probe_without_outcome_is_released(client, monkeypatch):
+    def no_quota(*args, **kwargs):
+        raise RuntimeError("quota wait interrupted")
+    monkeypatch.setattr(client, "_wait_for_quota", no_quota)
+    open_breaker(client)
+
+    with pytest.raises(RuntimeError):
+        client._generate("system", "hi", 2)
+
+    assert client.breaker.state == BreakerState.half_open
+    assert not client.breaker.probing
+    # the next caller gets to probe instead of failing with "circuit half open"
+    assert client.breaker.before_call() is True
+
+def test_rate_limits_do_not_trip_the_breaker(client, monkeypatch):
+    answer = SimpleNamespace(text="ok", parsed=None, usage_metadata=None)
+    rate_limited = errors.APIError(429, {"error": {"message": "RESOURCE_EXHAUSTED"}})
+    client.client = SimpleNamespace(models=FakeModels(rate_limited, rate_limited, answer))
+    monkeypatch.setattr(client, "_retry_delay", lambda exc, attempt: 0.0)
+
+    res, _ = client._generate("system", "hi", 2)
+
+    assert res == "ok"
+    assert client.breaker.state == BreakerState.closed
+    assert client.breaker.failures == 0
+
+def test_closed_breaker_reads_remote_state_once_per_interval(client, monkeypatch):
+    reads = []
+    def remote_retry_after():
+        reads.append(1)
+        return None
+    monkeypatch.setattr(client.breaker, "_remote_retry_after", remote_retry_after)
+
+    for _ in range(5):
+        assert client.breaker.before_call() is False
+    assert len(reads) == 1
+
+    client.breaker.remote_checked_at = 0.0
+    monkeypatch.setattr(client.breaker, "_remote_retry_after", lambda: 30.0)
+    with pytest.raises(LLMUnavailable):
+        client.breaker.before_call()
+    # the open state seen in redis is remembered until it expires
+    monkeypatch.setattr(client.breaker, "_remote_retry_after", remote_retry_after)
+    with pytest.raises(LLMUnavailable):
+        client.breaker.before_call()
+    assert len(reads) == 1
@@ -0,0 +1,63 @@
+import random
+
+from app.models.source import Source
+from app.services.fingerprint import (
+    SIMHASH_BITS, SectionMemo, fingerprint, hamming, normalize_text, simhash,
+)
+
+WORDS = (
+    "group revenue increased driven by higher demand in the plantation segment while "
+    "operating costs rose due to labour shortages the board remains cautious on the "
+    "outlook given currency volatility and expects the new refinery to lift margins"
+).split()
+
+def section(words: int = 200, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choices(WORDS, k=words))
+
+def source(body: str, title: str = "Chairman's statement") -> Source:
+    return Source(title=title, body=body, tables=None)
+
+def test_normalize_folds_numbers_case_and_punctuation():
+    assert normalize_text("Revenue FY2023:", "RM1,234.5 million") == "revenue fy0 rm0 million"
+    assert normalize_text("Revenue FY2024:", "RM9,876.1 million") == "revenue fy0 rm0 million"
+    assert normalize_text(None, "", "Table") == "table"
+
+def test_new_fiscal_year_keeps_the_content_hash():
+    last_year = fingerprint("Outlook 2023", section() + " revenue of 1,204 in 2023", None)
+    this_year = fingerprint("Outlook 2024", section() + " revenue of 1,380 in 2024", None)
+    assert last_year == this_year
+
+def test_simhash_is_a_stable_signed_64_bit_value():
+    value = simhash(normalize_text(section()))
+    assert value == simhash(normalize_text(section()))
+    # stored in a postgres BIGINT
+    assert -(1 << 63) <= value < 1 << 63
+
+def test_simhash_distance_tracks_similarity():
+    text = normalize_text(section(400))
+    words = text.split()
+    edited = " ".join(words[:-4] + ["refinery", "margins", "board", "outlook"])
+    unrelated = normalize_text(section(400, seed=2))
+    near, far = hamming(simhash(text), simhash(edited)), hamming(simhash(text), simhash(unrelated))
+    assert near < far
+    assert near <= SIMHASH_BITS * 0.08
+
+def test_short_sections_get_no_simhash():
+    _, value = fingerprint("Notice", "see page 4", None)
+    assert value is None
+
+def test_memo_matches_exact_then_near_duplicates():
+    body = section(400)
+    previous = source(body)
+    memo = SectionMemo([previous], min_similarity=0.9)
+
+    exact = memo.lookup(source(body))
+    assert exact is not None and exact.exact and exact.source is previous and exact.score == 1.0
+
+    words = body.split()
+    near = memo.lookup(source(" ".join(words[:-3] + ["currency", "labour", "demand"])))
+    assert near is not None and not near.exact and near.source is previous
+    assert 0.9 <= near.score < 1.0
+
+    assert memo.lookup(source(section(400, seed=3), title="Risk factors")) is None
@@ -0,0 +1,74 @@
+from pydantic import Field
+
+from app.schemas.shared_identifier import DataListBase, IdentifierBase
+from app.services.prompt_chunking import merge_chunk_results, plan_chunks
+
+class Outlook(IdentifierBase):
+    summary: str | None = None
+    drivers: list[str] = Field(default_factory=list)
+
+class OutlookList(DataListBase[Outlook]):
+    pass
+
+def render(title: str, body: str) -> str:
+    return f'## {title}\n{body}\n'
+
+def words(tokens: int) -> str:
+    # estimate_tokens counts 4 characters per token
+    return 'abc ' * tokens
+
+def outlook(year, confidence, summary=None, drivers=()):
+    return Outlook(
+        period_label=f'FY {year}', year=year, period_type='annual', confidence=confidence,
+        remarks='', summary=summary, drivers=list(drivers),
+    )
+
+def test_chunks_keep_order_and_stay_under_budget():
+    sections = [(f'Section {i}', words(300), i) for i in range(10)]
+
+    chunks = plan_chunks(sections, render, token_budget=1000)
+
+    assert all(chunk.tokens <= 1000 for chunk in chunks)
+    assert [id_ for chunk in chunks for id_ in chunk.source_ids] == list(range(10))
+    assert ''.join(chunk.text for chunk in chunks) == ''.join(render(t, b) for t, b, _ in sections)
+
+def test_chunks_are_balanced():
+    # packed greedily these would be 3 sections and 1, the slowest chunk twice as big
+    sections = [(f'Section {i}', words(300), i) for i in range(4)]
+
+    chunks = plan_chunks(sections, render, token_budget=1000)
+
+    assert [chunk.source_ids for chunk in chunks] == [[0, 1], [2, 3]]
+
+def test_oversized_section_is_split_into_parts():
+    body = '\n'.join(words(100) for _ in range(30))
+
+    chunks = plan_chunks([('Notes', body, 7)], render, token_budget=1000)
+
+    assert len(chunks) > 1
+    assert all(chunk.tokens <= 1000 and chunk.source_ids == [7] for chunk in chunks)
+    assert 'Notes (part 1/' in chunks[0].text
+    assert ''.join(chunk.text for chunk in chunks).count('abc') == 3000
+
+def test_no_sections_no_chunks():
+    assert plan_chunks([], render, token_budget=1000) == []
+
+def test_merge_keeps_the_most_confident_item_and_fills_its_gaps():
+    results = [
+        (OutlookList(data=[outlook(2024, 0.6, 'weaker', ['Labour'])]), [1, 2]),
+        (OutlookList(data=[outlook(2024, 0.9, None, ['CPO prices', 'labour'])]), [3]),
+        (OutlookList(data=[outlook(None, 0.5, 'steady')]), [4]),
+    ]
+
+    merged, sources = merge_chunk_results(results, OutlookList, default_year=2023)
+
+    by_year = {item.year or 2023: (item, ids) for item, ids in zip(merged.data, sources)}
+    item, ids = by_year[2024]
+    assert item.confidence == 0.9
+    assert item.summary == 'weaker'
+    # unioned without case duplicates, the confident item's entries first
+    assert item.drivers == ['CPO prices', 'labour']
+    assert ids == [3, 1, 2]
+    # no year falls under the report's year
+    item, ids = by_year[2023]
+    assert item.summary == 'steady' and ids == [4]
@@ -0,0 +1,77 @@
+import math
+from datetime import datetime
+
+import pytest
+
+from app.schemas.bot_query import Metric
+from app.services.ratios import compute_ratios, ratios_by_company, statement_frame
+
+def row(company_id, year, updated=1, **values):
+    base = dict(
+        revenue=1000.0, cost=600.0, gross_profit=None, operating_income=200.0, finance_costs=-20.0,
+        net_income=100.0, current_assets=500.0, total_assets=2000.0, current_liabilities=250.0,
+        total_liabilities=1000.0, equity=1000.0, operating_cash_flow=300.0, investing_cash_flow=-120.0,
+    )
+    base.update(values)
+    return (company_id, year, datetime(2025, 1, updated), *base.values())
+
+def value(frame, metric: Metric, company_id=1, year=2024):
+    return frame.loc[(company_id, year), metric.value]
+
+def test_ratios_of_a_single_year():
+    values, _ = compute_ratios(statement_frame([row(1, 2024)]))
+
+    # gross profit falls back to revenue - |cost| when it is not stored
+    assert value(values, Metric.gross_profit) == 400
+    assert value(values, Metric.gross_margin) == pytest.approx(0.4)
+    assert value(values, Metric.net_margin) == pytest.approx(0.1)
+    assert value(values, Metric.current_ratio) == pytest.approx(2.0)
+    assert value(values, Metric.debt_to_equity) == pytest.approx(1.0)
+    # finance costs stored negative still count as an expense
+    assert value(values, Metric.interest_coverage) == pytest.approx(10.0)
+    # the first year has no opening balance, the closing one is used
+    assert value(values, Metric.roe) == pytest.approx(0.1)
+    assert value(values, Metric.free_cash_flow) == 180
+    assert math.isnan(value(values, Metric.quick_ratio))
+
+def test_averaged_balances_and_year_on_year():
+    rows = [row(1, 2023), row(1, 2024, revenue=1200.0, net_income=150.0, equity=1500.0)]
+
+    values, yoy = compute_ratios(statement_frame(rows))
+
+    assert value(values, Metric.roe) == pytest.approx(150 / 1250)
+    # amounts change relative to the year before, ratios in points
+    assert value(yoy, Metric.revenue) == pytest.approx(0.2)
+    assert value(yoy, Metric.net_margin) == pytest.approx(0.125 - 0.1)
+    assert math.isnan(value(yoy, Metric.revenue, year=2023))
+
+def test_a_gap_year_is_not_the_previous_year():
+    rows = [row(1, 2021), row(1, 2023, equity=1500.0)]
+
+    values, yoy = compute_ratios(statement_frame(rows))
+
+    assert math.isnan(value(yoy, Metric.revenue, year=2023))
+    assert value(values, Metric.roe, year=2023) == pytest.approx(100 / 1500)
+
+def test_missing_inputs_and_zero_denominators_give_nan():
+    values, _ = compute_ratios(statement_frame([row(1, 2024, revenue=0.0, current_liabilities=None)]))
+
+    assert math.isnan(value(values, Metric.gross_margin))
+    assert math.isnan(value(values, Metric.current_ratio))
+
+def test_newest_period_per_year_wins_and_companies_stay_apart():
+    rows = [
+        row(1, 2024, updated=1, revenue=1.0),
+        row(1, 2024, updated=2, revenue=1000.0),
+        row(2, 2023),
+        row(2, 2024, revenue=2000.0),
+    ]
+
+    by_company = ratios_by_company(statement_frame(rows))
+
+    assert [period.fiscal_year for period in by_company[1]] == [2024]
+    assert by_company[1][0].values[Metric.revenue.value] == 1000
+    # company 1 has no 2023, its yoy must not come from company 2
+    assert by_company[1][0].yoy[Metric.revenue.value] is None
+    assert by_company[2][1].yoy[Metric.revenue.value] == pytest.approx(1.0)
+    assert by_company[2][0].values[Metric.quick_ratio.value] is None
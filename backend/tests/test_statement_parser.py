@@ -0,0 +1,104 @@
+import pytest
+
+from app.models.source import PossibleStatement
+from app.services.statement_parser import parse_number, parse_statement
+
+def table(*rows: tuple[str, ...]) -> str:
+    return "<table>" + "".join(
+        "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows
+    ) + "</table>"
+
+INCOME_ROWS = [
+    ("", "Note", "2024 RM'000", "2023 RM'000"),
+    ("Revenue", "4", "1,000", "900"),
+    ("Cost of sales", "", "(600)", "(550)"),
+    ("Gross profit", "", "400", "350"),
+    ("Other operating expenses", "", "(100)", "(90)"),
+    ("Profit from operations", "", "300", "260"),
+    ("Finance costs", "", "(20)", "(15)"),
+    ("Profit before tax", "", "280", "245"),
+    ("Taxation", "5", "(70)", "(60)"),
+    ("Profit for the financial year", "", "210", "185"),
+    ("Basic earnings per share (sen)", "6", "12.5", "11.0"),
+]
+
+@pytest.mark.parametrize("cell, value", [
+    ("1,234", 1234.0), ("(1,234)", -1234.0), ("-12.5", -12.5), ("RM 3,000", 3000.0),
+    ("-", 0.0), ("nil", 0.0), ("Revenue", None), ("", None),
+])
+def test_parse_number(cell, value):
+    assert parse_number(cell) == value
+
+def test_income_statement_is_read_per_year_and_scaled():
+    parsed = parse_statement(PossibleStatement.income_statement, "Income statement", table(*INCOME_ROWS))
+
+    assert parsed is not None and parsed.confidence == 1.0 and parsed.issues == []
+    current, prior = parsed.data.data
+    assert (current.year, prior.year) == (2024, 2023)
+    assert current.revenue == 1_000_000 and current.net_income == 210_000
+    # expenses are stored positive whatever way they are printed
+    assert current.cost == 600_000 and current.tax == 70_000
+    # per share figures are in sen, never in RM'000
+    assert current.eps == 12.5
+    assert prior.operating_income == 260_000
+
+def test_failed_identity_lowers_confidence():
+    rows = list(INCOME_ROWS)
+    rows[3] = ("Gross profit", "", "400", "390")
+
+    parsed = parse_statement(PossibleStatement.income_statement, "Income statement", table(*rows))
+
+    assert parsed is not None and parsed.confidence == 0.5
+    assert parsed.issues == ["2023: revenue - cost = gross profit does not hold"]
+
+def test_missing_field_is_left_to_the_llm():
+    rows = [row for row in INCOME_ROWS if row[0] != "Finance costs"]
+
+    parsed = parse_statement(PossibleStatement.income_statement, "Income statement", table(*rows))
+
+    assert parsed is not None and parsed.confidence == 0.0
+    assert "2024: missing finance_costs" in parsed.issues
+    assert parsed.data.data == []
+
+def test_balance_sheet_totals_are_derived_and_checked():
+    html = table(
+        ("", "2024", "2023"),
+        ("Total non-current assets", "700", "650"),
+        ("Total current assets", "300", "250"),
+        ("Total current liabilities", "200", "180"),
+        ("Total non-current liabilities", "100", "120"),
+        ("Total equity", "700", "600"),
+    )
+
+    parsed = parse_statement(PossibleStatement.balance_sheet, "Statement of financial position", html)
+
+    assert parsed is not None
+    current, prior = parsed.data.data
+    assert current.total_assets == 1000 and current.total_liabilities == 300
+    assert parsed.confidence == 1.0
+    # 900 of assets against 300 + 600
+    assert prior.total_assets == 900 and prior.equity == 600
+
+def test_columns_without_a_year_header_use_the_expected_year():
+    html = table(
+        ("", "Note", "Group", "Group"),
+        ("Net cash from operating activities", "", "500", "400"),
+        ("Net cash used in investing activities", "", "(200)", "(150)"),
+        ("Net cash used in financing activities", "", "(100)", "(50)"),
+        ("Net increase in cash and cash equivalents", "", "200", "200"),
+        ("Cash and cash equivalents at beginning of the financial year", "", "300", "100"),
+        ("Cash and cash equivalents at end of the financial year", "", "500", "300"),
+    )
+
+    parsed = parse_statement(PossibleStatement.cash_flow_statement, "Cash flows", html, expected_year=2024)
+
+    assert parsed is not None and parsed.confidence == 1.0
+    assert [item.year for item in parsed.data.data] == [2024, 2023]
+    assert parsed.data.data[0].investing_cash_flow == -200
+
+def test_unsupported_or_empty_tables():
+    assert parse_statement(PossibleStatement.income_statement, "Income", "") is None
+    # no year anywhere and none expected
+    assert parse_statement(
+        PossibleStatement.income_statement, "Income", table(("Revenue", "1,000"))
+    ) is None